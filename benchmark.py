@@ -0,0 +1,372 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import contextlib
+import collections
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Peak memory is read with the resource module, which only exists on Unix.
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import mock_llm_server
+import synthetic_corpus
+from renamer import config, engine, inference, metrics
+
+# ---------------------------------------------------------------------------
+# Throughput benchmark of the renamer engine.
+#
+# A synthetic corpus (see synthetic_corpus.py) is written to a scratch
+# directory and renamed by engine.process_directory(), the same code path as
+# PDF_renamer.py, md_renamer.py and python -m renamer, against an in-process
+# mock_llm_server with the chosen latency, error rate and rate limits.
+# Nothing is sent to OpenAI and no API key is needed.
+#
+# Reported: files per second, p50/p99 latency of each pipeline stage, peak
+# RSS of the main process and of the extraction workers, and the requests
+# and tokens the mock server received (retries included).
+#
+#   python benchmark.py --pdf 200 --markdown 200 --latency 0.3 --error-rate 0.05
+#   python benchmark.py --formats pdf --large 0.5 --json before.json
+#   python benchmark.py --workers 4
+#
+# With --workers, several worker processes share the corpus through a work
+# queue (engine.work_directory(), as python -m renamer worker), and the
+# report counts the files that more than one worker extracted.
+#
+# Peak RSS covers the whole process, so run one benchmark per invocation.
+# ---------------------------------------------------------------------------
+
+# Stages in the order of the report. The engine measures extract, ocr, infer
+# and move itself (see renamer.metrics); the others are measured by wrapping
+# the functions listed in WRAPPED_STAGES.
+STAGES = ("extract", "ocr", "local_guess", "infer", "move", "file", "group")
+
+# Pipeline functions measured as a stage, as (module, function name, stage name).
+WRAPPED_STAGES = (
+    (inference, "guess_local_metadata", "local_guess"),
+    (engine, "process_file", "file"),
+    (engine, "process_group", "group"),
+)
+
+@contextlib.contextmanager
+def measured_stages():
+    """
+    Measure the functions of WRAPPED_STAGES as stages of the metrics run,
+    for the duration of the with block.
+    """
+    originals = []
+    for module, name, stage in WRAPPED_STAGES:
+        original = getattr(module, name)
+
+        def measured(*args, original=original, stage=stage, **kwargs):
+            with metrics.stage(stage):
+                return original(*args, **kwargs)
+
+        originals.append((module, name, original))
+        setattr(module, name, measured)
+    try:
+        yield
+    finally:
+        for module, name, original in reversed(originals):
+            setattr(module, name, original)
+
+def peak_rss_mb(children=False):
+    """
+    Return the peak resident set size of this process or of its children.
+
+    Parameters:
+        children (bool): Measure the largest finished child process (the
+            extraction workers) instead of this process.
+
+    Returns:
+        float: The peak RSS in MB, or None if it cannot be measured.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+@contextlib.contextmanager
+def quiet_output(enabled=True):
+    """
+    Send stdout to the null device, including that of the worker processes
+    started inside the with block.
+
+    Parameters:
+        enabled (bool): If False, the output is left alone.
+    """
+    if not enabled:
+        yield
+        return
+    sys.stdout.flush()
+    saved = os.dup(1)
+    with open(os.devnull, 'w') as devnull:
+        os.dup2(devnull.fileno(), 1)
+        try:
+            yield
+        finally:
+            sys.stdout.flush()
+            os.dup2(saved, 1)
+            os.close(saved)
+
+def start_mock_server(latency, error_rate, requests_per_minute, tokens_per_minute):
+    """
+    Start mock_llm_server on a free local port in a background thread.
+
+    Parameters:
+        latency (float): Seconds the server waits before each answer.
+        error_rate (float): Share of requests answered with a random 429.
+        requests_per_minute (int): Request limit of the server, or None.
+        tokens_per_minute (int): Token limit of the server, or None.
+
+    Returns:
+        ThreadingHTTPServer: The running server.
+    """
+    server = mock_llm_server.make_server("127.0.0.1", 0, latency, error_rate,
+                                         requests_per_minute, tokens_per_minute)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def configure(settings):
+    """
+    Point the engine at the benchmark corpus and apply the engine options.
+
+    Parameters:
+        settings (dict): config attribute names and values.
+    """
+    for name, value in settings.items():
+        setattr(config, name, value)
+
+def run_worker(settings, formats, verbose):
+    """
+    Run one worker of a multi-worker benchmark. Runs in a worker process.
+
+    Parameters:
+        settings (dict): config attribute names and values.
+        formats (list): Extractor names, or None for all formats.
+        verbose (bool): Show the output of the engine.
+
+    Returns:
+        tuple: (stages, extracted): the stages of the worker's metrics run,
+            as in RunMetrics.stages, and the paths this worker extracted.
+    """
+    configure(settings)
+    extracted = []
+    extract = engine.extract
+
+    def recorded_extract(path, extractor):
+        extracted.append(path)
+        return extract(path, extractor)
+
+    engine.extract = recorded_extract
+    try:
+        with measured_stages(), quiet_output(not verbose):
+            engine.work_directory(formats=formats)
+    finally:
+        engine.extract = extract
+    return metrics.last_run.stages, extracted
+
+def run_workers(settings, formats, workers, verbose, run):
+    """
+    Rename the corpus with several worker processes sharing a work queue.
+
+    Parameters:
+        settings (dict): config attribute names and values.
+        formats (list): Extractor names, or None for all formats.
+        workers (int): Number of worker processes.
+        verbose (bool): Show the output of the engine.
+        run (metrics.RunMetrics): Receives the stages of all workers.
+
+    Returns:
+        int: The number of files extracted by more than one worker.
+    """
+    extractions = collections.Counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [executor.submit(run_worker, settings, formats, verbose) for _ in range(workers)]
+        for future in futures:
+            stages, extracted = future.result()
+            run.merge(stages)
+            extractions.update(extracted)
+    return sum(1 for count in extractions.values() if count > 1)
+
+def run_benchmark(args):
+    """
+    Generate the corpus, rename it against the mock server and collect the results.
+
+    Parameters:
+        args (argparse.Namespace): The parsed command-line options.
+
+    Returns:
+        dict: The benchmark results.
+    """
+    workdir = args.workdir or tempfile.mkdtemp(prefix="renamer-benchmark-")
+    source_dir = os.path.join(workdir, "inbox")
+    destination_dir = os.path.join(workdir, "renamed")
+    if os.path.exists(source_dir) or os.path.exists(destination_dir):
+        raise ValueError(f"{workdir} already holds a corpus; use an empty directory.")
+
+    print(f"Writing the corpus to {source_dir}...")
+    corpus = synthetic_corpus.generate_corpus(
+        source_dir, args.pdf, args.markdown, args.large, args.scanned, args.embedded, args.seed, args.large_pages
+    )
+    corpus_bytes = sum(entry.stat().st_size for entry in os.scandir(source_dir))
+
+    server = start_mock_server(args.latency, args.error_rate, args.rpm, args.tpm)
+    # Set before the worker processes start, so that they inherit it.
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_port}/v1"
+    settings = {
+        "api_key": "benchmark",
+        "SOURCE_DIR": source_dir,
+        "DESTINATION_DIR": destination_dir,
+        "CACHE_PATH": os.path.join(workdir, "metadata_cache.sqlite3"),
+        "JOURNAL_PATH": os.path.join(workdir, "renamer_journal.sqlite3"),
+        "DUPLICATE_INDEX_PATH": os.path.join(workdir, "renamer_duplicates.sqlite3"),
+        "WORK_QUEUE_PATH": os.path.join(workdir, "renamer_queue.sqlite3"),
+        "MAX_IN_FLIGHT": args.max_in_flight,
+        "PACK_SIZE": args.pack_size,
+        "EXTRACTION_PROCESSES": args.processes,
+        # The workers share this machine's cores.
+        "WORKERS_PER_MACHINE": args.workers,
+        # The engine measures its stages; the summary is read from metrics.last_run.
+        "METRICS_FORMAT": "summary",
+        "METRICS_PATH": None,
+    }
+    configure(settings)
+
+    formats = [name.strip() for name in args.formats.split(",")] if args.formats else None
+    run = metrics.RunMetrics()
+    processed_twice = None
+    print(f"Renaming {corpus['pdf'] + corpus['markdown']} files "
+          f"(mock latency {args.latency} s, error rate {args.error_rate}, {args.workers} worker(s))...")
+    try:
+        start = time.perf_counter()
+        if args.workers > 1:
+            processed_twice = run_workers(settings, formats, args.workers, args.verbose, run)
+        else:
+            with measured_stages(), quiet_output(not args.verbose):
+                engine.process_directory(formats)
+            run = metrics.last_run
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    stages = run.summary()
+    # Every file of the selected formats is extracted exactly once.
+    processed = stages.get("extract", {}).get("calls", 0)
+    moved = sum(1 for _ in os.scandir(destination_dir))
+    results = {
+        "corpus": dict(corpus, bytes=corpus_bytes),
+        "settings": {
+            "formats": formats or "all",
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "rpm": args.rpm,
+            "tpm": args.tpm,
+            "max_in_flight": config.MAX_IN_FLIGHT,
+            "pack_size": config.PACK_SIZE,
+            "extraction_processes": config.EXTRACTION_PROCESSES,
+            "workers": args.workers,
+        },
+        "elapsed_s": elapsed,
+        "files_processed": processed,
+        "files_processed_twice": processed_twice,
+        "files_moved": moved,
+        "files_per_second": processed / elapsed if elapsed else 0.0,
+        "stages": stages,
+        "api": dict(server.RequestHandlerClass.stats),
+        "peak_rss_mb": {
+            "main": peak_rss_mb(children=False),
+            "extraction_workers": peak_rss_mb(children=True),
+        },
+    }
+    if args.workdir is None and not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+    else:
+        print(f"Kept the corpus, renamed files, cache and journal in {workdir}")
+    return results
+
+def print_report(results):
+    """
+    Print the benchmark results as a table.
+
+    Parameters:
+        results (dict): The results of run_benchmark().
+    """
+    corpus = results["corpus"]
+    print(f"\nCorpus: {corpus['pdf']} PDF + {corpus['markdown']} Markdown files, "
+          f"{corpus['bytes'] / (1024 * 1024):.1f} MB ({corpus['large']} large, "
+          f"{corpus['scanned']} scanned, {corpus['embedded']} with embedded metadata)")
+    print(f"Processed {results['files_processed']} files in {results['elapsed_s']:.2f} s: "
+          f"{results['files_per_second']:.1f} files/s ({results['files_moved']} moved)")
+    if results["files_processed_twice"] is not None:
+        print(f"{results['settings']['workers']} workers; files processed by more than one: "
+              f"{results['files_processed_twice']}")
+
+    print(f"\n{'stage':<14}{'calls':>8}{'p50 ms':>11}{'p99 ms':>11}{'total s':>10}")
+    for stage in STAGES:
+        timing = results["stages"].get(stage)
+        if timing:
+            print(f"{stage:<14}{timing['calls']:>8}{timing['p50_s'] * 1000:>11.1f}"
+                  f"{timing['p99_s'] * 1000:>11.1f}{timing['wall_s']:>10.2f}")
+
+    api = results["api"]
+    print(f"\nAPI requests: {api['requests']} ({api['rate_limited']} answered 429)")
+    print(f"Tokens sent: {api['prompt_tokens']} prompt, {api['completion_tokens']} completion "
+          f"(estimated by the mock server as characters / 4)")
+    rss = results["peak_rss_mb"]
+    if rss["main"] is not None:
+        print(f"Peak RSS: {rss['main']:.0f} MB main process (with the mock server), "
+              f"{rss['extraction_workers']:.0f} MB largest extraction (or renamer) worker")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the renamer engine on a synthetic corpus.")
+    corpus_options = parser.add_argument_group("corpus")
+    corpus_options.add_argument("--pdf", type=int, default=100, help="Number of PDF files.")
+    corpus_options.add_argument("--markdown", type=int, default=100, help="Number of Markdown files.")
+    corpus_options.add_argument("--large", type=float, default=0.1, help="Share of large files.")
+    corpus_options.add_argument("--scanned", type=float, default=0.1, help="Share of scanned PDFs (no text layer).")
+    corpus_options.add_argument("--embedded", type=float, default=0.3,
+                                help="Share of files with embedded metadata.")
+    corpus_options.add_argument("--large-pages", type=int, default=200, help="Number of pages of a large PDF.")
+    corpus_options.add_argument("--seed", type=int, default=0)
+    server_options = parser.add_argument_group("mock server")
+    server_options.add_argument("--latency", type=float, default=0.2, help="Seconds before each answer.")
+    server_options.add_argument("--error-rate", type=float, default=0.0,
+                                help="Share of requests answered with a random 429 error (0 to 1).")
+    server_options.add_argument("--rpm", type=int, default=None, help="Requests per minute the server allows.")
+    server_options.add_argument("--tpm", type=int, default=None, help="Tokens per minute the server allows.")
+    engine_options = parser.add_argument_group("engine")
+    engine_options.add_argument("--formats", default=None,
+                                help="Comma-separated formats to process: pdf (PDF_renamer.py), "
+                                     "markdown (md_renamer.py) or both (default: all).")
+    engine_options.add_argument("--max-in-flight", type=int, default=config.MAX_IN_FLIGHT)
+    engine_options.add_argument("--pack-size", type=int, default=config.PACK_SIZE)
+    engine_options.add_argument("--processes", type=int, default=config.EXTRACTION_PROCESSES,
+                                help="Extraction worker processes (default: one per CPU core; 0: none).")
+    engine_options.add_argument("--workers", type=int, default=1,
+                                help="Renamer processes sharing the corpus through a work queue.")
+    output_options = parser.add_argument_group("output")
+    output_options.add_argument("--workdir", default=None,
+                                help="Empty directory for the corpus (default: a temporary directory).")
+    output_options.add_argument("--keep", action="store_true", help="Keep the temporary directory.")
+    output_options.add_argument("--json", default=None, help="Also write the results to this JSON file.")
+    output_options.add_argument("--verbose", action="store_true", help="Show the output of the engine.")
+    args = parser.parse_args()
+
+    results = run_benchmark(args)
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f"\nWrote the results to {args.json}")
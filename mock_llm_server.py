@@ -0,0 +1,440 @@
+import argparse
+import hashlib
+import collections
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ---------------------------------------------------------------------------
+# Local stub of the OpenAI chat-completions endpoint.
+#
+# Start the server and point the renamer scripts at it by setting the
+# OPENAI_BASE_URL environment variable, for example:
+#
+#   python mock_llm_server.py --port 8099 --latency 0.5
+#   OPENAI_BASE_URL=http://127.0.0.1:8099/v1 python PDF_renamer.py
+#
+# No API key is needed and nothing is sent to OpenAI.
+#
+# Rate limits can be simulated as well: with --rpm and --tpm the server
+# enforces per-minute request and token limits over a sliding window, sends
+# x-ratelimit-* headers like the real API and answers 429 when a limit is
+# exceeded. --error-rate makes a share of the requests fail with a 429 at random.
+#
+# Requests with a json_schema response_format get replies in that shape
+# (Author a list, Year an integer). --invalid-rate makes a share of the
+# replies carry an invalid Year, to exercise the renamer's repair prompts.
+#
+# The Batch API endpoints used by the batch modes (file upload, batch create,
+# batch retrieve and file content) are also available. Batches are run as soon
+# as they are created and are reported as completed on the first status check.
+# ---------------------------------------------------------------------------
+
+# Header placed before each document in a packed (multi-document) prompt.
+PACKED_DOCUMENT_PATTERN = re.compile(r"=== Document (\S+) ===\n(.*?)(?=\n=== Document |\Z)", re.DOTALL)
+
+def build_metadata(document_text):
+    """
+    Build deterministic fake metadata for a document.
+
+    The title contains a short hash of the document text, so different
+    documents get different file names and identical documents collide on purpose.
+
+    Parameters:
+        document_text (str): The document part of the user prompt.
+
+    Returns:
+        dict: A dictionary with keys "Author", "Title", and "Year".
+    """
+    digest = hashlib.sha1(document_text.strip().encode('utf-8')).hexdigest()[:8]
+    return {"Author": "Stub Author", "Title": f"Stub Title {digest}", "Year": "2024"}
+
+def shape_metadata(metadata, schema, invalid=False):
+    """
+    Shape fake metadata like the reply of a real model.
+
+    Parameters:
+        metadata (dict): Metadata from build_metadata().
+        schema (dict): JSON schema of the object requested, or None.
+        invalid (bool): Give an invalid Year.
+
+    Returns:
+        dict: The fields requested by the schema (all without a schema),
+            with Author as a list and Year as an integer when a schema is given.
+    """
+    if schema is not None:
+        fields = [field for field in schema.get("properties", {}) if field in metadata]
+        metadata = {field: metadata[field] for field in fields}
+        if "Author" in metadata:
+            metadata["Author"] = [metadata["Author"]]
+        if "Year" in metadata:
+            metadata["Year"] = int(metadata["Year"])
+    if invalid and "Year" in metadata:
+        metadata["Year"] = f"circa {metadata['Year']}"
+    return metadata
+
+def build_reply(prompt, schema=None, invalid=False):
+    """
+    Build the assistant's reply for a single-document, packed or repair prompt.
+
+    Parameters:
+        prompt (str): The user prompt sent by the client.
+        schema (dict): JSON schema from the request's response_format, or None.
+        invalid (bool): Give an invalid Year (not in repair replies).
+
+    Returns:
+        str: A JSON object, or a JSON array for packed prompts without a schema.
+    """
+    if prompt.startswith("Your previous answer"):
+        document = prompt.split("Beginning of the document:\n", 1)[-1]
+        return json.dumps(shape_metadata(build_metadata(document), schema), indent=2)
+    documents = PACKED_DOCUMENT_PATTERN.findall(prompt)
+    if documents:
+        item_schema = schema["properties"]["documents"]["items"] if schema is not None else None
+        entries = [dict(id=doc_id, **shape_metadata(build_metadata(text), item_schema, invalid))
+                   for doc_id, text in documents]
+        return json.dumps({"documents": entries} if schema is not None else entries, indent=2)
+    # The document follows the JSON example at the end of the instructions.
+    return json.dumps(shape_metadata(build_metadata(prompt.split("}\n\n", 1)[-1]), schema, invalid), indent=2)
+
+def build_completion(request_body, invalid_rate=0.0):
+    """
+    Build a chat completion response for a request body.
+
+    Parameters:
+        request_body (dict): The decoded JSON request.
+        invalid_rate (float): Share of replies with an invalid Year.
+
+    Returns:
+        dict: A response shaped like the OpenAI chat completion object.
+    """
+    messages = request_body.get("messages", [])
+    prompt = messages[-1]["content"] if messages else ""
+    response_format = request_body.get("response_format") or {}
+    schema = response_format.get("json_schema", {}).get("schema")
+    content = build_reply(prompt, schema, random.random() < invalid_rate)
+    prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+    completion_tokens = len(content) // 4
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request_body.get("model", "stub"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+def parse_multipart_file(content_type, body):
+    """
+    Extract the uploaded file from a multipart/form-data request body.
+
+    Parameters:
+        content_type (str): The request's Content-Type header.
+        body (bytes): The raw request body.
+
+    Returns:
+        bytes: The content of the "file" field, or b"" if there is none.
+    """
+    message = BytesParser().parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode('utf-8') + body
+    )
+    for part in message.walk():
+        if part.get_param("name", header="content-disposition") == "file":
+            return part.get_payload(decode=True) or b""
+    return b""
+
+def run_batch_file(batch_content):
+    """
+    Answer every request in a batch input file.
+
+    Parameters:
+        batch_content (bytes): The uploaded JSONL batch file.
+
+    Returns:
+        bytes: The JSONL result file.
+    """
+    lines = []
+    for line in batch_content.decode('utf-8').splitlines():
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        lines.append(json.dumps({
+            "id": f"batch_req_{request['custom_id']}",
+            "custom_id": request["custom_id"],
+            "response": {"status_code": 200, "body": build_completion(request["body"])},
+            "error": None
+        }))
+    return ("\n".join(lines) + "\n").encode('utf-8')
+
+class RateWindow:
+    """
+    Sliding one-minute window of the requests and tokens a server has accepted.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.lock = threading.Lock()
+        # (time, tokens) of every request accepted in the last minute.
+        self.entries = collections.deque()
+        self.token_total = 0
+
+    def expire(self, now):
+        while self.entries and self.entries[0][0] <= now - 60:
+            self.token_total -= self.entries.popleft()[1]
+
+    def admit(self, tokens):
+        """
+        Accept a request if it fits in the limits.
+
+        Parameters:
+            tokens (int): The tokens of the request.
+
+        Returns:
+            tuple: (accepted, headers) where headers are the x-ratelimit-*
+                (and, for a refused request, retry-after) headers to send.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.expire(now)
+            over_requests = (self.requests_per_minute is not None
+                             and len(self.entries) + 1 > self.requests_per_minute)
+            over_tokens = (self.tokens_per_minute is not None and self.entries
+                           and self.token_total + tokens > self.tokens_per_minute)
+            accepted = not over_requests and not over_tokens
+            if accepted:
+                self.entries.append((now, tokens))
+                self.token_total += tokens
+            headers = {}
+            # The oldest entry leaves the window first and frees its budget.
+            reset = max(0.0, self.entries[0][0] + 60 - now) if self.entries else 0.0
+            if self.requests_per_minute is not None:
+                headers["x-ratelimit-limit-requests"] = str(self.requests_per_minute)
+                headers["x-ratelimit-remaining-requests"] = str(max(0, self.requests_per_minute - len(self.entries)))
+                headers["x-ratelimit-reset-requests"] = f"{reset:.3f}s"
+            if self.tokens_per_minute is not None:
+                headers["x-ratelimit-limit-tokens"] = str(self.tokens_per_minute)
+                headers["x-ratelimit-remaining-tokens"] = str(max(0, self.tokens_per_minute - self.token_total))
+                headers["x-ratelimit-reset-tokens"] = f"{reset:.3f}s"
+            if not accepted:
+                headers["retry-after-ms"] = str(int(reset * 1000) + 1)
+            return accepted, headers
+
+def count_request_tokens(request_body):
+    """
+    Estimate the tokens of a chat completion request the way build_completion() counts them.
+
+    Parameters:
+        request_body (dict): The decoded JSON request.
+
+    Returns:
+        int: The estimated prompt tokens.
+    """
+    return sum(len(str(m.get("content", ""))) for m in request_body.get("messages", [])) // 4
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Request handler that answers chat completion requests after a delay.
+    """
+    latency = 0.0
+    # Share of chat completion requests answered with a random 429.
+    error_rate = 0.0
+    # Share of replies given an invalid Year.
+    invalid_rate = 0.0
+    rate_window = RateWindow()
+
+    # Counters of the chat completion requests, shared by all handler instances.
+    stats = {"requests": 0, "rate_limited": 0, "prompt_tokens": 0, "completion_tokens": 0}
+    stats_lock = threading.Lock()
+
+    # Uploaded files and created batches, shared by all handler instances.
+    files = {}
+    batches = {}
+    store_lock = threading.Lock()
+    ids = itertools.count(1)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw_body = self.rfile.read(length)
+        path = self.path.rstrip('/')
+
+        if path.endswith("/files"):
+            self.create_file(parse_multipart_file(self.headers.get("Content-Type", ""), raw_body))
+            return
+
+        try:
+            request_body = json.loads(raw_body or b"{}")
+        except json.JSONDecodeError:
+            self.send_json(400, {"error": {"message": "Invalid JSON body."}})
+            return
+
+        if path.endswith("/chat/completions"):
+            accepted, headers = self.rate_window.admit(count_request_tokens(request_body))
+            rate_limited = not accepted or random.random() < self.error_rate
+            self.count_request(request_body, rate_limited)
+            if not accepted:
+                self.send_json(429, {"error": {"message": "Rate limit reached.", "type": "requests",
+                                               "code": "rate_limit_exceeded"}}, headers)
+                return
+            if rate_limited:
+                headers["retry-after-ms"] = "100"
+                self.send_json(429, {"error": {"message": "Simulated rate limit error.", "type": "requests",
+                                               "code": "rate_limit_exceeded"}}, headers)
+                return
+            # Simulate the network and model latency of the real endpoint.
+            time.sleep(self.latency)
+            completion = build_completion(request_body, self.invalid_rate)
+            with self.stats_lock:
+                self.stats["completion_tokens"] += completion["usage"]["completion_tokens"]
+            self.send_json(200, completion, headers)
+        elif path.endswith("/batches"):
+            self.create_batch(request_body)
+        else:
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def count_request(self, request_body, rate_limited):
+        with self.stats_lock:
+            self.stats["requests"] += 1
+            self.stats["prompt_tokens"] += count_request_tokens(request_body)
+            if rate_limited:
+                self.stats["rate_limited"] += 1
+
+    def do_GET(self):
+        parts = self.path.rstrip('/').split('/')
+        with self.store_lock:
+            if len(parts) >= 2 and parts[-2] == "batches" and parts[-1] in self.batches:
+                self.send_json(200, self.batches[parts[-1]])
+                return
+            if len(parts) >= 3 and parts[-1] == "content" and parts[-2] in self.files:
+                content = self.files[parts[-2]]
+            else:
+                content = None
+        if content is None:
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def create_file(self, content):
+        with self.store_lock:
+            file_id = f"file-stub-{next(self.ids)}"
+            self.files[file_id] = content
+        self.send_json(200, {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": "batch.jsonl",
+            "purpose": "batch",
+            "status": "processed"
+        })
+
+    def create_batch(self, request_body):
+        with self.store_lock:
+            input_content = self.files.get(request_body.get("input_file_id"))
+            if input_content is None:
+                self.send_json(404, {"error": {"message": "Unknown input file."}})
+                return
+            output_id = f"file-stub-{next(self.ids)}"
+            self.files[output_id] = run_batch_file(input_content)
+            batch_id = f"batch-stub-{next(self.ids)}"
+            batch = {
+                "id": batch_id,
+                "object": "batch",
+                "endpoint": request_body.get("endpoint"),
+                "input_file_id": request_body.get("input_file_id"),
+                "completion_window": request_body.get("completion_window", "24h"),
+                "status": "completed",
+                "output_file_id": output_id,
+                "created_at": int(time.time())
+            }
+            self.batches[batch_id] = batch
+        self.send_json(200, batch)
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep the console quiet; the renamer scripts print their own progress.
+        pass
+
+def make_server(host="127.0.0.1", port=8099, latency=0.0, error_rate=0.0,
+                requests_per_minute=None, tokens_per_minute=None, invalid_rate=0.0):
+    """
+    Create (but do not start) a stub server.
+
+    Parameters:
+        host (str): Interface to bind to.
+        port (int): Port to listen on. Use 0 to pick a free port.
+        latency (float): Seconds to wait before answering each request.
+        error_rate (float): Share of chat completion requests answered with
+            a random 429 error.
+        requests_per_minute (int): Request limit to enforce, or None.
+        tokens_per_minute (int): Token limit to enforce, or None.
+        invalid_rate (float): Share of replies with an invalid Year.
+
+    Returns:
+        ThreadingHTTPServer: The server. Call serve_forever() to start it.
+            server.RequestHandlerClass.stats counts the chat completion
+            requests, the 429 answers and the prompt and completion tokens.
+    """
+    handler = type("ConfiguredStubHandler", (StubHandler,), {
+        "latency": latency,
+        "error_rate": error_rate,
+        "invalid_rate": invalid_rate,
+        "rate_window": RateWindow(requests_per_minute, tokens_per_minute),
+        "stats": {"requests": 0, "rate_limited": 0, "prompt_tokens": 0, "completion_tokens": 0},
+        "stats_lock": threading.Lock(),
+        "files": {},
+        "batches": {}
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub of the OpenAI chat-completions endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.5,
+                        help="Seconds to wait before answering each request.")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Share of requests answered with a random 429 error (0 to 1).")
+    parser.add_argument("--rpm", type=int, default=None,
+                        help="Requests per minute to allow before answering 429.")
+    parser.add_argument("--tpm", type=int, default=None,
+                        help="Tokens per minute to allow before answering 429.")
+    parser.add_argument("--invalid-rate", type=float, default=0.0,
+                        help="Share of replies with an invalid Year (0 to 1).")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.error_rate, args.rpm, args.tpm,
+                         args.invalid_rate)
+    print(f"Stub chat-completions server listening on http://{args.host}:{server.server_port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,12 @@
+# ---------------------------------------------------------------------------
+# Renamer engine.
+#
+# Renames documents to "<Author> <Year>--<Title>.<ext>" from their content
+# and moves them to a destination directory. One run scans SOURCE_DIR once
+# and hands every file to the extractor registered for its format (see
+# renamer.extractors); all formats share one OpenAI client, one metadata
+# cache, one job journal, one rate limiter and one worker pool.
+#
+# Settings live in renamer/config.py. Run "python -m renamer" to process
+# every supported format, or PDF_renamer.py / md_renamer.py for one format.
+# ---------------------------------------------------------------------------
@@ -0,0 +1,7 @@
+# Run the renamer engine on every supported format:
+#   python -m renamer [mode] [files...] [--formats pdf,markdown] [--config settings.toml] [--dry-run]
+# See python -m renamer --help for the modes and options.
+from renamer import engine
+
+if __name__ == "__main__":
+    engine.main()
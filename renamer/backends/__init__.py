@@ -0,0 +1,119 @@
+import importlib
+
+from renamer import config
+
+# ---------------------------------------------------------------------------
+# Registry of inference backends.
+#
+# A backend turns chat messages into the model's reply. The prompts, the
+# metadata cache and the parsing of the reply (renamer.inference) are the
+# same for every backend; INFERENCE_BACKEND in renamer/config.py picks the
+# backend, MODEL_NAME the model and BASE_URL the server, if any.
+#
+# To add a backend, add a module to this package with a Backend subclass
+# decorated with @register, and list the module in BACKEND_MODULES. Backend
+# modules are only imported when their backend is created, as they may load
+# large libraries (the OpenAI SDK, PyTorch).
+# ---------------------------------------------------------------------------
+
+# Registered backend classes, keyed by name.
+BACKENDS = {}
+
+# Modules of the built-in backends, keyed by backend name.
+BACKEND_MODULES = {
+    "openai": "renamer.backends.openai_chat",
+    "local": "renamer.backends.local_model",
+}
+
+class Backend:
+    """
+    Base class of the inference backends.
+
+    Subclasses set name and implement complete(). A backend is created once
+    per run and shared by all worker threads.
+    """
+
+    # Name used in settings and on the command line, e.g. "openai".
+    name = ""
+
+    def describe(self):
+        """
+        Return a readable description of the model, used in messages.
+
+        Returns:
+            str: E.g. "gpt-4o-mini (OpenAI)".
+        """
+        return f"{config.MODEL_NAME} ({self.name})"
+
+    def warm_up(self):
+        """
+        Prepare the backend (connect, load the model) before the first prompt.
+
+        Raises:
+            Exception: If the backend cannot be used, e.g. a missing API key.
+        """
+
+    def complete(self, messages, expected_output_tokens=100, response_format=None):
+        """
+        Send chat messages to the model and return its reply.
+
+        Parameters:
+            messages (list): Chat messages, as for chat.completions.create().
+            expected_output_tokens (int): The expected length of the reply.
+            response_format (dict): JSON schema the reply must follow, as for
+                chat.completions.create(), or None. Backends that cannot
+                constrain their output ignore it; replies are validated anyway.
+
+        Returns:
+            str: The content of the assistant's reply.
+
+        Raises:
+            Exception: If the model could not be called, even after retrying.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Release the resources of the backend.
+        """
+
+def register(backend_class):
+    """
+    Class decorator that adds a backend to the registry.
+
+    Parameters:
+        backend_class (type): The Backend subclass.
+
+    Returns:
+        type: The same class.
+    """
+    BACKENDS[backend_class.name] = backend_class
+    return backend_class
+
+def backend_names():
+    """
+    Return the names of the available backends, without importing them.
+
+    Returns:
+        list: The sorted names.
+    """
+    return sorted(set(BACKENDS) | set(BACKEND_MODULES))
+
+def create_backend(name):
+    """
+    Create a backend by name.
+
+    Parameters:
+        name (str): The backend name.
+
+    Returns:
+        Backend: The new backend.
+
+    Raises:
+        ValueError: If the name is not registered.
+    """
+    if name not in BACKENDS and name in BACKEND_MODULES:
+        importlib.import_module(BACKEND_MODULES[name])
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {name!r}. Available: {', '.join(backend_names())}.")
+    return BACKENDS[name]()
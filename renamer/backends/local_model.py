@@ -0,0 +1,170 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+# The in-process model needs PyTorch and Hugging Face transformers, which are
+# only imported when this backend is used: pip install torch transformers
+try:
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+except ImportError:
+    torch = None
+
+from renamer import config
+from renamer import metrics
+from renamer.backends import Backend, register
+
+# ---------------------------------------------------------------------------
+# In-process model backend.
+#
+# Runs a small instruction-tuned chat model (MODEL_NAME is a Hugging Face
+# model id or a local directory, e.g. "Qwen/Qwen2.5-0.5B-Instruct") on the
+# CPU or GPU of this machine, so no document text leaves it.
+#
+# Prompts from the worker threads are batched: a single thread owns the
+# model, takes up to LOCAL_BATCH_SIZE waiting prompts (waiting at most
+# LOCAL_BATCH_WAIT seconds for a batch to fill) and generates their replies
+# in one forward pass per token, which is much cheaper per prompt than one
+# generate() call each.
+# ---------------------------------------------------------------------------
+
+class Prompt:
+    """
+    A prompt waiting for the model, with the future that receives the reply.
+    """
+
+    def __init__(self, messages, max_new_tokens):
+        self.messages = messages
+        self.max_new_tokens = max_new_tokens
+        self.future = Future()
+
+@register
+class LocalModelBackend(Backend):
+    """
+    Backend that runs a transformers chat model in this process.
+    """
+
+    name = "local"
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.prompts = queue.Queue()
+        self.model = None
+        self.tokenizer = None
+        self.thread = None
+
+    def describe(self):
+        return f"local model {config.MODEL_NAME}"
+
+    def warm_up(self):
+        """
+        Load the model and start the batching thread, if not done yet.
+
+        Raises:
+            ImportError: If torch or transformers is not installed.
+        """
+        with self.lock:
+            if self.thread is not None:
+                return
+            if torch is None:
+                raise ImportError("The local backend needs PyTorch and transformers: pip install torch transformers")
+            if self.model is None:
+                print(f"Loading {config.MODEL_NAME}...")
+                self.tokenizer = AutoTokenizer.from_pretrained(config.MODEL_NAME)
+                # Pad on the left, so that the replies of a batch start at the same position.
+                self.tokenizer.padding_side = "left"
+                if self.tokenizer.pad_token is None:
+                    self.tokenizer.pad_token = self.tokenizer.eos_token
+                self.model = AutoModelForCausalLM.from_pretrained(config.MODEL_NAME)
+                self.model.eval()
+            self.thread = threading.Thread(target=self.run_batches, name="local-model", daemon=True)
+            self.thread.start()
+
+    def complete(self, messages, expected_output_tokens=100, response_format=None):
+        # Generation is not constrained to response_format; the prompts ask
+        # for JSON and the replies are validated.
+        self.warm_up()
+        # Leave room for the reply, as generation stops at the limit.
+        prompt = Prompt(messages, int(expected_output_tokens * 1.5) + 20)
+        self.prompts.put(prompt)
+        reply, prompt_tokens, completion_tokens = prompt.future.result()
+        metrics.add(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        return reply
+
+    def next_batch(self):
+        """
+        Wait for a prompt, then collect the prompts that arrive shortly after it.
+
+        Returns:
+            list: Up to LOCAL_BATCH_SIZE prompts, or an empty list on shutdown.
+        """
+        first = self.prompts.get()
+        if first is None:
+            return []
+        batch = [first]
+        while len(batch) < config.LOCAL_BATCH_SIZE:
+            try:
+                prompt = self.prompts.get(timeout=config.LOCAL_BATCH_WAIT)
+            except queue.Empty:
+                break
+            if prompt is None:
+                # Finish this batch; the shutdown marker is seen next time.
+                self.prompts.put(None)
+                break
+            batch.append(prompt)
+        return batch
+
+    def run_batches(self):
+        """
+        Body of the batching thread: answer batches of prompts until close().
+        """
+        while True:
+            batch = self.next_batch()
+            if not batch:
+                return
+            try:
+                results = self.generate(batch)
+            except Exception as e:
+                for prompt in batch:
+                    prompt.future.set_exception(e)
+                continue
+            for prompt, result in zip(batch, results):
+                prompt.future.set_result(result)
+
+    def generate(self, batch):
+        """
+        Generate the replies to a batch of prompts in one generate() call.
+
+        Parameters:
+            batch (list): The prompts.
+
+        Returns:
+            list: (reply, prompt_tokens, completion_tokens) for each prompt.
+        """
+        texts = [self.tokenizer.apply_chat_template(prompt.messages, tokenize=False, add_generation_prompt=True)
+                 for prompt in batch]
+        inputs = self.tokenizer(texts, return_tensors="pt", padding=True)
+        with torch.inference_mode():
+            # Greedy decoding, like temperature=0 with the API.
+            outputs = self.model.generate(
+                **inputs,
+                max_new_tokens=max(prompt.max_new_tokens for prompt in batch),
+                do_sample=False,
+                pad_token_id=self.tokenizer.pad_token_id
+            )
+        prompt_length = inputs["input_ids"].shape[1]
+        results = []
+        for i in range(len(batch)):
+            reply_ids = outputs[i][prompt_length:]
+            reply = self.tokenizer.decode(reply_ids, skip_special_tokens=True).strip()
+            prompt_tokens = int(inputs["attention_mask"][i].sum())
+            completion_tokens = int((reply_ids != self.tokenizer.pad_token_id).sum())
+            results.append((reply, prompt_tokens, completion_tokens))
+        return results
+
+    def close(self):
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            self.prompts.put(None)
+            thread.join()
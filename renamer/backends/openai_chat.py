@@ -0,0 +1,89 @@
+import threading
+
+from renamer import config
+from renamer import rate_limiter
+from renamer.backends import Backend, register
+
+# ---------------------------------------------------------------------------
+# OpenAI chat-completions backend.
+#
+# Talks to the OpenAI API, or to any server with an OpenAI-compatible
+# /v1/chat/completions endpoint (llama.cpp's llama-server, vLLM, Ollama,
+# LM Studio, ...) when BASE_URL is set. Such servers batch the concurrent
+# requests of the MAX_IN_FLIGHT workers on their side.
+#
+# The client and the rate limiter are created on first use and shared by
+# every worker thread. The Batch API modes use the same client. The openai
+# package (pip install openai) is only imported when the client is created,
+# so that commands which never call the API start quickly.
+# ---------------------------------------------------------------------------
+
+shared_lock = threading.Lock()
+client = None
+api_limiter = None
+
+def get_client():
+    """
+    Return the shared OpenAI client, creating it on first use.
+
+    Returns:
+        OpenAI: The client.
+
+    Raises:
+        ValueError: If no API key is configured for the OpenAI API.
+    """
+    global client
+    with shared_lock:
+        if client is None:
+            if not config.api_key and not config.BASE_URL:
+                raise ValueError("OpenAI API key not found. Please set api_key in renamer/config.py.")
+            from openai import OpenAI
+            # Retries are handled by rate_limiter, so the client's own retries are off.
+            # Self-hosted servers usually accept any key.
+            client = OpenAI(api_key=config.api_key or "unused", base_url=config.BASE_URL, max_retries=0)
+    return client
+
+def get_rate_limiter():
+    """
+    Return the shared rate limiter, creating it on first use.
+
+    With BASE_URL set, the configured limits are not applied: a self-hosted
+    server is only limited by what it reports in x-ratelimit-* headers.
+
+    Returns:
+        RateLimiter: The limiter.
+    """
+    global api_limiter
+    with shared_lock:
+        if api_limiter is None:
+            if config.BASE_URL:
+                api_limiter = rate_limiter.RateLimiter()
+            else:
+                api_limiter = rate_limiter.RateLimiter(config.REQUESTS_PER_MINUTE, config.TOKENS_PER_MINUTE)
+    return api_limiter
+
+@register
+class OpenAIBackend(Backend):
+    """
+    Backend for the OpenAI API and OpenAI-compatible servers.
+    """
+
+    name = "openai"
+
+    def describe(self):
+        return f"{config.MODEL_NAME} at {config.BASE_URL}" if config.BASE_URL else f"OpenAI {config.MODEL_NAME}"
+
+    def warm_up(self):
+        get_client()
+
+    def complete(self, messages, expected_output_tokens=100, response_format=None):
+        options = {"response_format": response_format} if response_format else {}
+        completion = rate_limiter.chat_completion(
+            get_client(), get_rate_limiter(), config.MAX_RETRIES,
+            expected_output_tokens=expected_output_tokens,
+            model=config.MODEL_NAME,
+            messages=messages,
+            temperature=0,
+            **options
+        )
+        return completion.choices[0].message.content
@@ -0,0 +1,285 @@
+# ---------------------------------------------------------------------------
+# Settings of the renamer engine.
+#
+# Edit the values below, or assign to them before calling the engine, for
+# example: config.SOURCE_DIR = "/tmp/inbox". The engine reads them when it
+# needs them, so changes made before a run take effect.
+# On the command line, a config file (--config), RENAMER_<SETTING>
+# environment variables and --set SETTING=VALUE override them; see
+# renamer.settings.
+# ---------------------------------------------------------------------------
+
+# ---------------------------------------------------------------------------
+# Set your source and destination directories.
+# Replace the placeholder paths with your actual directories.
+# ---------------------------------------------------------------------------
+SOURCE_DIR = r'/path/to/your/source/directory'
+DESTINATION_DIR = r'/path/to/your/destination/directory'
+
+# Also process files in subdirectories of SOURCE_DIR.
+# The destination directory is never scanned, even if it lies inside SOURCE_DIR.
+SCAN_RECURSIVE = True
+
+# Formats to process, by extractor name (for example ["pdf"]).
+# None processes every registered format (see renamer.extractors).
+FORMATS = None
+
+# ---------------------------------------------------------------------------
+# Set your OpenAI API key.
+# Replace "YOUR_API_KEY_HERE" with your actual OpenAI API key.
+# DO NOT commit your real API key to a public repository; the OPENAI_API_KEY
+# environment variable overrides this value.
+# The client is only created when the first request is sent.
+# ---------------------------------------------------------------------------
+api_key = "YOUR_API_KEY_HERE"
+
+# ---------------------------------------------------------------------------
+# Set the maximum number of files processed at the same time.
+# Each worker extracts text, waits for the OpenAI API and moves its file, so
+# a higher value overlaps more network latency. Set to 1 to process the files
+# strictly one at a time.
+# ---------------------------------------------------------------------------
+MAX_IN_FLIGHT = 8
+
+# ---------------------------------------------------------------------------
+# Model and metadata cache settings.
+# Inferred metadata is cached on disk, keyed by the extracted text, the model
+# name and the prompt version, so the same document is never sent to the API
+# twice. Bump PROMPT_VERSION whenever the prompt in renamer.inference changes.
+# Set CACHE_PATH to None to disable the cache.
+# With STRUCTURED_OUTPUT, the model's reply is constrained to a JSON schema
+# (Author a list of names, Title a string, Year a 4-digit integer or null).
+# Turn it off for OpenAI-compatible servers that reject response_format.
+# Replies are validated either way, and invalid fields get one short repair
+# prompt instead of a NULL file name.
+# ---------------------------------------------------------------------------
+MODEL_NAME = "gpt-4o-mini"
+PROMPT_VERSION = "2"
+STRUCTURED_OUTPUT = True
+CACHE_PATH = "metadata_cache.sqlite3"
+CACHE_MAX_ENTRIES = 100000
+
+# ---------------------------------------------------------------------------
+# Batch API settings.
+# In batch mode the prompts are written to BATCH_FILE, submitted through the
+# OpenAI Batch API, and the files are renamed once the results are back.
+# BATCH_POLL_INTERVAL is the number of seconds between status checks.
+# ---------------------------------------------------------------------------
+BATCH_FILE = "renamer_batch.jsonl"
+BATCH_POLL_INTERVAL = 60
+
+# ---------------------------------------------------------------------------
+# Plan and apply.
+# "python -m renamer plan" infers the metadata of every file but moves
+# nothing: the moves are written to PLAN_FILE for review. A file whose new
+# name is taken gets a number ("Title (2).pdf") with PLAN_COLLISIONS =
+# "suffix", or stays in place with "skip". "python -m renamer apply" then
+# executes the plan in bulk, copying up to MOVE_COPY_WORKERS files at once
+# to other devices, and logs every move to UNDO_LOG; "python -m renamer
+# undo" moves the files of the last apply back.
+# ---------------------------------------------------------------------------
+PLAN_FILE = "renamer_plan.json"
+PLAN_COLLISIONS = "suffix"
+UNDO_LOG = "renamer_undo.jsonl"
+MOVE_COPY_WORKERS = 4
+
+# With DRY_RUN (or --dry-run), the process and plan modes scan, extract,
+# look up the metadata cache and print the plan, but call no model and
+# change nothing: no file is moved and the journal, duplicate index and
+# metadata cache are not written.
+DRY_RUN = False
+
+# ---------------------------------------------------------------------------
+# Worker mode, for sharing one inbox between processes or machines.
+# "python -m renamer worker" processes only the files it claims in the work
+# queue at WORK_QUEUE_PATH (default: ".renamer_queue.sqlite3" in SOURCE_DIR),
+# so any number of workers can run on the same SOURCE_DIR without racing.
+# The queue must be on storage every worker reaches, with working file locks.
+# A claim lasts WORK_LEASE_SECONDS and is renewed while its worker runs; the
+# files of a worker that died are taken over once its leases expire. Files
+# are claimed WORK_CLAIM_BATCH at a time. A worker whose scan finds nothing
+# left to claim checks again every WORK_POLL_INTERVAL seconds while other
+# workers still hold leases, then exits. WORKER_ID names the worker in the
+# queue (default: host name and process id).
+# Each worker starts its own extraction processes. Set WORKERS_PER_MACHINE
+# to the number of workers run on each machine, so that the default pool of
+# one process per core is divided among them instead of multiplied.
+# The metadata cache, job journal, duplicate index and OCR cache use the
+# SQLITE_JOURNAL_MODE journal. WAL is the fastest, but needs shared memory,
+# which network file systems do not provide, so worker mode switches them to
+# DELETE (a rollback journal, like the work queue's).
+# ---------------------------------------------------------------------------
+WORK_QUEUE_PATH = None
+WORK_LEASE_SECONDS = 300
+WORK_CLAIM_BATCH = 32
+WORK_POLL_INTERVAL = 10
+WORKER_ID = None
+WORKERS_PER_MACHINE = 1
+SQLITE_JOURNAL_MODE = "WAL"
+
+# ---------------------------------------------------------------------------
+# Prompt packing.
+# When PACK_SIZE is greater than 1, the text of up to PACK_SIZE files is sent
+# to the model in a single request, which saves the repeated instructions and
+# one round-trip per file. Documents that the packed reply does not cover are
+# retried one at a time. Set to 1 to disable packing.
+# ---------------------------------------------------------------------------
+PACK_SIZE = 1
+
+# ---------------------------------------------------------------------------
+# Local metadata pre-extraction.
+# Before calling the model, the metadata embedded in the file (PDF document
+# info dictionary and XMP, Markdown front matter or "# Title" heading) is
+# combined with a scan of the text for DOI/arXiv ids and years. If the
+# confidence of that local result reaches LOCAL_CONFIDENCE_THRESHOLD and a
+# year was found, it is used and the model is not called.
+# Set the threshold above 1 to always call the model.
+# ---------------------------------------------------------------------------
+LOCAL_CONFIDENCE_THRESHOLD = 0.9
+
+# ---------------------------------------------------------------------------
+# Job journal.
+# The progress of every file (discovered, extracted, inferred, moved) is
+# recorded in JOURNAL_PATH. If a run is interrupted, the next run resumes each
+# file from its last completed stage instead of paying for inference again.
+# Set JOURNAL_PATH to None to disable the journal.
+# ---------------------------------------------------------------------------
+JOURNAL_PATH = "renamer_journal.sqlite3"
+
+# ---------------------------------------------------------------------------
+# Duplicate detection.
+# Every renamed file is recorded in DUPLICATE_INDEX_PATH with fingerprints of
+# its excerpt. A new file with the same text, or at least
+# DUPLICATE_MIN_SIMILARITY of its three-word phrases in common (a renamed
+# re-download, another export of the same paper), is then handled without
+# calling the model:
+#   "reuse"  rename it with the metadata of the earlier file (a copy with the
+#            same name already in DESTINATION_DIR is left in place as usual)
+#   "move"   move it to DUPLICATES_DIR (default: "duplicates" inside
+#            DESTINATION_DIR), named like the earlier file
+# Set DUPLICATE_MIN_SIMILARITY above 1 to only match identical text, and
+# DUPLICATE_INDEX_PATH to None to turn duplicate detection off.
+# ---------------------------------------------------------------------------
+DUPLICATE_INDEX_PATH = "renamer_duplicates.sqlite3"
+DUPLICATE_MIN_SIMILARITY = 0.8
+DUPLICATE_ACTION = "reuse"
+DUPLICATES_DIR = None
+
+# ---------------------------------------------------------------------------
+# Text excerpt.
+# The extracted text is reduced to an excerpt of at most EXCERPT_TOKEN_BUDGET
+# tokens: code blocks, embedded images, boilerplate, reference lists and
+# repeated headers are dropped, and the lines most likely to hold the title,
+# author and year are kept. The excerpt is then limited to MAX_CHARS
+# characters. Set EXCERPT_TOKEN_BUDGET to None to send the first MAX_CHARS
+# characters instead.
+# ---------------------------------------------------------------------------
+EXCERPT_TOKEN_BUDGET = 500
+MAX_CHARS = 3000
+
+# ---------------------------------------------------------------------------
+# Markdown reading.
+# Only the beginning of a Markdown file is read: at most MARKDOWN_MAX_CHARS
+# characters of text are kept for the excerpt, and at most MARKDOWN_MAX_BYTES
+# bytes are read, whatever the size of the file. Base64 data URIs (inlined
+# images) are skipped while reading, and so is front matter longer than
+# MARKDOWN_FRONT_MATTER_MAX characters. Files that are not UTF-8 are decoded
+# with the encoding detected from their first bytes.
+# ---------------------------------------------------------------------------
+MARKDOWN_MAX_CHARS = 32768
+MARKDOWN_MAX_BYTES = 1024 * 1024
+MARKDOWN_FRONT_MATTER_MAX = 8192
+
+# ---------------------------------------------------------------------------
+# Extraction process pool.
+# PDF text extraction is pure Python and holds the GIL, so it runs in up to
+# EXTRACTION_PROCESSES worker processes (None: one per CPU core; 0: extract in
+# the worker threads instead). Only the excerpt is sent back from a worker.
+# A file whose extraction takes longer than EXTRACTION_TIMEOUT seconds, or
+# needs more than EXTRACTION_MEMORY_LIMIT_MB of memory, is skipped. PDF files
+# are memory-mapped, so the memory limit must exceed the largest PDF. The
+# limits rely on Unix signals and resource limits and are not applied on Windows.
+# ---------------------------------------------------------------------------
+EXTRACTION_PROCESSES = None
+EXTRACTION_TIMEOUT = 60
+EXTRACTION_MEMORY_LIMIT_MB = 2048
+
+# ---------------------------------------------------------------------------
+# OCR of scanned PDFs.
+# With OCR_ENABLED, a PDF whose first page has no text layer is read with
+# OCR instead of being skipped: the top OCR_TOP_FRACTION of page 0 is
+# rasterized at OCR_DPI and read by tesseract in OCR_LANGUAGE. Needs
+# pypdfium2 (pip install pypdfium2) and the tesseract program.
+# OCR runs in OCR_PROCESSES low-priority worker processes, separate from the
+# extraction pool, so scans do not hold up the other files. A scan that takes
+# longer than OCR_TIMEOUT seconds is left in place. The text is cached by
+# file content and OCR settings in OCR_CACHE_PATH (None: no cache).
+# ---------------------------------------------------------------------------
+OCR_ENABLED = False
+OCR_PROCESSES = 1
+OCR_DPI = 150
+OCR_TOP_FRACTION = 0.4
+OCR_LANGUAGE = "eng"
+OCR_TIMEOUT = 120
+OCR_CACHE_PATH = "ocr_cache.sqlite3"
+
+# ---------------------------------------------------------------------------
+# Rate limiting and retries.
+# API calls are spread out so that together they stay under
+# REQUESTS_PER_MINUTE and TOKENS_PER_MINUTE. Once the API has answered, the
+# limits it reports in its x-ratelimit-* headers are used instead.
+# Rate-limit errors, timeouts and server errors are retried up to MAX_RETRIES
+# times with jittered exponential backoff. A file whose request still fails is
+# left in place instead of being renamed NULL-....
+# ---------------------------------------------------------------------------
+REQUESTS_PER_MINUTE = 500
+TOKENS_PER_MINUTE = 200000
+MAX_RETRIES = 6
+
+# ---------------------------------------------------------------------------
+# Inference backend.
+# INFERENCE_BACKEND picks where the prompts go (see renamer.backends):
+#   "openai"  the OpenAI API or, with BASE_URL set, any server with an
+#             OpenAI-compatible API (llama-server, vLLM, Ollama, LM Studio,
+#             e.g. "http://localhost:8000/v1"). With BASE_URL set, the rate
+#             limits above are not applied unless the server reports its own.
+#   "local"   a transformers model run in this process; MODEL_NAME is then a
+#             Hugging Face model id or directory. Needs torch and
+#             transformers. Up to LOCAL_BATCH_SIZE prompts that arrive within
+#             LOCAL_BATCH_WAIT seconds are generated together.
+# The Batch API modes always use the OpenAI API.
+# ---------------------------------------------------------------------------
+INFERENCE_BACKEND = "openai"
+BASE_URL = None
+LOCAL_BATCH_SIZE = 8
+LOCAL_BATCH_WAIT = 0.05
+
+# ---------------------------------------------------------------------------
+# Watch mode.
+# "python -m renamer watch" keeps running and processes every file that
+# arrives in SOURCE_DIR. A file is picked up once its size and modification
+# time have not changed for WATCH_SETTLE_SECONDS, so files that are still
+# being copied are left alone. WATCH_BACKEND is "inotify" (Linux), "poll"
+# (rescan SOURCE_DIR every WATCH_POLL_INTERVAL seconds) or "auto" (inotify
+# when available, otherwise polling).
+# ---------------------------------------------------------------------------
+WATCH_BACKEND = "auto"
+WATCH_SETTLE_SECONDS = 2.0
+WATCH_POLL_INTERVAL = 5.0
+
+# ---------------------------------------------------------------------------
+# Run metrics.
+# With METRICS_FORMAT set, the extract, infer and move stages of every file
+# are measured (wall-clock and CPU time, file size, prompt and completion
+# tokens, retries, errors) and a summary with a histogram per stage is
+# printed at the end of a run. The formats are:
+#   "summary"     only print the summary
+#   "jsonl"       also append one JSON line per stage to METRICS_PATH
+#   "prometheus"  also write the histograms and totals to METRICS_PATH in
+#                 Prometheus text format (e.g. for node_exporter's textfile
+#                 collector)
+# METRICS_PATH defaults to renamer_metrics.jsonl or renamer_metrics.prom.
+# Set METRICS_FORMAT to None to turn the measurements off.
+# ---------------------------------------------------------------------------
+METRICS_FORMAT = None
+METRICS_PATH = None
@@ -0,0 +1,126 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# ---------------------------------------------------------------------------
+# Streaming directory scanning and bounded dispatch for the renamer engine.
+#
+# scan_files() walks the source directory with os.scandir and yields matching
+# files one at a time, so processing starts on the first file right away and
+# memory stays flat on directories with hundreds of thousands of entries.
+# run_bounded() feeds those files to a thread pool while keeping only a
+# small, fixed number of them queued at any time.
+# ---------------------------------------------------------------------------
+
+def scan_files(root, extensions, recursive=True, exclude=()):
+    """
+    Yield the paths of the files under root that have one of the extensions.
+
+    The file type comes from the directory entry (cached by os.scandir), so
+    no extra stat call is made per file. Symbolic links to directories are
+    not followed.
+
+    Parameters:
+        root (str): The directory to scan.
+        extensions (tuple): Lower-case extensions such as ('.pdf',).
+        recursive (bool): Also scan subdirectories.
+        exclude (iterable): Directories to skip, for example a destination
+            directory that lies inside root.
+
+    Yields:
+        str: The path of each matching file.
+    """
+    excluded = {os.path.realpath(path) for path in exclude}
+    pending_dirs = [root]
+    while pending_dirs:
+        directory = pending_dirs.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive and os.path.realpath(entry.path) not in excluded:
+                                pending_dirs.append(entry.path)
+                        elif entry.name.lower().endswith(extensions) and entry.is_file():
+                            yield entry.path
+                    except OSError as e:
+                        print(f"Error reading '{entry.path}': {e}")
+        except OSError as e:
+            print(f"Error scanning directory '{directory}': {e}")
+
+def chunked(items, size):
+    """
+    Group an iterable into lists of at most size items, lazily.
+
+    Parameters:
+        items (iterable): The items to group.
+        size (int): The maximum group size.
+
+    Yields:
+        list: The next group of items.
+    """
+    group = []
+    for item in items:
+        group.append(item)
+        if len(group) >= size:
+            yield group
+            group = []
+    if group:
+        yield group
+
+def run_bounded(items, worker, max_workers, on_done=None):
+    """
+    Call worker(item) for every item, using up to max_workers threads.
+
+    Items are taken from the iterable only when a slot is free: at most
+    2 * max_workers items are submitted but not yet finished, so a generator
+    is never read far ahead of the workers. With max_workers <= 1 the items
+    are processed one by one in the calling thread.
+
+    Parameters:
+        items (iterable): The work items, typically a generator.
+        worker (callable): Function called with each item. Exceptions are
+            printed and do not stop the run.
+        max_workers (int): Maximum number of items processed at once.
+        on_done (callable): Optional function called as on_done(count, item)
+            after each item finishes, where count is the number finished so far.
+
+    Returns:
+        int: The number of items processed.
+    """
+    count = 0
+    if max_workers <= 1:
+        for item in items:
+            try:
+                worker(item)
+            except Exception as e:
+                print(f"Error processing '{item}': {e}")
+            count += 1
+            if on_done is not None:
+                on_done(count, item)
+        return count
+
+    max_pending = 2 * max_workers
+    pending = {}
+
+    def collect(done):
+        nonlocal count
+        for future in done:
+            item = pending.pop(future)
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error processing '{item}': {e}")
+            count += 1
+            if on_done is not None:
+                on_done(count, item)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for item in items:
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[executor.submit(worker, item)] = item
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    return count
@@ -0,0 +1,246 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+
+# ---------------------------------------------------------------------------
+# Near-duplicate index for the renamer engine.
+#
+# Every renamed document is recorded with two fingerprints of its excerpt:
+#   - a SHA-256 of the normalized words (lower case, no punctuation or
+#     layout), which matches the same text exactly, and
+#   - a MinHash signature of its three-word shingles, which estimates how
+#     many shingles two texts share (their Jaccard similarity), so another
+#     export of the same paper, or a copy with a download banner, still matches.
+#
+# A later file whose fingerprints match can reuse the recorded metadata
+# without calling the model. To find similar signatures without comparing
+# against every entry, the signature is cut into bands (locality-sensitive
+# hashing) and each band hash has its own SQLite index: similar texts share
+# at least one band with high probability, dissimilar ones almost never. A
+# lookup therefore reads a handful of candidates, even with hundreds of
+# thousands of rows.
+# ---------------------------------------------------------------------------
+
+SIGNATURE_SIZE = 32
+BAND_COUNT = 8
+ROWS_PER_BAND = SIGNATURE_SIZE // BAND_COUNT
+SHINGLE_SIZE = 3
+# Texts with fewer shingles are only matched exactly: their signature is unreliable.
+MIN_SHINGLES = 8
+
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def normalize_words(text):
+    """
+    Split a text into lower-case words, dropping punctuation and layout.
+
+    Parameters:
+        text (str): The text.
+
+    Returns:
+        list: The words.
+    """
+    return WORD_PATTERN.findall(text.lower())
+
+def content_hash(words):
+    """
+    Hash the normalized words of a text.
+
+    Parameters:
+        words (list): Words from normalize_words().
+
+    Returns:
+        str: A hex SHA-256 digest.
+    """
+    return hashlib.sha256(" ".join(words).encode('utf-8')).hexdigest()
+
+def minhash(words):
+    """
+    Compute the MinHash signature of the word shingles of a text.
+
+    One-permutation hashing: each shingle is hashed once, the low bits of
+    the hash pick one of SIGNATURE_SIZE bins and each bin keeps its smallest
+    value. An empty bin borrows the value of the next non-empty one, so that
+    short texts still give comparable signatures.
+
+    Parameters:
+        words (list): Words from normalize_words().
+
+    Returns:
+        tuple: SIGNATURE_SIZE integers, or None if the text has fewer than
+            MIN_SHINGLES shingles.
+    """
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    bins = [None] * SIGNATURE_SIZE
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        index, value = value % SIGNATURE_SIZE, (value // SIGNATURE_SIZE) & 0xFFFFFFFF
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+    for index in range(SIGNATURE_SIZE):
+        offset = 1
+        while bins[index] is None:
+            bins[index] = bins[(index + offset) % SIGNATURE_SIZE]
+            offset += 1
+    return tuple(bins)
+
+def band_keys(signature):
+    """
+    Hash each band of a signature to a signed 64-bit key.
+
+    Parameters:
+        signature (tuple): A signature from minhash().
+
+    Returns:
+        list: BAND_COUNT keys; the band number is part of the hash.
+    """
+    keys = []
+    for band in range(BAND_COUNT):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(struct.pack(f">B{ROWS_PER_BAND}I", band, *rows), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'big', signed=True))
+    return keys
+
+def similarity(signature, other):
+    """
+    Estimate the Jaccard similarity of two texts from their signatures.
+
+    Returns:
+        float: The share of equal signature values, between 0 and 1.
+    """
+    return sum(1 for a, b in zip(signature, other) if a == b) / SIGNATURE_SIZE
+
+class DuplicateIndex:
+    """
+    SQLite index of processed documents, searchable by exact and near-duplicate text.
+
+    The index can be shared between worker threads.
+    """
+
+    def __init__(self, path, min_similarity=0.8, journal_mode="WAL"):
+        """
+        Open (and create if needed) the index database.
+
+        Parameters:
+            path (str): Path of the SQLite database file.
+            min_similarity (float): Smallest estimated share of common
+                shingles that still counts as a duplicate. Above 1, only
+                exact duplicates match.
+            journal_mode (str): SQLite journal mode; "DELETE" on storage
+                shared by several workers, where WAL does not work.
+        """
+        self.path = path
+        self.min_similarity = min_similarity
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # Wait for the locks of other workers instead of failing at once.
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.connection.execute(f"PRAGMA journal_mode={journal_mode}")
+        band_columns = "".join(f" band{i} INTEGER," for i in range(BAND_COUNT))
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " id INTEGER PRIMARY KEY,"
+            " content_hash TEXT NOT NULL,"
+            " signature BLOB,"
+            f"{band_columns}"
+            " path TEXT NOT NULL,"
+            " target TEXT,"
+            " metadata TEXT NOT NULL,"
+            " added REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS documents_content_hash ON documents (content_hash)"
+        )
+        for i in range(BAND_COUNT):
+            self.connection.execute(f"CREATE INDEX IF NOT EXISTS documents_band{i} ON documents (band{i})")
+        self.connection.commit()
+
+    def find(self, text, path=None):
+        """
+        Find a recorded document with the same or nearly the same text.
+
+        Parameters:
+            text (str): The excerpt of the new file.
+            path (str): The path of the new file. Entries recorded for this
+                path (by an earlier run, or a plan that was not applied or
+                was undone) are not matches: a file is not its own duplicate.
+
+        Returns:
+            dict or None: The most similar match, with the keys "path",
+                "target" (where it was moved), "metadata" and "similarity"
+                (1.0 for the same text), or None if there is no match.
+        """
+        words = normalize_words(text)
+        if not words:
+            return None
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT path, target, metadata FROM documents WHERE content_hash = ? AND path IS NOT ? LIMIT 1",
+                (content_hash(words), path)
+            ).fetchone()
+        if row is not None:
+            return {"path": row[0], "target": row[1], "metadata": json.loads(row[2]), "similarity": 1.0}
+
+        signature = minhash(words) if self.min_similarity <= 1 else None
+        if signature is None:
+            return None
+        with self.lock:
+            conditions = " OR ".join(f"band{i} = ?" for i in range(BAND_COUNT))
+            candidates = self.connection.execute(
+                f"SELECT signature, path, target, metadata FROM documents WHERE ({conditions}) AND path IS NOT ?",
+                (*band_keys(signature), path)
+            ).fetchall()
+
+        best = None
+        for packed, path, target, metadata in candidates:
+            score = similarity(signature, struct.unpack(f">{SIGNATURE_SIZE}I", packed))
+            if score >= self.min_similarity and (best is None or score > best["similarity"]):
+                best = {"path": path, "target": target, "metadata": metadata, "similarity": score}
+        if best is not None:
+            best["metadata"] = json.loads(best["metadata"])
+        return best
+
+    def add(self, text, metadata, path, target=None):
+        """
+        Record a processed document.
+
+        Parameters:
+            text (str): The excerpt the metadata was inferred from.
+            metadata (dict): The metadata.
+            path (str): The original path of the file.
+            target (str): Where the file was moved, or None.
+        """
+        words = normalize_words(text)
+        if not words:
+            return
+        signature = minhash(words)
+        if signature is not None:
+            packed, keys = struct.pack(f">{SIGNATURE_SIZE}I", *signature), band_keys(signature)
+        else:
+            packed, keys = None, [None] * BAND_COUNT
+        band_columns = ", ".join(f"band{i}" for i in range(BAND_COUNT))
+        with self.lock:
+            self.connection.execute(
+                f"INSERT INTO documents (content_hash, signature, {band_columns}, path, target, metadata, added)"
+                f" VALUES (?, ?, {', '.join('?' * BAND_COUNT)}, ?, ?, ?, ?)",
+                (content_hash(words), packed, *keys, path, target, json.dumps(metadata), time.time())
+            )
+            self.connection.commit()
+
+    def close(self):
+        """
+        Close the database connection.
+        """
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,1085 @@
+import os
+import argparse
+import threading
+
+from renamer import backends
+from renamer import config
+from renamer import directory_scanner
+from renamer import duplicate_index
+from renamer import extraction_pool
+from renamer import folder_watcher
+from renamer import inference
+from renamer import job_journal
+from renamer import metrics
+from renamer import naming
+from renamer import ocr
+from renamer import openai_batch
+from renamer import rename_plan
+from renamer import settings
+from renamer import text_excerpt
+from renamer import work_queue
+from renamer.extractors import get_extractors, extractor_for
+
+# ---------------------------------------------------------------------------
+# The renaming pipeline.
+#
+# Every file goes through the same stages whatever its format: extract (by
+# the extractor registered for its extension), excerpt, local metadata
+# guess, inference (cached, rate-limited, optionally packed), rename/move.
+# Files whose text matches an already renamed document (see
+# renamer.duplicate_index) skip the guess and the inference. Scanned PDFs are
+# handed to the OCR pool (see renamer.ocr), which finishes them on its own
+# threads.
+# A run scans SOURCE_DIR once for all selected formats and processes the
+# files on one bounded worker pool, while the scan is still going.
+# In plan mode the moves are collected and written to a plan file instead of
+# being made (see renamer.rename_plan). A dry run plans the same way but
+# never calls the model. In worker mode only the files claimed in a work
+# queue shared with other workers are processed (see renamer.work_queue).
+#
+# The engine imports quickly: the OpenAI SDK, PyPDF2, tiktoken,
+# charset-normalizer, pypdfium2 and the backends' libraries are only imported
+# when first needed, so per-file invocations and --help do not pay for them.
+#
+# The extract, infer and move stages are measured by renamer.metrics when
+# METRICS_FORMAT is set.
+# ---------------------------------------------------------------------------
+
+shared_lock = threading.Lock()
+journal = None
+journal_opened = False
+duplicates = None
+duplicates_opened = False
+pool = None
+ocr_pool = None
+ocr_checked = False
+# Moves collected in plan mode, or None when files are moved right away.
+planned_moves = None
+# Files a dry run would send to the model, or None outside dry runs.
+unresolved = None
+# The shared work queue in worker mode, or None.
+claim_queue = None
+# Claimed files handed to the OCR pool; process_with_ocr() completes their claims.
+ocr_claims = set()
+
+def get_journal():
+    """
+    Return the shared job journal, opening it on first use.
+
+    Returns:
+        JobJournal or None: The journal, or None if JOURNAL_PATH is not set
+            or in a dry run.
+    """
+    global journal, journal_opened
+    with shared_lock:
+        if not journal_opened:
+            if config.JOURNAL_PATH and not config.DRY_RUN:
+                journal = job_journal.JobJournal(config.JOURNAL_PATH, journal_mode=config.SQLITE_JOURNAL_MODE)
+            journal_opened = True
+    return journal
+
+def get_duplicate_index():
+    """
+    Return the shared duplicate index, opening it on first use.
+
+    Returns:
+        DuplicateIndex or None: The index, or None if DUPLICATE_INDEX_PATH is
+            not set (or, in a dry run, does not exist yet).
+    """
+    global duplicates, duplicates_opened
+    with shared_lock:
+        if not duplicates_opened:
+            index_path = config.DUPLICATE_INDEX_PATH
+            if index_path and not (config.DRY_RUN and not os.path.exists(index_path)):
+                duplicates = duplicate_index.DuplicateIndex(index_path, config.DUPLICATE_MIN_SIMILARITY,
+                                                            config.SQLITE_JOURNAL_MODE)
+            duplicates_opened = True
+    return duplicates
+
+def get_extraction_pool():
+    """
+    Return the shared extraction process pool, creating it on first use.
+
+    In worker mode, the default pool (one process per core) is divided
+    among the WORKERS_PER_MACHINE workers of this machine.
+
+    Returns:
+        ExtractionPool or None: The pool, or None if EXTRACTION_PROCESSES is 0.
+    """
+    global pool
+    with shared_lock:
+        if pool is None and config.EXTRACTION_PROCESSES != 0:
+            processes = config.EXTRACTION_PROCESSES
+            if processes is None and claim_queue is not None:
+                # The workers on this machine share its cores.
+                processes = max(1, (os.cpu_count() or 1) // max(1, config.WORKERS_PER_MACHINE))
+            pool = extraction_pool.ExtractionPool(
+                processes, config.EXTRACTION_TIMEOUT, config.EXTRACTION_MEMORY_LIMIT_MB
+            )
+        return pool
+
+def shutdown_extraction_pool():
+    """
+    Stop the extraction worker processes, if they were started.
+    """
+    global pool
+    with shared_lock:
+        current_pool, pool = pool, None
+    if current_pool is not None:
+        current_pool.shutdown()
+
+def get_ocr_pool():
+    """
+    Return the shared OCR pool, creating it on first use.
+
+    Returns:
+        OcrPool or None: The pool, or None if OCR is turned off or cannot run
+            on this machine.
+    """
+    global ocr_pool, ocr_checked
+    with shared_lock:
+        if ocr_pool is None and config.OCR_ENABLED and not ocr_checked:
+            ocr_checked = True
+            missing = ocr.missing_requirement()
+            if missing:
+                print(f"OCR is turned off: {missing}.")
+            else:
+                ocr_pool = ocr.OcrPool(
+                    config.OCR_PROCESSES, config.OCR_DPI, config.OCR_TOP_FRACTION, config.OCR_LANGUAGE,
+                    config.OCR_TIMEOUT, config.EXTRACTION_MEMORY_LIMIT_MB, config.OCR_CACHE_PATH,
+                    config.SQLITE_JOURNAL_MODE, cache_read_only=config.DRY_RUN
+                )
+        return ocr_pool
+
+def shutdown_ocr_pool(cancel=False):
+    """
+    Wait for the files queued for OCR, then stop the OCR pool, if it was started.
+
+    Parameters:
+        cancel (bool): Drop the files still waiting for OCR instead.
+    """
+    global ocr_pool, ocr_checked
+    with shared_lock:
+        current_pool, ocr_pool = ocr_pool, None
+        ocr_checked = False
+    if current_pool is not None:
+        current_pool.shutdown(cancel)
+
+def extract(path, extractor):
+    """
+    Extract the text and embedded metadata of a file and reduce the text to
+    the excerpt sent to the model.
+
+    The text is reduced to a token-budgeted excerpt (see EXCERPT_TOKEN_BUDGET)
+    and then limited to MAX_CHARS characters. CPU-bound extractors run in the
+    extraction process pool, other extractors in the calling thread.
+
+    Parameters:
+        path (str): The file path.
+        extractor (Extractor): The extractor for the file's format.
+
+    Returns:
+        tuple: (text, embedded), or ("", {}) if the file cannot be read.
+    """
+    current_pool = get_extraction_pool() if extractor.cpu_bound else None
+    with metrics.stage("extract", path) as stage:
+        try:
+            if current_pool is not None:
+                text, embedded, cpu_seconds = current_pool.extract(
+                    path, extractor.name, config.EXCERPT_TOKEN_BUDGET, config.MAX_CHARS
+                )
+                # CPU time spent in the worker process.
+                stage.add(cpu_s=cpu_seconds)
+            else:
+                text, embedded, _ = extraction_pool.extract_excerpt(
+                    path, extractor.name, config.EXCERPT_TOKEN_BUDGET, config.MAX_CHARS
+                )
+            return text, embedded
+        except MemoryError:
+            print(f"Error extracting text from {path}: the memory limit of "
+                  f"{config.EXTRACTION_MEMORY_LIMIT_MB} MB was exceeded.")
+        except Exception as e:
+            print(f"Error extracting text from {path}: {e}")
+        stage.add(errors=1)
+    return "", {}
+
+def record_stage(path, state, **data):
+    """
+    Record in the job journal that a file reached a stage.
+
+    Does nothing when the journal is disabled.
+
+    Parameters:
+        path (str): The file path.
+        state (str): One of the job_journal stage constants.
+        **data: Stage details to store.
+    """
+    current_journal = get_journal()
+    if current_journal is not None:
+        current_journal.record(path, state, **data)
+
+def load_or_extract(path, extractor):
+    """
+    Resume a file from the job journal, or extract its text.
+
+    Parameters:
+        path (str): The file path.
+        extractor (Extractor): The extractor for the file's format.
+
+    Returns:
+        tuple: (metadata, text, embedded). metadata is only set when the
+            journal already holds inferred metadata for this exact file;
+            otherwise the text and embedded metadata come from the journal or
+            a fresh extraction.
+    """
+    current_journal = get_journal()
+    entry = current_journal.get(path) if current_journal is not None else None
+    if entry is not None and entry["state"] == job_journal.INFERRED:
+        print("Resuming with the metadata recorded in the journal.")
+        return entry["data"]["metadata"], "", {}
+    if entry is not None and entry["state"] == job_journal.EXTRACTED:
+        print("Resuming with the text recorded in the journal.")
+        return None, entry["data"]["text"], entry["data"].get("embedded", {})
+
+    record_stage(path, job_journal.DISCOVERED)
+    text, embedded = extract(path, extractor)
+    record_stage(path, job_journal.EXTRACTED, text=text, embedded=embedded)
+    return None, text, embedded
+
+def find_duplicate(path, text):
+    """
+    Look for an already renamed document with the same or nearly the same text.
+
+    Parameters:
+        path (str): The file path.
+        text (str): The excerpt of the file.
+
+    Returns:
+        dict or None: The match (see DuplicateIndex.find()), or None.
+    """
+    index = get_duplicate_index()
+    if index is None or not text.strip():
+        return None
+    duplicate = index.find(text, path)
+    if duplicate is not None:
+        print(f"'{path}' duplicates '{duplicate['path']}' (similarity {duplicate['similarity']:.2f}).")
+    return duplicate
+
+def move_duplicate(path, duplicate, extractor):
+    """
+    Move a duplicate to DUPLICATES_DIR, named after the metadata of the original.
+
+    Parameters:
+        path (str): The file path.
+        duplicate (dict): The match returned by find_duplicate().
+        extractor (Extractor): The extractor for the file's format.
+    """
+    duplicates_dir = config.DUPLICATES_DIR or os.path.join(config.DESTINATION_DIR, "duplicates")
+    new_path = move_or_plan(path, duplicate["metadata"], duplicates_dir, extractor)
+    if new_path is not None:
+        record_stage(path, job_journal.MOVED, target=new_path)
+
+def resolve_duplicate(path, text, extractor):
+    """
+    Handle a file that duplicates an already renamed document, as set by DUPLICATE_ACTION.
+
+    Parameters:
+        path (str): The file path.
+        text (str): The excerpt of the file.
+        extractor (Extractor): The extractor for the file's format.
+
+    Returns:
+        tuple: (done, metadata). done is True if the file was moved to the
+            duplicates directory; otherwise metadata holds the metadata to
+            reuse, or None if the file is not a duplicate.
+    """
+    duplicate = find_duplicate(path, text)
+    if duplicate is None:
+        return False, None
+    if config.DUPLICATE_ACTION == "move":
+        move_duplicate(path, duplicate, extractor)
+        return True, None
+    return False, duplicate["metadata"]
+
+def move_or_plan(path, metadata, directory, extractor):
+    """
+    Rename/move a file, or in plan mode add the move to the plan.
+
+    Parameters:
+        path (str): The file path.
+        metadata (dict): A dictionary containing "Author", "Title", and "Year".
+        directory (str): The destination directory.
+        extractor (Extractor): The extractor for the file's format.
+
+    Returns:
+        str or None: The new file path, or None if the file was not moved
+            (always in plan mode).
+    """
+    with shared_lock:
+        if planned_moves is not None:
+            planned_moves.append({"source": path, "metadata": metadata, "directory": directory,
+                                  "extension": extractor.output_extension})
+            print(f"Planned: '{path}' -> '{directory}'")
+            return None
+    with metrics.stage("move", path) as stage:
+        new_path = naming.rename_and_move(path, metadata, directory, extractor.output_extension)
+        if new_path is None:
+            stage.add(errors=1)
+    return new_path
+
+def finish_file(path, metadata, extractor, text=""):
+    """
+    Journal the metadata, then rename/move the file and journal where it went.
+
+    NULL fallbacks are not journaled, so an interrupted run retries them.
+    Moved (or, in plan mode, planned) files are added to the duplicate index,
+    if text is given.
+
+    Parameters:
+        path (str): The file path.
+        metadata (dict): A dictionary containing "Author", "Title", and "Year".
+        extractor (Extractor): The extractor for the file's format.
+        text (str): The excerpt the metadata belongs to, or "" to leave the
+            file out of the duplicate index.
+    """
+    if any(value != "NULL" for value in metadata.values()):
+        record_stage(path, job_journal.INFERRED, metadata=metadata)
+    new_path = move_or_plan(path, metadata, config.DESTINATION_DIR, extractor)
+    if new_path is not None:
+        record_stage(path, job_journal.MOVED, target=new_path)
+    if (new_path is not None or planned_moves is not None) and not config.DRY_RUN:
+        index = get_duplicate_index()
+        if index is not None and text.strip() and any(value != "NULL" for value in metadata.values()):
+            index.add(text, metadata, path, new_path)
+
+def queue_for_ocr(path, extractor, embedded):
+    """
+    Hand a file without a text layer to the OCR pool, if OCR is available.
+
+    The OCR pool finishes the file on its own threads (see process_with_ocr()).
+
+    Parameters:
+        path (str): The file path.
+        extractor (Extractor): The extractor for the file's format.
+        embedded (dict): The embedded metadata of the file.
+
+    Returns:
+        bool: True if the file was queued.
+    """
+    current_pool = get_ocr_pool() if extractor.ocr else None
+    if current_pool is None:
+        return False
+    print(f"No text layer in '{path}'. Queued for OCR.")
+    with shared_lock:
+        if claim_queue is not None:
+            ocr_claims.add(path)
+    current_pool.submit(path, process_with_ocr, current_pool, path, extractor, embedded)
+    return True
+
+def process_with_ocr(current_pool, path, extractor, embedded):
+    """
+    Read a scanned file with OCR, then infer its metadata and rename/move it.
+
+    Runs on an OCR pool thread. A file that cannot be read is left in place.
+    In worker mode, the file's claim is completed afterwards.
+
+    Parameters:
+        current_pool (OcrPool): The OCR pool.
+        path (str): The file path.
+        extractor (Extractor): The extractor for the file's format.
+        embedded (dict): The embedded metadata of the file.
+    """
+    try:
+        with metrics.stage("ocr", path) as stage:
+            try:
+                text, cpu_seconds = current_pool.read(path)
+            except Exception as e:
+                print(f"Error reading '{path}' with OCR: {e}")
+                stage.add(errors=1)
+                return
+            # CPU time spent in the worker process and in tesseract.
+            stage.add(cpu_s=cpu_seconds)
+            if config.EXCERPT_TOKEN_BUDGET:
+                text = text_excerpt.make_excerpt(text, config.EXCERPT_TOKEN_BUDGET)
+            text = text[:config.MAX_CHARS]
+        print(f"\nRead {len(text)} characters from '{path}' with OCR.")
+        record_stage(path, job_journal.EXTRACTED, text=text, embedded=embedded)
+        process_text(path, extractor, text, embedded, allow_ocr=False)
+    finally:
+        with shared_lock:
+            ocr_claims.discard(path)
+        complete_claims([path])
+
+def complete_claims(paths):
+    """
+    Mark claimed files as finished in the shared work queue.
+
+    Files waiting in the OCR pool are skipped; their claim is completed
+    once they are read. Does nothing outside worker mode.
+
+    Parameters:
+        paths (list): The file paths.
+    """
+    with shared_lock:
+        queue = claim_queue
+        finished = [path for path in paths if path not in ocr_claims]
+    if queue is not None:
+        for path in finished:
+            queue.complete(path)
+
+def report_missing_metadata(path):
+    """
+    Report a file left in place for lack of metadata. In a dry run, the file
+    is listed among those that would be sent to the model.
+
+    Parameters:
+        path (str): The file path.
+    """
+    with shared_lock:
+        if unresolved is not None:
+            unresolved.append(path)
+            return
+    print(f"No metadata available for '{path}'. Leaving it in place.")
+
+def process_file(path):
+    """
+    Process a single file: extract its text, infer metadata, and rename/move
+    the file based on the metadata.
+
+    The model is not called when the file duplicates an already renamed
+    document, when the metadata embedded in the file is good enough, or when
+    the job journal already holds the metadata from an interrupted run.
+    Files without text are queued for OCR when OCR_ENABLED is set.
+
+    Parameters:
+        path (str): The file path.
+    """
+    print(f"\nProcessing '{path}'...")
+    extractor = extractor_for(path)
+    metadata, text, embedded = load_or_extract(path, extractor)
+    process_text(path, extractor, text, embedded, metadata)
+
+def process_text(path, extractor, text, embedded, metadata=None, allow_ocr=True):
+    """
+    Infer the metadata of an extracted file and rename/move it.
+
+    Parameters:
+        path (str): The file path.
+        extractor (Extractor): The extractor for the file's format.
+        text (str): The excerpt of the file.
+        embedded (dict): The embedded metadata of the file.
+        metadata (dict): Metadata recorded in the journal, or None.
+        allow_ocr (bool): Queue the file for OCR if it has no text.
+    """
+    new_text = text
+    if metadata is None:
+        done, metadata = resolve_duplicate(path, text, extractor)
+        if done:
+            return
+        if metadata is not None:
+            # Already in the index.
+            new_text = ""
+    if metadata is None:
+        # Use the embedded metadata if it is good enough.
+        metadata = inference.guess_local_metadata(text, embedded)
+    if metadata is None:
+        if not text.strip():
+            if allow_ocr and queue_for_ocr(path, extractor, embedded):
+                return
+            print(f"No text extracted from '{path}'. Skipping...")
+            return
+        with metrics.stage("infer", path) as stage:
+            metadata = inference.infer_metadata(text)
+            if metadata is None:
+                stage.add(errors=1)
+    if metadata is None:
+        report_missing_metadata(path)
+        return
+    print(f"Inferred Metadata: {metadata}")
+    finish_file(path, metadata, extractor, new_text)
+
+def process_group(paths):
+    """
+    Process several files with a single packed API call.
+
+    The files may be of different formats.
+
+    Parameters:
+        paths (list): The file paths.
+    """
+    texts = {}
+    new_texts = {}
+    metadata_by_path = {}
+    for path in paths:
+        print(f"\nProcessing '{path}'...")
+        metadata, text, embedded = load_or_extract(path, extractor_for(path))
+        if metadata is None:
+            done, metadata = resolve_duplicate(path, text, extractor_for(path))
+            if done:
+                continue
+            if metadata is None:
+                new_texts[path] = text
+        if metadata is None:
+            metadata = inference.guess_local_metadata(text, embedded)
+        if metadata is not None:
+            metadata_by_path[path] = metadata
+        elif not text.strip():
+            if not queue_for_ocr(path, extractor_for(path), embedded):
+                print(f"No text extracted from '{path}'. Skipping...")
+        else:
+            texts[path] = text
+
+    # Infer the remaining metadata at once, then rename and move each file.
+    if texts:
+        with metrics.stage("infer") as stage:
+            packed_metadata = inference.infer_metadata_packed(texts)
+            stage.add(errors=sum(1 for metadata in packed_metadata.values() if metadata is None))
+        metadata_by_path.update(packed_metadata)
+    for path, metadata in metadata_by_path.items():
+        if metadata is None:
+            report_missing_metadata(path)
+            continue
+        print(f"Inferred Metadata for '{path}': {metadata}")
+        finish_file(path, metadata, extractor_for(path), new_texts.get(path, ""))
+
+def iter_files(extractors):
+    """
+    Yield the files of the given formats in the source directory as they are found.
+
+    Subdirectories are scanned too if SCAN_RECURSIVE is set. The source
+    directory is scanned once, whatever the number of formats.
+
+    Parameters:
+        extractors (list): The extractors of the formats to process.
+
+    Returns:
+        generator: The full paths of the matching files.
+    """
+    extensions = tuple(ext for extractor in extractors for ext in extractor.extensions)
+    return directory_scanner.scan_files(
+        config.SOURCE_DIR, extensions, config.SCAN_RECURSIVE, exclude=[config.DESTINATION_DIR]
+    )
+
+def iter_paths(paths, extractors):
+    """
+    Yield the files named on the command line that have one of the formats.
+
+    Parameters:
+        paths (list): File paths.
+        extractors (list): The extractors of the formats to process.
+
+    Yields:
+        str: The absolute path of each file to process.
+    """
+    for path in paths:
+        if not os.path.isfile(path):
+            print(f"'{path}' is not a file. Skipping.")
+        elif extractor_for(path, extractors) is None:
+            print(f"'{path}' is not a {describe_formats(extractors)} file. Skipping.")
+        else:
+            yield os.path.abspath(path)
+
+def describe_formats(extractors):
+    """
+    Return a readable list of format names, e.g. "PDF or Markdown".
+
+    Parameters:
+        extractors (list): The extractors.
+
+    Returns:
+        str: The format labels.
+    """
+    return " or ".join(extractor.label for extractor in extractors)
+
+def process_directory(formats=None, paths=None):
+    """
+    Process all files of the selected formats in the source directory, or
+    the files given in paths.
+
+    Up to MAX_IN_FLIGHT files (or groups of PACK_SIZE files when packing is
+    enabled) are processed concurrently, so the OpenAI API calls overlap
+    instead of running back to back. Files are processed while the directory
+    is still being scanned.
+
+    With METRICS_FORMAT set, the stages of every file are measured and a
+    summary is printed at the end. In worker mode (see work_directory()),
+    only the files claimed in the shared work queue are processed.
+
+    Parameters:
+        formats (list): Extractor names (default: FORMATS, or all formats).
+        paths (list): Files to process instead of scanning the source
+            directory, or None.
+    """
+    extractors = get_extractors(formats or config.FORMATS)
+    # Ensure the destination directory exists.
+    if not config.DRY_RUN:
+        os.makedirs(config.DESTINATION_DIR, exist_ok=True)
+    if config.METRICS_FORMAT:
+        metrics.start_run(config.METRICS_FORMAT, config.METRICS_PATH)
+
+    queue = claim_queue
+    if queue is not None:
+        files = work_queue.claimed_files(queue, lambda: iter_files(extractors),
+                                         config.WORK_CLAIM_BATCH, config.WORK_POLL_INTERVAL)
+    elif paths:
+        files = iter_paths(paths, extractors)
+    else:
+        files = iter_files(extractors)
+    if config.PACK_SIZE > 1:
+        # Each work item is a group of files sharing one packed API call.
+        work_items = directory_scanner.chunked(files, config.PACK_SIZE)
+        worker, unit = process_group, "group"
+    else:
+        work_items = files
+        worker, unit = process_file, "file"
+
+    if queue is not None:
+        process = worker
+
+        def worker(item):
+            try:
+                process(item)
+            finally:
+                complete_claims(item if isinstance(item, list) else [item])
+
+    def report_progress(count, item):
+        print(f"\nFinished {unit} {count}")
+
+    # Extraction, inference and renaming overlap across the worker threads.
+    try:
+        processed = directory_scanner.run_bounded(work_items, worker, config.MAX_IN_FLIGHT, report_progress)
+        # Let the scans still waiting for OCR finish.
+        shutdown_ocr_pool()
+    finally:
+        shutdown_ocr_pool(cancel=True)
+        shutdown_extraction_pool()
+        inference.close_backend()
+        # Keep the progress made so far, even after Ctrl-C.
+        current_journal = get_journal()
+        if current_journal is not None:
+            current_journal.flush()
+        metrics.finish_run()
+
+    if not processed:
+        if queue is not None:
+            print(f"No unclaimed {describe_formats(extractors)} files left in {config.SOURCE_DIR}")
+        elif paths:
+            print(f"None of the given files is a {describe_formats(extractors)} file.")
+        else:
+            print(f"No {describe_formats(extractors)} files found in {config.SOURCE_DIR}")
+        return
+    print("\nProcessing complete!")
+
+def work_directory(queue_path=None, formats=None):
+    """
+    Worker mode: process the files of the source directory that this worker
+    claims in a work queue shared with other workers, on this or other machines.
+
+    Each worker runs its own pipeline (MAX_IN_FLIGHT files at a time, packing,
+    extraction processes), so throughput grows with the number of workers.
+    The worker exits when no file is left to claim and no other worker holds
+    a lease that could still expire. The cache, journal and duplicate index
+    use a rollback journal instead of WAL, so that they can be shared too.
+
+    Parameters:
+        queue_path (str): Path of the work queue database (default
+            WORK_QUEUE_PATH, or ".renamer_queue.sqlite3" in SOURCE_DIR).
+        formats (list): Extractor names (default: FORMATS, or all formats).
+    """
+    global claim_queue
+    queue_path = queue_path or config.WORK_QUEUE_PATH or os.path.join(config.SOURCE_DIR, ".renamer_queue.sqlite3")
+    queue = work_queue.WorkQueue(queue_path, config.SOURCE_DIR, config.WORKER_ID, config.WORK_LEASE_SECONDS)
+    print(f"Worker {queue.worker_id} claiming files through {queue_path}.")
+    queue.start_heartbeat()
+    previous, config.SQLITE_JOURNAL_MODE = config.SQLITE_JOURNAL_MODE, work_queue.JOURNAL_MODE
+    with shared_lock:
+        claim_queue = queue
+    try:
+        process_directory(formats)
+    finally:
+        config.SQLITE_JOURNAL_MODE = previous
+        with shared_lock:
+            claim_queue = None
+        queue.close()
+
+def watch_directory(formats=None):
+    """
+    Run as a service: process the files in the source directory, then every
+    file that arrives there, until interrupted with Ctrl-C.
+
+    New files are detected with inotify where available, otherwise by
+    rescanning every WATCH_POLL_INTERVAL seconds, and are processed once they
+    stopped changing for WATCH_SETTLE_SECONDS. The inference backend (the
+    OpenAI client and its connection pool, or the local model), the cache,
+    the rate limiter and the extraction processes stay warm for the whole
+    session. Files are processed one by
+    one (up to MAX_IN_FLIGHT at a time) even when PACK_SIZE is set, so that
+    no file waits for others to arrive.
+
+    Parameters:
+        formats (list): Extractor names (default: FORMATS, or all formats).
+    """
+    extractors = get_extractors(formats or config.FORMATS)
+    os.makedirs(config.DESTINATION_DIR, exist_ok=True)
+    try:
+        inference.get_backend().warm_up()
+    except (ValueError, ImportError) as e:
+        print(e)
+        return
+    if config.METRICS_FORMAT:
+        metrics.start_run(config.METRICS_FORMAT, config.METRICS_PATH)
+
+    def flush_journal():
+        current_journal = get_journal()
+        if current_journal is not None:
+            current_journal.flush()
+
+    def report_progress(count, item):
+        print(f"\nFinished file {count}")
+
+    extensions = tuple(ext for extractor in extractors for ext in extractor.extensions)
+    files = folder_watcher.watch_files(
+        config.SOURCE_DIR, extensions, config.SCAN_RECURSIVE, exclude=[config.DESTINATION_DIR],
+        settle_seconds=config.WATCH_SETTLE_SECONDS, poll_interval=config.WATCH_POLL_INTERVAL,
+        backend=config.WATCH_BACKEND, on_idle=flush_journal
+    )
+    print(f"Watching {config.SOURCE_DIR} for {describe_formats(extractors)} files. Press Ctrl-C to stop.")
+    try:
+        directory_scanner.run_bounded(files, process_file, config.MAX_IN_FLIGHT, report_progress)
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    finally:
+        shutdown_ocr_pool(cancel=True)
+        shutdown_extraction_pool()
+        inference.close_backend()
+        flush_journal()
+        metrics.finish_run()
+
+def plan_directory(plan_path=None, formats=None, paths=None):
+    """
+    Plan phase: infer the metadata of every file and write the moves to a
+    plan file, without moving anything.
+
+    Name collisions, with existing files or between planned files, are
+    resolved as set by PLAN_COLLISIONS.
+
+    Parameters:
+        plan_path (str): Path of the plan file (default PLAN_FILE).
+        formats (list): Extractor names (default: FORMATS, or all formats).
+        paths (list): Files to plan instead of scanning the source directory, or None.
+    """
+    global planned_moves
+    plan_path = plan_path or config.PLAN_FILE
+    with shared_lock:
+        planned_moves = []
+    try:
+        process_directory(formats, paths)
+        with shared_lock:
+            entries = planned_moves
+    finally:
+        with shared_lock:
+            planned_moves = None
+    moves = rename_plan.plan_moves(entries, config.PLAN_COLLISIONS)
+    rename_plan.write_plan(plan_path, moves)
+    suffixed = sum(1 for move in moves if move["resolution"] == "suffixed")
+    skipped = sum(1 for move in moves if move["resolution"] == "skipped")
+    print(f"Wrote {len(moves)} moves to {plan_path} ({suffixed} renamed to avoid a collision, "
+          f"{skipped} skipped). Review it, then run the apply mode.")
+
+def dry_run(formats=None, paths=None):
+    """
+    Dry run: scan, extract, look up the metadata cache and print the plan,
+    without calling the model or changing anything.
+
+    Files whose metadata is embedded, cached or known from the duplicate
+    index are planned as usual; the others are listed as needing the model.
+    Nothing is moved, and the journal, duplicate index and metadata cache
+    are not written.
+
+    Parameters:
+        formats (list): Extractor names (default: FORMATS, or all formats).
+        paths (list): Files to look at instead of scanning the source directory, or None.
+    """
+    global planned_moves, unresolved
+    previous, config.DRY_RUN = config.DRY_RUN, True
+    with shared_lock:
+        planned_moves, unresolved = [], []
+    try:
+        process_directory(formats, paths)
+        with shared_lock:
+            entries, missing = planned_moves, unresolved
+    finally:
+        config.DRY_RUN = previous
+        with shared_lock:
+            planned_moves = unresolved = None
+    moves = rename_plan.plan_moves(entries, config.PLAN_COLLISIONS)
+    print("\nDry run, nothing was changed:")
+    for move in moves:
+        print(f"  '{move['source']}' -> '{move['target'] or '(skipped, the name is taken)'}'")
+    for path in sorted(missing):
+        print(f"  '{path}' -> (needs the model)")
+    print(f"{len(moves)} file(s) planned, {len(missing)} would be sent to the model.")
+
+def apply_plan(plan_path=None):
+    """
+    Apply phase: execute the moves of a plan file in bulk and log them to UNDO_LOG.
+
+    Parameters:
+        plan_path (str): Path of the plan file (default PLAN_FILE).
+    """
+    plan_path = plan_path or config.PLAN_FILE
+    if not os.path.exists(plan_path):
+        print(f"Plan file {plan_path} not found. Run the plan mode first.")
+        return
+    moved, failed = rename_plan.apply_plan(plan_path, config.UNDO_LOG, config.MOVE_COPY_WORKERS)
+    print(f"\nPlan applied: {moved} files moved, {failed} skipped. Undo log: {config.UNDO_LOG}")
+
+def undo_plan():
+    """
+    Move the files of the last applied plan back, using UNDO_LOG.
+    """
+    if not os.path.exists(config.UNDO_LOG):
+        print(f"Undo log {config.UNDO_LOG} not found. Nothing to undo.")
+        return
+    moved, failed = rename_plan.undo_moves(config.UNDO_LOG, config.MOVE_COPY_WORKERS)
+    print(f"\nUndo complete: {moved} files moved back, {failed} skipped.")
+    if failed:
+        print(f"The skipped moves are kept in {config.UNDO_LOG}; run undo again to retry them.")
+
+def prepare_batch(batch_path=None, formats=None):
+    """
+    Batch phase 1: write one chat-completion request per file.
+
+    The requests go to batch_path, together with a manifest that maps each
+    request back to its file. Files whose metadata is already cached, or
+    embedded in the file, are listed in the manifest without a request.
+    No network access is needed.
+
+    Parameters:
+        batch_path (str): Path of the batch JSONL file (default BATCH_FILE).
+        formats (list): Extractor names (default: FORMATS, or all formats).
+
+    Returns:
+        int: The number of requests written.
+    """
+    batch_path = batch_path or config.BATCH_FILE
+    extractors = get_extractors(formats or config.FORMATS)
+    cache = inference.get_metadata_cache()
+    requests = []
+    manifest = {}
+    numbered_files = enumerate(iter_files(extractors), 1)
+
+    def prepare_file(numbered_file):
+        i, path = numbered_file
+        custom_id = f"file-{i}"
+        text, embedded = extract(path, extractor_for(path, extractors))
+        metadata = inference.guess_local_metadata(text, embedded)
+        if metadata is not None:
+            manifest[custom_id] = {"path": path, "metadata": metadata}
+            return
+        if not text.strip():
+            print(f"No text extracted from '{path}'. Skipping...")
+            return
+        cache_key = inference.cache_key_for(text)
+        manifest[custom_id] = {"path": path, "cache_key": cache_key}
+        # Cached files need no request; apply_batch() reads them from the cache.
+        if cache is not None and cache.get(cache_key) is not None:
+            return
+        body = {"model": config.MODEL_NAME, "messages": inference.build_messages(text), "temperature": 0}
+        structured = inference.response_format("metadata", inference.metadata_schema())
+        if structured:
+            body["response_format"] = structured
+        requests.append((custom_id, body))
+
+    # Extract on the worker threads, so that the process pool is kept busy.
+    try:
+        directory_scanner.run_bounded(numbered_files, prepare_file, config.MAX_IN_FLIGHT)
+    finally:
+        shutdown_extraction_pool()
+    # Keep the files in scan order.
+    requests.sort(key=lambda request: int(request[0].split("-")[1]))
+    manifest = dict(sorted(manifest.items(), key=lambda item: int(item[0].split("-")[1])))
+    openai_batch.write_batch_file(batch_path, requests, manifest)
+    print(f"Wrote {len(requests)} requests for {len(manifest)} files to {batch_path}.")
+    return len(requests)
+
+def apply_batch(batch_path=None, results_path=None):
+    """
+    Batch phase 3: rename/move the files listed in a batch manifest.
+
+    Metadata comes from the batch result file, or from the cache for files
+    that needed no request. Successful results are added to the cache.
+    Files without usable metadata are left in place. No network access is needed.
+
+    Parameters:
+        batch_path (str): Path of the batch JSONL file (default BATCH_FILE).
+        results_path (str): Path of the result JSONL file. Defaults to the
+            file downloaded by run_batch().
+    """
+    batch_path = batch_path or config.BATCH_FILE
+    results_path = results_path or openai_batch.results_path_for(batch_path)
+    manifest = openai_batch.read_manifest(batch_path)
+    results = openai_batch.read_batch_results(results_path) if os.path.exists(results_path) else {}
+    cache = inference.get_metadata_cache()
+
+    os.makedirs(config.DESTINATION_DIR, exist_ok=True)
+    for custom_id, entry in manifest.items():
+        path = entry["path"]
+        # Embedded metadata was already resolved when the batch was prepared.
+        metadata = entry.get("metadata")
+        if metadata is None and results.get(custom_id) is not None:
+            try:
+                metadata = inference.parse_metadata_response(results[custom_id])
+                if cache is not None:
+                    cache.put(entry["cache_key"], metadata)
+            except ValueError as e:
+                # No repair prompt here: apply_batch() works offline.
+                print(f"Invalid reply for '{path}': {e}")
+        elif metadata is None and cache is not None:
+            metadata = cache.get(entry["cache_key"])
+
+        extractor = extractor_for(path)
+        if metadata is None or extractor is None:
+            print(f"No metadata available for '{path}'. Leaving it in place.")
+            continue
+        print(f"Inferred Metadata for '{path}': {metadata}")
+        naming.rename_and_move(path, metadata, config.DESTINATION_DIR, extractor.output_extension)
+
+    print("\nBatch applied!")
+
+def run_batch(batch_path=None, formats=None):
+    """
+    Run all three batch phases: prepare, submit and wait, apply.
+
+    Parameters:
+        batch_path (str): Path of the batch JSONL file (default BATCH_FILE).
+        formats (list): Extractor names (default: FORMATS, or all formats).
+    """
+    if config.INFERENCE_BACKEND != "openai" or config.BASE_URL:
+        print("Batch mode needs the OpenAI API; use the default mode with other backends.")
+        return
+    batch_path = batch_path or config.BATCH_FILE
+    results_path = openai_batch.results_path_for(batch_path)
+    if prepare_batch(batch_path, formats):
+        client = inference.get_client()
+        batch_id = openai_batch.submit_batch(client, batch_path)
+        openai_batch.wait_for_batch(client, batch_id, results_path, config.BATCH_POLL_INTERVAL)
+    apply_batch(batch_path, results_path)
+
+def main(formats=None, description="Rename documents based on their content."):
+    """
+    Command-line entry point.
+
+    Without arguments, every file is processed directly. The other modes are:
+      watch          keep running and process files as they arrive
+      plan           write the planned moves to a plan file, move nothing
+      apply          execute a plan file (no network access)
+      undo           move the files of the last apply back
+      worker         process the files claimed in a work queue shared with
+                     other workers
+      batch          prepare, submit, wait for and apply a Batch API job
+      batch-prepare  only write the batch file (no network access)
+      batch-apply    only apply a result file (no network access)
+
+    The process and plan modes take file paths, to handle those files
+    instead of scanning SOURCE_DIR, and --dry-run, to plan without calling
+    the model or changing anything. Settings come from renamer/config.py,
+    overridden by a config file, the environment and the options (see
+    renamer.settings).
+
+    Parameters:
+        formats (list): Extractor names processed when --formats is not
+            given (default: FORMATS, or all formats).
+        description (str): Description shown by --help.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("mode", nargs="?", default="process",
+                        choices=["process", "watch", "plan", "apply", "undo", "worker",
+                                 "batch", "batch-prepare", "batch-apply"])
+    parser.add_argument("paths", nargs="*",
+                        help="Files to handle instead of scanning the source directory (process and plan modes).")
+    parser.add_argument("--config", default=os.environ.get(settings.CONFIG_FILE_VARIABLE),
+                        help="TOML or JSON file of settings, e.g. SOURCE_DIR = \"/data/inbox\" "
+                             "(default: $RENAMER_CONFIG).")
+    parser.add_argument("--set", action="append", default=[], metavar="SETTING=VALUE",
+                        help="Override a setting of renamer/config.py, e.g. --set MAX_IN_FLIGHT=16.")
+    parser.add_argument("--source", default=None, help="Directory to scan (SOURCE_DIR).")
+    parser.add_argument("--destination", default=None, help="Directory of the renamed files (DESTINATION_DIR).")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Scan, extract, look up the cache and print the plan; call no model and change nothing.")
+    parser.add_argument("--formats", default=None,
+                        help="Comma-separated formats to process, e.g. pdf,markdown (default: all).")
+    parser.add_argument("--plan-file", default=None)
+    parser.add_argument("--work-queue", default=None,
+                        help="Work queue shared by the workers (default: .renamer_queue.sqlite3 in SOURCE_DIR).")
+    parser.add_argument("--batch-file", default=None)
+    parser.add_argument("--results-file", default=None)
+    parser.add_argument("--metrics", default=None, choices=metrics.FORMATS,
+                        help="Measure the stages of every file and print a summary; jsonl and "
+                             "prometheus also write the measurements to --metrics-file.")
+    parser.add_argument("--metrics-file", default=None)
+    parser.add_argument("--backend", default=None, choices=backends.backend_names(),
+                        help="Where to send the prompts (default: INFERENCE_BACKEND, openai).")
+    parser.add_argument("--model", default=None,
+                        help="Model name, or Hugging Face model id with --backend local.")
+    parser.add_argument("--base-url", default=None,
+                        help="URL of an OpenAI-compatible server, e.g. http://localhost:8000/v1.")
+    args = parser.parse_args()
+
+    try:
+        settings.load(args.config, os.environ, args.set)
+    except (OSError, ValueError) as e:
+        print(f"Configuration error: {e}")
+        return
+    options = {
+        "SOURCE_DIR": args.source,
+        "DESTINATION_DIR": args.destination,
+        "PLAN_FILE": args.plan_file,
+        "WORK_QUEUE_PATH": args.work_queue,
+        "BATCH_FILE": args.batch_file,
+        "METRICS_FORMAT": args.metrics,
+        "METRICS_PATH": args.metrics_file,
+        "INFERENCE_BACKEND": args.backend,
+        "MODEL_NAME": args.model,
+        "BASE_URL": args.base_url,
+    }
+    for name, value in options.items():
+        if value is not None:
+            setattr(config, name, value)
+    if args.dry_run:
+        config.DRY_RUN = True
+    if args.formats:
+        formats = [name.strip() for name in args.formats.split(",") if name.strip()]
+    formats = formats or config.FORMATS
+    if args.paths and args.mode not in ("process", "plan"):
+        print(f"The {args.mode} mode takes no file paths.")
+        return
+    if config.DRY_RUN and args.mode not in ("process", "plan"):
+        print(f"--dry-run only applies to the process and plan modes, not to {args.mode}.")
+        return
+
+    if args.paths:
+        print(f"Starting {describe_formats(get_extractors(formats))} processing of {len(args.paths)} file(s)")
+    else:
+        print(f"Starting {describe_formats(get_extractors(formats))} processing from directory: {config.SOURCE_DIR}")
+    print(f"Files will be moved to: {config.DESTINATION_DIR}")
+    if config.DRY_RUN:
+        dry_run(formats, args.paths)
+    elif args.mode == "watch":
+        watch_directory(formats)
+    elif args.mode == "plan":
+        plan_directory(config.PLAN_FILE, formats, args.paths)
+    elif args.mode == "apply":
+        apply_plan(config.PLAN_FILE)
+    elif args.mode == "undo":
+        undo_plan()
+    elif args.mode == "worker":
+        work_directory(config.WORK_QUEUE_PATH, formats)
+    elif args.mode == "batch":
+        run_batch(config.BATCH_FILE, formats)
+    elif args.mode == "batch-prepare":
+        prepare_batch(config.BATCH_FILE, formats)
+    elif args.mode == "batch-apply":
+        apply_batch(config.BATCH_FILE, args.results_file)
+    else:
+        process_directory(formats, args.paths)
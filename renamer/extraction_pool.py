@@ -0,0 +1,223 @@
+import multiprocessing
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+# The memory cap needs the resource module, which only exists on Unix.
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from renamer import text_excerpt
+from renamer.extractors import get_extractors
+
+# ---------------------------------------------------------------------------
+# Process pool for CPU-bound text extraction.
+#
+# PyPDF2 is pure Python, so extraction in threads is serialized by the GIL.
+# ExtractionPool runs extractors in worker processes instead, one file per
+# process at a time, and only the excerpt (a short string) and the embedded
+# metadata travel back to the coordinator.
+#
+# A file cannot stall the run: each worker process caps its memory with
+# RLIMIT_AS, and an alarm inside the worker aborts an extraction that runs
+# past the timeout. If a worker still does not answer (stuck in native code,
+# or killed by the OS), the coordinator stops waiting, terminates the pool's
+# processes, replaces the pool and moves on.
+# ---------------------------------------------------------------------------
+
+# Extra seconds the coordinator waits beyond the in-worker timeout.
+TIMEOUT_GRACE = 5.0
+# Seconds a stopped worker process is given to exit before it is killed.
+STOP_WAIT = 5.0
+
+class ExtractionTimeout(Exception):
+    """
+    Raised when the extraction of a file takes longer than the timeout.
+    """
+
+def limit_worker_memory(memory_limit_mb):
+    """
+    Initializer of the worker processes: apply the memory cap.
+
+    Parameters:
+        memory_limit_mb (int): Address space limit in MB, or None for no limit.
+    """
+    if resource is None or not memory_limit_mb:
+        return
+    limit = int(memory_limit_mb) * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError) as e:
+        print(f"Could not limit the memory of the extraction worker: {e}")
+
+def stop_workers(executor):
+    """
+    Stop the worker processes of a process pool right away, then shut it down.
+
+    Used for pools with a stuck worker, which shutdown() alone would leave
+    running, holding its memory, until it finishes on its own. Files being
+    extracted by the other workers fail with BrokenProcessPool and are
+    retried on a new pool.
+
+    Parameters:
+        executor (ProcessPoolExecutor): The pool.
+    """
+    kill_workers = getattr(executor, "kill_workers", None)
+    if kill_workers is not None:
+        kill_workers()
+    else:
+        # kill_workers() only exists on Python 3.14 and later.
+        processes = list((executor._processes or {}).values())
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join(STOP_WAIT)
+            if process.is_alive():
+                process.kill()
+                process.join(STOP_WAIT)
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def raise_timeout(signum, frame):
+    raise ExtractionTimeout("extraction timed out")
+
+def extract_excerpt(path, extractor_name, token_budget, max_chars, timeout=None):
+    """
+    Extract a file and reduce its text to the excerpt sent to the model.
+
+    Runs in a worker process, or in the calling thread when the pool is off.
+
+    Parameters:
+        path (str): The file path.
+        extractor_name (str): Name of the registered extractor to use.
+        token_budget (int): Token budget of the excerpt, or None to only
+            truncate the text.
+        max_chars (int): Maximum number of characters of the excerpt.
+        timeout (float): Seconds after which the extraction is aborted, or
+            None. Only applied in the main thread of a process.
+
+    Returns:
+        tuple: (text, embedded, cpu_seconds): the extractor's text reduced
+            to the excerpt, its embedded metadata, and the CPU time spent.
+
+    Raises:
+        ExtractionTimeout: If the timeout expired.
+        MemoryError: If the worker ran into its memory cap.
+    """
+    cpu_start = time.thread_time()
+    extractor = get_extractors([extractor_name])[0]
+    use_alarm = (timeout and hasattr(signal, "setitimer")
+                 and threading.current_thread() is threading.main_thread())
+    if use_alarm:
+        signal.signal(signal.SIGALRM, raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        text, embedded = extractor.extract(path)
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    if token_budget:
+        text = text_excerpt.make_excerpt(text, token_budget)
+    return text[:max_chars], embedded, time.thread_time() - cpu_start
+
+class ExtractionPool:
+    """
+    Runs extract_excerpt() in a pool of worker processes.
+
+    The pool can be shared between worker threads. At most one extraction
+    per process is submitted at a time, so the timeout measures the
+    extraction itself and not time spent waiting in a queue.
+    """
+
+    def __init__(self, processes=None, timeout=60, memory_limit_mb=None):
+        """
+        Create the pool. The worker processes are started on first use.
+
+        Parameters:
+            processes (int): Number of worker processes (None: one per CPU core).
+            timeout (float): Per-file extraction timeout in seconds, or None.
+            memory_limit_mb (int): Memory cap per worker process in MB, or None.
+        """
+        self.processes = processes or multiprocessing.cpu_count()
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(self.processes)
+        self.executor = None
+
+    def get_executor(self):
+        """
+        Return the process pool, starting it if needed.
+
+        Returns:
+            ProcessPoolExecutor: The pool.
+        """
+        with self.lock:
+            if self.executor is None:
+                # "spawn" starts clean interpreters: forking a process whose
+                # other threads hold locks (SQLite, stdout) is not safe.
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=limit_worker_memory,
+                    initargs=(self.memory_limit_mb,)
+                )
+            return self.executor
+
+    def discard(self, executor):
+        """
+        Replace a broken or stuck pool with a fresh one on next use.
+
+        Parameters:
+            executor (ProcessPoolExecutor): The pool to discard.
+        """
+        with self.lock:
+            if self.executor is executor:
+                self.executor = None
+        stop_workers(executor)
+
+    def extract(self, path, extractor_name, token_budget, max_chars):
+        """
+        Extract a file in a worker process.
+
+        Parameters:
+            path (str): The file path.
+            extractor_name (str): Name of the registered extractor to use.
+            token_budget (int): Token budget of the excerpt, or None.
+            max_chars (int): Maximum number of characters of the excerpt.
+
+        Returns:
+            tuple: (text, embedded, cpu_seconds), see extract_excerpt().
+
+        Raises:
+            ExtractionTimeout: If the extraction took longer than the timeout.
+            Exception: Any error raised by the extractor.
+        """
+        wait = self.timeout + TIMEOUT_GRACE if self.timeout else None
+        # A pool that broke because of another file is retried once.
+        for attempt in range(2):
+            with self.slots:
+                executor = self.get_executor()
+                try:
+                    future = executor.submit(extract_excerpt, path, extractor_name,
+                                             token_budget, max_chars, self.timeout)
+                    return future.result(timeout=wait)
+                except FutureTimeoutError:
+                    self.discard(executor)
+                    raise ExtractionTimeout(f"extraction timed out after {self.timeout} s")
+                except BrokenProcessPool:
+                    self.discard(executor)
+                    if attempt:
+                        raise
+
+    def shutdown(self):
+        """
+        Stop the worker processes.
+        """
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
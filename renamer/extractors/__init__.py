@@ -0,0 +1,114 @@
+import os
+
+# ---------------------------------------------------------------------------
+# Registry of per-format text extractors.
+#
+# An extractor reads the beginning of one kind of file and returns its raw
+# text plus the metadata embedded in the file. The engine picks the extractor
+# for each file by its extension; excerpting, inference and renaming are the
+# same for every format.
+#
+# To support another format (EPUB, DOCX, HTML, ...), add a module to this
+# package with an Extractor subclass decorated with @register, and import the
+# module at the bottom of this file.
+# ---------------------------------------------------------------------------
+
+# Registered extractors, keyed by name.
+EXTRACTORS = {}
+
+class Extractor:
+    """
+    Base class of the per-format extractors.
+
+    Subclasses set the class attributes and implement extract().
+    """
+
+    # Short name used in settings and on the command line, e.g. "pdf".
+    name = ""
+    # Human-readable name used in messages, e.g. "PDF".
+    label = ""
+    # Lower-case file extensions handled by the extractor.
+    extensions = ()
+    # Extension given to renamed files.
+    output_extension = ""
+    # True if extraction is CPU-bound Python code, which then runs in the
+    # extraction process pool instead of a worker thread.
+    cpu_bound = False
+    # True if files without a text layer can be read with OCR instead (see
+    # renamer.ocr). The engine then passes them to the OCR pool.
+    ocr = False
+
+    def extract(self, path):
+        """
+        Read the text and embedded metadata of a file.
+
+        Parameters:
+            path (str): The file path.
+
+        Returns:
+            tuple: (text, embedded) where text is the raw text to take the
+                excerpt from and embedded holds keyword arguments for
+                local_metadata.guess_metadata() ("title", "author", "date"
+                and "date_is_publication"), or is empty.
+
+        Raises:
+            Exception: Any error reading the file; the engine reports it
+                and skips the file.
+        """
+        raise NotImplementedError
+
+def register(extractor_class):
+    """
+    Class decorator that adds an extractor to the registry.
+
+    Parameters:
+        extractor_class (type): The Extractor subclass.
+
+    Returns:
+        type: The same class.
+    """
+    extractor = extractor_class()
+    EXTRACTORS[extractor.name] = extractor
+    return extractor_class
+
+def get_extractors(names=None):
+    """
+    Look up registered extractors by name.
+
+    Parameters:
+        names (iterable): Extractor names, or None for all of them.
+
+    Returns:
+        list: The extractors.
+
+    Raises:
+        ValueError: If a name is not registered.
+    """
+    if names is None:
+        return list(EXTRACTORS.values())
+    unknown = [name for name in names if name not in EXTRACTORS]
+    if unknown:
+        raise ValueError(
+            f"Unknown format(s): {', '.join(unknown)}. Available: {', '.join(sorted(EXTRACTORS))}."
+        )
+    return [EXTRACTORS[name] for name in names]
+
+def extractor_for(path, extractors=None):
+    """
+    Find the extractor that handles a file.
+
+    Parameters:
+        path (str): The file path.
+        extractors (list): The extractors to choose from (default: all).
+
+    Returns:
+        Extractor or None: The extractor, or None if the format is not handled.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    for extractor in extractors if extractors is not None else EXTRACTORS.values():
+        if extension in extractor.extensions:
+            return extractor
+    return None
+
+# Register the built-in formats.
+from renamer.extractors import pdf, markdown  # noqa: E402,F401
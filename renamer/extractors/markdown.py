@@ -0,0 +1,235 @@
+import re
+import codecs
+
+from renamer import config
+from renamer import local_metadata
+from renamer.extractors import Extractor, register
+
+# ---------------------------------------------------------------------------
+# Markdown extractor.
+#
+# The title, author and date come from YAML front matter, or the title from
+# a leading "# Title" heading.
+#
+# Only the beginning of the file is read, in chunks, and decoded on the fly:
+# reading stops once MARKDOWN_MAX_CHARS characters of text were kept or
+# MARKDOWN_MAX_BYTES bytes were read, so a multi-hundred-megabyte export
+# costs no more memory or I/O than a short note. The encoding is detected
+# from the first chunk (byte order mark, UTF-8, or charset-normalizer).
+# Install charset-normalizer for better detection of legacy encodings
+# (pip install charset-normalizer); without it, text that is not UTF-8 is
+# read as Windows-1252. It is only imported for such files.
+# Base64 data URIs (inlined images) are dropped while reading, and so is
+# front matter longer than MARKDOWN_FRONT_MATTER_MAX characters.
+# ---------------------------------------------------------------------------
+
+CHUNK_SIZE = 64 * 1024
+
+# Byte order marks, longest first so that UTF-32 is not taken for UTF-16.
+BYTE_ORDER_MARKS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+FRONT_MATTER_START_PATTERN = re.compile(r'\A\ufeff?---[ \t]*\r?\n')
+FRONT_MATTER_END_PATTERN = re.compile(r'\n(---|\.\.\.)[ \t]*\r?\n')
+DATA_URI_START_PATTERN = re.compile(r'data:[\w/+.-]+;base64,')
+BASE64_RUN_PATTERN = re.compile(r'[A-Za-z0-9+/=]*')
+# Longest data URI header kept back at the end of a chunk, in case it
+# continues in the next chunk.
+MAX_DATA_URI_HEADER = 100
+
+def detect_encoding(prefix):
+    """
+    Detect the text encoding of a file from its first bytes.
+
+    Parameters:
+        prefix (bytes): The beginning of the file.
+
+    Returns:
+        str: A codec name.
+    """
+    for mark, encoding in BYTE_ORDER_MARKS:
+        if prefix.startswith(mark):
+            return encoding
+    try:
+        # The prefix may end inside a multi-byte character.
+        codecs.getincrementaldecoder("utf-8")().decode(prefix, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    try:
+        import charset_normalizer
+    except ImportError:
+        charset_normalizer = None
+    if charset_normalizer is not None:
+        best = charset_normalizer.from_bytes(prefix).best()
+        if best is not None:
+            return best.encoding
+    return "cp1252"
+
+def decode_chunks(file, max_bytes):
+    """
+    Read and decode a file chunk by chunk.
+
+    Parameters:
+        file (file): The file, opened in binary mode.
+        max_bytes (int): Stop after this many bytes.
+
+    Yields:
+        str: The decoded text of each chunk.
+    """
+    first = file.read(min(CHUNK_SIZE, max_bytes))
+    encoding = detect_encoding(first)
+    if encoding != "utf-8":
+        print(f"Reading as {encoding}.")
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    chunk, remaining = first, max_bytes - len(first)
+    while chunk:
+        yield decoder.decode(chunk)
+        if remaining <= 0:
+            return
+        chunk = file.read(min(CHUNK_SIZE, remaining))
+        remaining -= len(chunk)
+    yield decoder.decode(b"", final=True)
+
+def drop_long_front_matter(pieces, max_length):
+    """
+    Pass text through, without the front matter if it is longer than max_length.
+
+    Short front matter is kept: it holds the title, author and date.
+
+    Parameters:
+        pieces (iterable): Consecutive pieces of text.
+        max_length (int): Longest front matter kept, in characters.
+
+    Yields:
+        str: The text.
+    """
+    pieces = iter(pieces)
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        if len(buffer) >= 8:
+            break
+    if not FRONT_MATTER_START_PATTERN.match(buffer):
+        yield buffer
+        yield from pieces
+        return
+
+    # Collect the front matter until its closing line, or until it is too long.
+    while True:
+        end = FRONT_MATTER_END_PATTERN.search(buffer)
+        if end is not None:
+            yield buffer if end.end() <= max_length else buffer[end.end():]
+            yield from pieces
+            return
+        if len(buffer) > max_length:
+            break
+        piece = next(pieces, None)
+        if piece is None:
+            # Unterminated front matter.
+            yield buffer
+            return
+        buffer += piece
+
+    # Too long: skip it, keeping only enough text to find the closing line.
+    print(f"Skipping front matter longer than {max_length} characters.")
+    tail = buffer[-16:]
+    for piece in pieces:
+        text = tail + piece
+        end = FRONT_MATTER_END_PATTERN.search(text)
+        if end is not None:
+            yield text[end.end():]
+            yield from pieces
+            return
+        tail = text[-16:]
+
+def drop_data_uris(pieces):
+    """
+    Pass text through without the base64 payload of data URIs.
+
+    The "data:...;base64," header is dropped too. A payload may span any
+    number of pieces.
+
+    Parameters:
+        pieces (iterable): Consecutive pieces of text.
+
+    Yields:
+        str: The text.
+    """
+    in_payload = False
+    carry = ""
+    for piece in pieces:
+        text, carry = carry + piece, ""
+        position, kept = 0, []
+        while position < len(text):
+            if in_payload:
+                position = BASE64_RUN_PATTERN.match(text, position).end()
+                in_payload = position == len(text)
+                continue
+            start = DATA_URI_START_PATTERN.search(text, position)
+            if start is None:
+                # A header may be cut at the end of this piece.
+                split = text.rfind("data:", max(position, len(text) - MAX_DATA_URI_HEADER))
+                if split < 0:
+                    # Or the text may end with "d", "da", "dat" or "data".
+                    split = next((len(text) - n for n in range(4, 0, -1) if text.endswith("data"[:n])), len(text))
+                split = max(split, position)
+                kept.append(text[position:split])
+                carry = text[split:]
+                break
+            kept.append(text[position:start.start()])
+            position, in_payload = start.end(), True
+        if kept:
+            yield "".join(kept)
+    if carry and not in_payload:
+        yield carry
+
+def read_head(path, max_chars, max_bytes, max_front_matter):
+    """
+    Read the beginning of a text file, with constant memory and I/O.
+
+    Parameters:
+        path (str): The file path.
+        max_chars (int): Stop once this many characters were kept.
+        max_bytes (int): Stop once this many bytes were read.
+        max_front_matter (int): Longest front matter kept, in characters.
+
+    Returns:
+        str: At most max_chars characters of text, without data URI payloads
+            and long front matter.
+    """
+    kept, length = [], 0
+    with open(path, 'rb') as file:
+        pieces = drop_data_uris(drop_long_front_matter(decode_chunks(file, max_bytes), max_front_matter))
+        for piece in pieces:
+            kept.append(piece)
+            length += len(piece)
+            if length >= max_chars:
+                break
+    return "".join(kept)[:max_chars]
+
+@register
+class MarkdownExtractor(Extractor):
+    """
+    Extractor for Markdown files. Renamed files get the .md extension.
+    """
+
+    name = "markdown"
+    label = "Markdown"
+    extensions = ('.md', '.markdown')
+    output_extension = '.md'
+
+    def extract(self, path):
+        print(f"Reading text from: {path}")
+        text = read_head(path, config.MARKDOWN_MAX_CHARS, config.MARKDOWN_MAX_BYTES,
+                         config.MARKDOWN_FRONT_MATTER_MAX)
+        if not text.strip():
+            print("No text found in the Markdown file.")
+            return "", {}
+        print("Extracted text from the Markdown file.")
+        return text, local_metadata.markdown_fields(text)
@@ -0,0 +1,210 @@
+import io
+import mmap
+import base64
+import contextlib
+
+from renamer.extractors import Extractor, register
+
+# ---------------------------------------------------------------------------
+# PDF extractor.
+#
+# Only the first page is read: its text, and the Title, Author and date
+# stored in the PDF itself (XMP packet or document info dictionary).
+#
+# PdfReader(path) loads the whole file into memory and reader.pages walks
+# the whole page tree. Instead, the file is memory-mapped, so the operating
+# system only pages in the parts that are actually read, and first_page()
+# follows the page tree straight down to page 0. Memory use then depends on
+# the first page, not on the length of the document. Files that cannot be
+# read this way (damaged cross-reference tables or page trees) fall back to
+# the full parser.
+#
+# PyPDF2 (pip install PyPDF2) is imported by the functions that use it, so
+# that runs without PDF files do not pay for loading it.
+# ---------------------------------------------------------------------------
+
+# Page attributes that a page inherits from its parents in the page tree.
+INHERITABLE_PAGE_ATTRIBUTES = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+# Deeper page trees are treated as damaged (and probably cyclic).
+MAX_PAGE_TREE_DEPTH = 64
+
+def first_page(reader):
+    """
+    Resolve the first page of a PDF without loading the rest of the page tree.
+
+    Parameters:
+        reader (PdfReader): The open PDF.
+
+    Returns:
+        PageObject: The first page, with its inherited attributes filled in.
+
+    Raises:
+        ValueError: If the page tree is empty or damaged.
+    """
+    from PyPDF2 import PageObject
+    from PyPDF2.generic import IndirectObject, NameObject
+    reference = reader.trailer["/Root"].get_object()["/Pages"]
+    node = reference.get_object()
+    inherited = {}
+    for _ in range(MAX_PAGE_TREE_DEPTH):
+        if "/Kids" not in node or node.get("/Type") == "/Page":
+            break
+        for attribute in INHERITABLE_PAGE_ATTRIBUTES:
+            if attribute in node:
+                inherited[attribute] = node[attribute]
+        # Descend into the first kid that is a page or holds any pages.
+        for kid in node["/Kids"].get_object():
+            kid_node = kid.get_object()
+            if "/Kids" not in kid_node or kid_node.get("/Count", 1) > 0:
+                reference, node = kid, kid_node
+                break
+        else:
+            raise ValueError("The page tree holds no pages.")
+    else:
+        raise ValueError("The page tree is too deep.")
+
+    page = PageObject(reader, reference if isinstance(reference, IndirectObject) else None)
+    page.update(node)
+    for attribute, value in inherited.items():
+        if attribute not in page:
+            page[NameObject(attribute)] = value
+    return page
+
+@contextlib.contextmanager
+def open_first_page(pdf_path):
+    """
+    Open a PDF for reading its first page.
+
+    The file is memory-mapped and only the objects needed by page 0 are
+    resolved. If that fails, the file is read with the full parser instead.
+    The reader and page may only be used inside the with block.
+
+    Parameters:
+        pdf_path (str): The file path to the PDF.
+
+    Yields:
+        tuple: (reader, page) with the open PdfReader and its first page.
+    """
+    from PyPDF2 import PdfReader
+    with open(pdf_path, 'rb') as file:
+        try:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # Empty files cannot be mapped; the full parser reports the error.
+            mapping = None
+        try:
+            reader = page = None
+            if mapping is not None:
+                try:
+                    reader = PdfReader(mapping)
+                    page = first_page(reader)
+                except Exception as e:
+                    print(f"Lazy read of {pdf_path} failed ({e}); using the full parser.")
+                    reader = None
+            if reader is None:
+                reader = PdfReader(pdf_path)
+                page = reader.pages[0]
+            yield reader, page
+        finally:
+            if mapping is not None:
+                mapping.close()
+
+def page_to_base64(page):
+    """
+    Serialize a single PDF page as a one-page PDF, base64 encoded.
+
+    Parameters:
+        page (PageObject): The page.
+
+    Returns:
+        str: The base64 encoded one-page PDF.
+    """
+    from PyPDF2 import PdfWriter
+    writer = PdfWriter()
+    writer.add_page(page)
+    # Write the page to a bytes buffer.
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    # Encode the bytes to a base64 string.
+    return base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+def read_embedded_metadata(reader):
+    """
+    Read the Title, Author and date stored in the PDF itself.
+
+    The XMP packet is used if present, otherwise the document info dictionary.
+
+    Parameters:
+        reader (PdfReader): The open PDF.
+
+    Returns:
+        dict: Keyword arguments for local_metadata.guess_metadata().
+    """
+    fields = {"title": None, "author": None, "date": None, "date_is_publication": False}
+    try:
+        info = reader.metadata
+        if info:
+            fields["title"] = info.get("/Title")
+            fields["author"] = info.get("/Author")
+            fields["date"] = info.get("/CreationDate")
+    except Exception as e:
+        print(f"Error reading the document info dictionary: {e}")
+    try:
+        xmp = reader.xmp_metadata
+        if xmp:
+            if xmp.dc_title:
+                fields["title"] = xmp.dc_title.get("x-default") or next(iter(xmp.dc_title.values()), None)
+            if xmp.dc_creator:
+                fields["author"] = xmp.dc_creator
+            if xmp.dc_date:
+                # dc:date is the publication date, unlike the info CreationDate.
+                fields["date"] = str(xmp.dc_date[0])
+                fields["date_is_publication"] = True
+    except Exception as e:
+        print(f"Error reading the XMP metadata: {e}")
+    return fields
+
+def extract_first_page_pdf_to_base64(pdf_path):
+    """
+    Extract the first page of a PDF as a base64 encoded one-page PDF.
+
+    Parameters:
+        pdf_path (str): The file path to the PDF.
+
+    Returns:
+        str: The base64 string, or an empty string on error.
+    """
+    try:
+        with open_first_page(pdf_path) as (_, page):
+            return page_to_base64(page)
+    except Exception as e:
+        print(f"Error extracting the first page of {pdf_path}: {e}")
+        return ""
+
+@register
+class PdfExtractor(Extractor):
+    """
+    Extractor for PDF files. Only the first page is parsed (see open_first_page()).
+
+    PyPDF2 is pure Python, so the extraction runs in the process pool.
+    Scanned PDFs can be read with OCR (see OCR_ENABLED).
+    """
+
+    name = "pdf"
+    label = "PDF"
+    extensions = ('.pdf',)
+    output_extension = '.pdf'
+    cpu_bound = True
+    ocr = True
+
+    def extract(self, path):
+        print(f"Extracting the first page of: {path}")
+        with open_first_page(path) as (reader, page):
+            embedded = read_embedded_metadata(reader)
+            text = page.extract_text() or ""
+        if text:
+            print("Extracted text from PDF.")
+        else:
+            print("No text found on the first page.")
+        return text, embedded
@@ -0,0 +1,260 @@
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+
+from renamer import directory_scanner
+from renamer.job_journal import file_signature
+
+# ---------------------------------------------------------------------------
+# Watch-folder support for the renamer engine.
+#
+# watch_files() is a never-ending generator of files that appeared in a
+# directory, for feeding run_bounded() in a long-running service. New files
+# are found through inotify on Linux, or by rescanning the directory every
+# few seconds elsewhere (or when inotify is not available).
+#
+# A file is only yielded once its size and modification time have stayed the
+# same for settle_seconds, so files that are still being downloaded or
+# copied are not picked up half-written. A file is not yielded again unless
+# it changes, so files the engine leaves in place are not retried in a loop.
+# ---------------------------------------------------------------------------
+
+# inotify event flags, from <sys/inotify.h>.
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+# struct inotify_event: wd, mask, cookie, len, followed by the name.
+EVENT_HEADER = struct.Struct("iIII")
+
+class InotifyWatcher:
+    """
+    Reports the files created, written or moved into a directory tree, using inotify.
+    """
+
+    def __init__(self, root, recursive=True, exclude=()):
+        """
+        Start watching.
+
+        Parameters:
+            root (str): The directory to watch.
+            recursive (bool): Also watch subdirectories, including new ones.
+            exclude (iterable): Directories not to watch.
+
+        Raises:
+            OSError: If inotify is not available.
+        """
+        library = ctypes.util.find_library("c")
+        self.libc = ctypes.CDLL(library, use_errno=True)
+        if not hasattr(self.libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.recursive = recursive
+        self.excluded = {os.path.realpath(path) for path in exclude}
+        self.directories = {}
+        self.add_tree(root)
+
+    def add_tree(self, root):
+        """
+        Watch a directory and, when recursive, its subdirectories.
+
+        Parameters:
+            root (str): The directory.
+        """
+        pending_dirs = [root]
+        while pending_dirs:
+            directory = pending_dirs.pop()
+            if os.path.realpath(directory) in self.excluded:
+                continue
+            descriptor = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if descriptor < 0:
+                print(f"Cannot watch '{directory}': {os.strerror(ctypes.get_errno())}")
+                continue
+            self.directories[descriptor] = directory
+            if not self.recursive:
+                continue
+            try:
+                with os.scandir(directory) as entries:
+                    pending_dirs.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+            except OSError as e:
+                print(f"Error scanning directory '{directory}': {e}")
+
+    def wait(self, timeout):
+        """
+        Wait for changes.
+
+        Parameters:
+            timeout (float): Seconds to wait at most.
+
+        Returns:
+            tuple: (paths, rescan) where paths lists the files that changed
+                and rescan is True if events were lost and the caller should
+                scan the whole tree.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return [], False
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return [], False
+
+        paths, rescan, offset = [], False, 0
+        while offset + EVENT_HEADER.size <= len(data):
+            descriptor, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b"\0")
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                rescan = True
+                continue
+            directory = self.directories.get(descriptor)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files may have landed in the directory before it was watched.
+                    self.add_tree(path)
+                    rescan = True
+            else:
+                paths.append(path)
+        return paths, rescan
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """
+    Reports the files of a directory tree by rescanning it at an interval.
+    """
+
+    def __init__(self, poll_interval=5.0):
+        """
+        Parameters:
+            poll_interval (float): Seconds between two scans.
+        """
+        self.poll_interval = poll_interval
+        self.next_scan = time.monotonic() + poll_interval
+
+    def wait(self, timeout):
+        """
+        Wait until the next scan is due, or for timeout seconds.
+
+        Parameters:
+            timeout (float): Seconds to wait at most.
+
+        Returns:
+            tuple: ([], rescan) where rescan is True when a scan is due.
+        """
+        delay = self.next_scan - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return [], False
+        time.sleep(max(delay, 0))
+        self.next_scan = time.monotonic() + self.poll_interval
+        return [], True
+
+    def close(self):
+        pass
+
+def open_watcher(root, recursive=True, exclude=(), poll_interval=5.0, backend="auto"):
+    """
+    Create the watcher for a directory tree.
+
+    Parameters:
+        root (str): The directory to watch.
+        recursive (bool): Also watch subdirectories.
+        exclude (iterable): Directories not to watch.
+        poll_interval (float): Seconds between two scans of the polling watcher.
+        backend (str): "inotify", "poll" or "auto" (inotify if available).
+
+    Returns:
+        InotifyWatcher or PollingWatcher: The watcher.
+
+    Raises:
+        OSError: If backend is "inotify" and inotify is not available.
+    """
+    if backend in ("auto", "inotify"):
+        try:
+            return InotifyWatcher(root, recursive, exclude)
+        except (OSError, AttributeError, TypeError) as e:
+            if backend == "inotify":
+                raise
+            print(f"inotify is not available ({e}); scanning every {poll_interval} s instead.")
+    return PollingWatcher(poll_interval)
+
+def watch_files(root, extensions, recursive=True, exclude=(), settle_seconds=2.0,
+                poll_interval=5.0, backend="auto", on_idle=None):
+    """
+    Yield the files that are in, or arrive in, a directory tree. Never returns.
+
+    The files already present are yielded first. A file is yielded once its
+    size and modification time have not changed for settle_seconds, and
+    again only if it changes after that.
+
+    Parameters:
+        root (str): The directory to watch.
+        extensions (tuple): Lower-case extensions such as ('.pdf',).
+        recursive (bool): Also watch subdirectories.
+        exclude (iterable): Directories to skip, e.g. the destination directory.
+        settle_seconds (float): How long a file must stay unchanged.
+        poll_interval (float): Seconds between two scans when polling.
+        backend (str): "inotify", "poll" or "auto" (see open_watcher()).
+        on_idle (callable): Called without arguments when nothing happened
+            for a while, e.g. to flush buffered writes.
+
+    Yields:
+        str: The path of each settled file.
+    """
+    watcher = open_watcher(root, recursive, exclude, poll_interval, backend)
+    # Files waiting to settle: path -> (signature, monotonic time it was first seen).
+    pending = {}
+    # Signature of each file when it was yielded.
+    yielded = {}
+
+    def scan():
+        return directory_scanner.scan_files(root, extensions, recursive, exclude)
+
+    found = scan()
+    try:
+        while True:
+            for path in found:
+                if path.lower().endswith(extensions) and path not in pending:
+                    pending[path] = (None, 0.0)
+
+            now = time.monotonic()
+            for path, (signature, since) in list(pending.items()):
+                current = file_signature(path)
+                if current == (None, None):
+                    # Moved away or deleted before it settled.
+                    del pending[path]
+                elif current != signature:
+                    pending[path] = (current, now)
+                elif now - since >= settle_seconds:
+                    del pending[path]
+                    if yielded.get(path) != current:
+                        yielded[path] = current
+                        yield path
+
+            paths, rescan = watcher.wait(settle_seconds / 2 if pending else poll_interval)
+            found = scan() if rescan else paths
+            if not paths and not pending:
+                # Forget the files that are gone, so the map does not keep growing.
+                yielded = {path: signature for path, signature in yielded.items() if os.path.exists(path)}
+                if on_idle is not None:
+                    on_idle()
+    finally:
+        watcher.close()
@@ -0,0 +1,567 @@
+import os
+import re
+import json
+import threading
+
+from renamer import backends
+from renamer import config
+from renamer import local_metadata
+from renamer import metrics
+from renamer import rate_limiter
+from renamer.backends.openai_chat import get_client, get_rate_limiter  # noqa: F401
+from renamer.metadata_cache import MetadataCache, make_cache_key
+
+# ---------------------------------------------------------------------------
+# Metadata inference.
+#
+# The prompts are sent to the backend selected by INFERENCE_BACKEND (see
+# renamer.backends). The backend and the metadata cache are created on first
+# use and shared by every format and every worker thread. get_client() is the
+# OpenAI client, also used by the Batch API modes.
+# ---------------------------------------------------------------------------
+
+shared_lock = threading.Lock()
+backend = None
+metadata_cache = None
+cache_opened = False
+
+def get_backend():
+    """
+    Return the shared inference backend, creating it on first use.
+
+    Returns:
+        Backend: The backend selected by INFERENCE_BACKEND.
+
+    Raises:
+        ValueError: If INFERENCE_BACKEND is not a known backend.
+    """
+    global backend
+    with shared_lock:
+        if backend is None:
+            backend = backends.create_backend(config.INFERENCE_BACKEND)
+    return backend
+
+def close_backend():
+    """
+    Release the shared inference backend, if it was created.
+    """
+    global backend
+    with shared_lock:
+        current, backend = backend, None
+    if current is not None:
+        current.close()
+
+def get_metadata_cache():
+    """
+    Return the shared metadata cache, opening it on first use.
+
+    In a dry run, the cache is opened read-only.
+
+    Returns:
+        MetadataCache or None: The cache, or None if CACHE_PATH is not set
+            (or, in a dry run, does not exist yet).
+    """
+    global metadata_cache, cache_opened
+    with shared_lock:
+        if not cache_opened:
+            if config.CACHE_PATH and not (config.DRY_RUN and not os.path.exists(config.CACHE_PATH)):
+                metadata_cache = MetadataCache(config.CACHE_PATH, config.CACHE_MAX_ENTRIES,
+                                               config.SQLITE_JOURNAL_MODE, read_only=config.DRY_RUN)
+            cache_opened = True
+    return metadata_cache
+
+def cache_key_for(text):
+    """
+    Build the metadata cache key of a text for the configured model and prompt.
+
+    Parameters:
+        text (str): The text that would be sent to the model.
+
+    Returns:
+        str: The cache key.
+    """
+    return make_cache_key(text, config.MODEL_NAME, config.PROMPT_VERSION)
+
+# Fields of the metadata and the JSON schema of the model's answer. Author
+# is a list, so that several authors need no separator convention, and Year
+# an integer, or null when the text does not give one.
+METADATA_FIELDS = ("Author", "Title", "Year")
+FIELD_SCHEMAS = {
+    "Author": {"type": "array", "items": {"type": "string"}},
+    "Title": {"type": "string"},
+    "Year": {"type": ["integer", "null"]},
+}
+FIELD_RULES = {
+    "Author": "a list of author names",
+    "Title": "the title, a non-empty string",
+    "Year": "the year of publication as a 4-digit integer, or null if unknown",
+}
+# Characters of the document sent with a repair prompt.
+REPAIR_CONTEXT_CHARS = 800
+
+def metadata_schema(fields=METADATA_FIELDS, with_id=False):
+    """
+    Build the JSON schema of a metadata object.
+
+    Parameters:
+        fields (iterable): The fields to include.
+        with_id (bool): Add the "id" of the document (packed prompts).
+
+    Returns:
+        dict: The schema, in the strict form required by structured outputs.
+    """
+    properties = {"id": {"type": "string"}} if with_id else {}
+    properties.update({field: FIELD_SCHEMAS[field] for field in fields})
+    return {"type": "object", "properties": properties, "required": list(properties),
+            "additionalProperties": False}
+
+def response_format(name, schema):
+    """
+    Build the response_format argument that constrains the reply to a schema.
+
+    Parameters:
+        name (str): Name of the schema.
+        schema (dict): The JSON schema of the reply.
+
+    Returns:
+        dict or None: The argument, or None if STRUCTURED_OUTPUT is off.
+    """
+    if not config.STRUCTURED_OUTPUT:
+        return None
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+
+def build_messages(text):
+    """
+    Build the chat messages that ask the model for the Author, Title and Year.
+
+    Used for both direct API calls and batch requests.
+
+    Parameters:
+        text (str): The document text.
+
+    Returns:
+        list: The messages for a chat completion request.
+    """
+    prompt = (
+        "Extract the Author, Title, and Year of publication from the following text. "
+        "List every author; use an empty list if there is none and null if the year is unknown. "
+        "Return ONLY valid JSON exactly in the following format without any additional text or markdown:\n\n"
+        "{\n"
+        '  "Author": ["Author Name", "Other Author Name"],\n'
+        '  "Title": "Title of the Work",\n'
+        '  "Year": 2020\n'
+        "}\n\n"
+        f"{text}"
+    )
+    return [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": prompt}
+    ]
+
+def decode_reply(assistant_message):
+    """
+    Decode the JSON in the assistant's reply, ignoring markdown code fences.
+
+    Parameters:
+        assistant_message (str): The content of the assistant's message.
+
+    Returns:
+        The decoded JSON value.
+
+    Raises:
+        json.JSONDecodeError: If the reply is not valid JSON.
+    """
+    # Remove any markdown code block formatting from the response.
+    assistant_message = re.sub(r"```(?:json)?\n", "", assistant_message or "")
+    assistant_message = re.sub(r"```", "", assistant_message)
+    return json.loads(assistant_message)
+
+def validate_field(field, value):
+    """
+    Check one field of the model's answer and convert it to the metadata format.
+
+    Plain strings are accepted for Author and Year too, as older replies and
+    models without structured outputs give them.
+
+    Parameters:
+        field (str): "Author", "Title" or "Year".
+        value: The value from the reply.
+
+    Returns:
+        str: The value as stored in the metadata ("NULL" for an unknown
+            author or year; several authors are separated by semicolons).
+
+    Raises:
+        ValueError: If the value is invalid.
+    """
+    if field == "Author":
+        if isinstance(value, str):
+            value = [value]
+        if not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+            raise ValueError(f"expected a list of names, got {json.dumps(value)}")
+        names = [name.strip() for name in value if name.strip() and name.strip().upper() != "NULL"]
+        return "; ".join(names) if names else "NULL"
+    if field == "Title":
+        if not isinstance(value, str) or not value.strip() or value.strip().upper() == "NULL":
+            raise ValueError(f"expected a non-empty string, got {json.dumps(value)}")
+        return value.strip()
+    if value is None or (isinstance(value, str) and value.strip().upper() in ("", "NULL")):
+        return "NULL"
+    if isinstance(value, str) and re.fullmatch(r"\s*\d{4}\s*", value):
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or not 1000 <= value <= 2999:
+        raise ValueError(f"expected a 4-digit integer or null, got {json.dumps(value)}")
+    return str(value)
+
+def validate_metadata(entry, fields=METADATA_FIELDS):
+    """
+    Check the fields of one metadata object from the model's answer.
+
+    Parameters:
+        entry: The decoded JSON object.
+        fields (iterable): The fields to check.
+
+    Returns:
+        tuple: (metadata, errors). metadata maps the valid fields to their
+            values; errors maps each invalid or missing field to a reason.
+    """
+    metadata, errors = {}, {}
+    if not isinstance(entry, dict):
+        return metadata, {field: f"the reply was not a JSON object: {json.dumps(entry)}" for field in fields}
+    for field in fields:
+        if field not in entry:
+            errors[field] = "missing"
+            continue
+        try:
+            metadata[field] = validate_field(field, entry[field])
+        except ValueError as e:
+            errors[field] = str(e)
+    return metadata, errors
+
+def parse_metadata_response(assistant_message):
+    """
+    Parse and validate the assistant's reply into a metadata dictionary.
+
+    Parameters:
+        assistant_message (str): The content of the assistant's message.
+
+    Returns:
+        dict: A dictionary with keys "Author", "Title", and "Year".
+
+    Raises:
+        ValueError: If the reply is not valid JSON (json.JSONDecodeError) or
+            a field is invalid.
+    """
+    metadata, errors = validate_metadata(decode_reply(assistant_message))
+    if errors:
+        raise ValueError("; ".join(f"{field}: {reason}" for field, reason in errors.items()))
+    return metadata
+
+def check_reply(assistant_message):
+    """
+    Parse the assistant's reply, collecting what is wrong with it instead of raising.
+
+    Parameters:
+        assistant_message (str): The content of the assistant's message.
+
+    Returns:
+        tuple: (metadata, errors), see validate_metadata().
+    """
+    try:
+        entry = decode_reply(assistant_message)
+    except json.JSONDecodeError as jde:
+        return {}, {field: f"the reply was not valid JSON ({jde})" for field in METADATA_FIELDS}
+    return validate_metadata(entry)
+
+def build_repair_messages(text, assistant_message, errors):
+    """
+    Build a short prompt that asks the model to fix only the invalid fields.
+
+    Only the beginning of the document is sent again, with the previous reply.
+
+    Parameters:
+        text (str): The document text.
+        assistant_message (str): The invalid reply.
+        errors (dict): Maps each invalid field to the reason.
+
+    Returns:
+        list: The messages for a chat completion request.
+    """
+    problems = "\n".join(f"- {field}: {reason}. It must be {FIELD_RULES[field]}."
+                         for field, reason in errors.items())
+    example = ", ".join(f'"{field}": ...' for field in errors)
+    prompt = (
+        "Your previous answer about the document below had invalid fields:\n"
+        f"{problems}\n\n"
+        f"Previous answer: {(assistant_message or '').strip()[:500]}\n\n"
+        f"Return ONLY valid JSON with the corrected fields, {{{example}}}, without any additional text.\n\n"
+        f"Beginning of the document:\n{text[:REPAIR_CONTEXT_CHARS]}"
+    )
+    return [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": prompt}
+    ]
+
+def repair_metadata(text, assistant_message, metadata, errors):
+    """
+    Ask the model once to fix the invalid fields of its answer.
+
+    Parameters:
+        text (str): The document text.
+        assistant_message (str): The invalid reply.
+        metadata (dict): The fields that were valid.
+        errors (dict): Maps each invalid field to the reason.
+
+    Returns:
+        dict or None: The complete metadata. A field that is still invalid
+            becomes "NULL", except the title: without a title the result is
+            None and the file is left in place.
+    """
+    print(f"Invalid fields in the reply ({', '.join(errors)}); asking the model to correct them.")
+    metrics.add(repairs=1)
+    fields = list(errors)
+    try:
+        reply = get_backend().complete(
+            build_repair_messages(text, assistant_message, errors),
+            expected_output_tokens=20 * len(fields),
+            response_format=response_format("metadata_repair", metadata_schema(fields))
+        )
+        print(f"Corrected fields: {reply}")
+        try:
+            fixed, errors = validate_metadata(decode_reply(reply), fields)
+        except json.JSONDecodeError as jde:
+            fixed, errors = {}, {field: f"the reply was not valid JSON ({jde})" for field in fields}
+    except Exception as e:
+        print(f"Error during metadata repair: {e}")
+        return None
+    metadata = dict(metadata, **fixed)
+    if errors:
+        metrics.add(parse_failures=1)
+        print(f"Still invalid after the correction: {'; '.join(f'{f}: {r}' for f, r in errors.items())}")
+        if "Title" in errors:
+            return None
+        metadata.update(dict.fromkeys(errors, "NULL"))
+    return {field: metadata[field] for field in METADATA_FIELDS}
+
+def infer_metadata(text):
+    """
+    Use the model to extract metadata (Author, Title, Year) from text.
+
+    The model is called with temperature=0 to ensure consistent output and,
+    with STRUCTURED_OUTPUT, constrained to the metadata JSON schema. The
+    fields are validated; invalid ones get one short repair prompt (see
+    repair_metadata()) instead of a full re-send. The metadata cache is
+    checked before calling the model, and successful results are stored in
+    it. With the OpenAI backend, rate-limit errors, timeouts and server
+    errors are retried (see MAX_RETRIES).
+
+    Parameters:
+        text (str): Text from which to extract metadata.
+
+    Returns:
+        dict or None: A dictionary with keys "Author", "Title", and "Year",
+            or None if the API call failed, even after retrying, no valid
+            title could be obtained, or the text is not cached in a dry run.
+    """
+    cache = get_metadata_cache()
+    cache_key = cache_key_for(text)
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            print("Using cached metadata for this text.")
+            return cached
+    if config.DRY_RUN:
+        print("Dry run: the text is not sent to the model.")
+        return None
+
+    try:
+        current_backend = get_backend()
+        print(f"Sending prompt to {current_backend.describe()} with temperature=0...")
+        assistant_message = current_backend.complete(
+            build_messages(text),
+            response_format=response_format("metadata", metadata_schema())
+        )
+        print(f"Received response from {current_backend.describe()}:")
+        print(assistant_message)
+    except Exception as e:
+        # The API call failed; leave the file alone rather than naming it NULL.
+        print(f"Error during metadata inference: {e}")
+        return None
+
+    metadata, errors = check_reply(assistant_message)
+    if errors:
+        metrics.add(parse_failures=1)
+        metadata = repair_metadata(text, assistant_message, metadata, errors)
+    # Remember the result for future runs.
+    if metadata is not None and cache is not None:
+        cache.put(cache_key, metadata)
+    return metadata
+
+def build_packed_messages(texts):
+    """
+    Build the chat messages that ask for the metadata of several documents.
+
+    Parameters:
+        texts (dict): Maps a short document id to the document text.
+
+    Returns:
+        list: The messages for a chat completion request.
+    """
+    prompt = (
+        "Extract the Author, Title, and Year of publication from each of the following documents. "
+        "List every author; use an empty list if there is none and null if the year is unknown. "
+        "Return ONLY valid JSON with one object per document, exactly in the following "
+        "format without any additional text or markdown:\n\n"
+        '{"documents": [\n'
+        '  {"id": "Document id", "Author": ["Author Name"], "Title": "Title of the Work", "Year": 2020}\n'
+        "]}\n\n"
+    )
+    # Append each document under a header carrying its id.
+    for doc_id, text in texts.items():
+        prompt += f"=== Document {doc_id} ===\n{text}\n\n"
+    return [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": prompt}
+    ]
+
+def packed_response_format():
+    """
+    Build the response_format argument of packed prompts.
+
+    Returns:
+        dict or None: The argument, or None if STRUCTURED_OUTPUT is off.
+    """
+    schema = {
+        "type": "object",
+        "properties": {"documents": {"type": "array", "items": metadata_schema(with_id=True)}},
+        "required": ["documents"],
+        "additionalProperties": False
+    }
+    return response_format("packed_metadata", schema)
+
+def parse_packed_response(assistant_message):
+    """
+    Parse the assistant's reply to a packed prompt.
+
+    Both {"documents": [...]} and a bare JSON array are accepted.
+
+    Parameters:
+        assistant_message (str): The content of the assistant's message.
+
+    Returns:
+        dict: Maps each document id to (metadata, errors, entry), see
+            validate_metadata(); entry is the object from the reply. Entries
+            without an id are left out.
+
+    Raises:
+        json.JSONDecodeError: If the reply is not valid JSON.
+    """
+    entries = decode_reply(assistant_message)
+    if isinstance(entries, dict):
+        entries = entries.get("documents", [entries])
+    if not isinstance(entries, list):
+        entries = [entries]
+
+    results = {}
+    for entry in entries:
+        if not isinstance(entry, dict) or "id" not in entry:
+            # Leave the entry out; infer_metadata_packed() retries it on its own.
+            print(f"Skipping malformed entry in packed response: {entry}")
+            continue
+        metadata, errors = validate_metadata(entry)
+        results[str(entry["id"])] = (metadata, errors, entry)
+    return results
+
+def infer_metadata_packed(texts):
+    """
+    Infer the metadata of several texts with a single API call.
+
+    Cached texts are not sent. Entries of the packed reply with invalid
+    fields get a repair prompt of their own (see repair_metadata()). Any
+    text missing from the packed reply falls back to infer_metadata(), so
+    every key gets a result.
+
+    Parameters:
+        texts (dict): Maps a key (for example the file path) to its text.
+
+    Returns:
+        dict: Maps the same keys to metadata dictionaries, or to None for
+            texts whose API call failed, even after retrying, or without a
+            valid title.
+    """
+    cache = get_metadata_cache()
+    results = {}
+    pending = {}
+    cache_keys = {}
+    for key, text in texts.items():
+        cache_keys[key] = cache_key_for(text)
+        cached = cache.get(cache_keys[key]) if cache is not None else None
+        if cached is not None:
+            results[key] = cached
+        else:
+            pending[key] = text
+    if config.DRY_RUN:
+        if pending:
+            print(f"Dry run: {len(pending)} text(s) are not sent to the model.")
+        results.update(dict.fromkeys(pending))
+        return results
+
+    if len(pending) > 1:
+        # Short numeric ids keep the prompt small; map them back to the keys.
+        ids = {str(i): key for i, key in enumerate(pending, 1)}
+        try:
+            current_backend = get_backend()
+            print(f"Sending packed prompt for {len(pending)} documents to {current_backend.describe()}...")
+            assistant_message = current_backend.complete(
+                build_packed_messages({doc_id: pending[key] for doc_id, key in ids.items()}),
+                expected_output_tokens=50 * len(ids),
+                response_format=packed_response_format()
+            )
+            for doc_id, (metadata, errors, entry) in parse_packed_response(assistant_message).items():
+                key = ids.get(doc_id)
+                if key is None or key in results:
+                    continue
+                if errors:
+                    metrics.add(parse_failures=1)
+                    metadata = repair_metadata(pending[key], json.dumps(entry), metadata, errors)
+                results[key] = metadata
+                if metadata is not None and cache is not None:
+                    cache.put(cache_keys[key], metadata)
+        except json.JSONDecodeError as jde:
+            metrics.add(parse_failures=1)
+            print(f"JSON Decode Error in packed response: {jde}")
+        except rate_limiter.retryable_errors() as e:
+            # The API is still unavailable after all retries; one request per
+            # document would only fail the same way.
+            print(f"Error during packed metadata inference: {e}")
+            for key in pending:
+                results.setdefault(key, None)
+        except Exception as e:
+            print(f"Error during packed metadata inference: {e}")
+
+    # Fall back to one request per document for anything still missing.
+    for key, text in pending.items():
+        if key not in results:
+            results[key] = infer_metadata(text)
+    return results
+
+def guess_local_metadata(text, embedded):
+    """
+    Run the local pre-extractor on the embedded fields and the text.
+
+    Parameters:
+        text (str): The extracted text.
+        embedded (dict): Keyword arguments for local_metadata.guess_metadata()
+            returned by the extractor.
+
+    Returns:
+        dict or None: The metadata if it has a year and its confidence
+            reaches LOCAL_CONFIDENCE_THRESHOLD, otherwise None (the model has
+            to be asked).
+    """
+    metadata, confidence = local_metadata.guess_metadata(text, **(embedded or {}))
+    # Title, author and DOI alone reach the threshold, but the file name needs a year.
+    if confidence >= config.LOCAL_CONFIDENCE_THRESHOLD and metadata["Year"] != "NULL":
+        print(f"Using embedded metadata (confidence {confidence:.2f}); skipping the API call.")
+        return metadata
+    return None
@@ -0,0 +1,181 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# ---------------------------------------------------------------------------
+# Resumable job journal for the renamer engine.
+#
+# The journal records how far each file got: discovered, extracted (with the
+# excerpt), inferred (with the metadata) and moved (with the target path).
+# If a run dies halfway, the next run picks every file up at its last
+# completed stage, so metadata that was already paid for is never requested
+# again.
+#
+# Writes are buffered and committed in batches (every flush_every records or
+# flush_interval seconds) to a SQLite database, in WAL mode unless the
+# workers of a shared inbox need a rollback journal, so journaling does
+# not cost an fsync per file. A crash loses at most the last unflushed batch,
+# and the files in it are simply redone.
+# ---------------------------------------------------------------------------
+
+DISCOVERED = "discovered"
+EXTRACTED = "extracted"
+INFERRED = "inferred"
+MOVED = "moved"
+
+def file_signature(path):
+    """
+    Return the size and modification time of a file.
+
+    Parameters:
+        path (str): The file path.
+
+    Returns:
+        tuple: (size, mtime_ns), or (None, None) if the file does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None, None
+    return stat.st_size, stat.st_mtime_ns
+
+class JobJournal:
+    """
+    Per-file progress journal backed by SQLite, with batched writes.
+
+    The journal can be shared between worker threads.
+    """
+
+    def __init__(self, path, flush_every=100, flush_interval=2.0, journal_mode="WAL"):
+        """
+        Open (and create if needed) the journal database.
+
+        Parameters:
+            path (str): Path of the SQLite database file.
+            flush_every (int): Commit after this many buffered records.
+            flush_interval (float): Commit buffered records at least this
+                often, in seconds.
+            journal_mode (str): SQLite journal mode; "DELETE" on storage
+                shared by several workers, where WAL does not work.
+        """
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        # Records not yet written, keyed by file path (the latest one wins).
+        self.buffer = {}
+        self.last_flush = time.monotonic()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # Wait for the locks of other workers instead of failing at once.
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.connection.execute(f"PRAGMA journal_mode={journal_mode}")
+        # synchronous=NORMAL survives process crashes; only an OS crash can
+        # lose the most recent commits.
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " path TEXT PRIMARY KEY,"
+            " state TEXT NOT NULL,"
+            " size INTEGER,"
+            " mtime_ns INTEGER,"
+            " data TEXT NOT NULL,"
+            " updated REAL NOT NULL)"
+        )
+        self.connection.commit()
+
+    def get(self, path):
+        """
+        Look up the journal entry of a file.
+
+        Entries recorded for a different version of the file (another size
+        or modification time) are ignored, and so are MOVED entries: a file
+        found again at a path it was moved away from is a new file.
+
+        Parameters:
+            path (str): The file path.
+
+        Returns:
+            dict or None: {"state": ..., "data": {...}}, or None if the file
+                has no usable entry.
+        """
+        with self.lock:
+            record = self.buffer.get(path)
+            if record is None:
+                row = self.connection.execute(
+                    "SELECT state, size, mtime_ns, data FROM jobs WHERE path = ?", (path,)
+                ).fetchone()
+                if row is None:
+                    return None
+                record = (row[0], row[1], row[2], json.loads(row[3]))
+        state, size, mtime_ns, data = record
+        if state == MOVED or (size, mtime_ns) != file_signature(path):
+            return None
+        return {"state": state, "data": data}
+
+    def record(self, path, state, **data):
+        """
+        Record that a file reached a stage.
+
+        Parameters:
+            path (str): The file path.
+            state (str): DISCOVERED, EXTRACTED, INFERRED or MOVED.
+            **data: Stage details to store, for example text=..., metadata=...
+                or target=.... They are merged with the details of earlier stages.
+        """
+        size, mtime_ns = file_signature(path)
+        with self.lock:
+            previous = self.buffer.get(path)
+            if previous is None:
+                row = self.connection.execute(
+                    "SELECT state, size, mtime_ns, data FROM jobs WHERE path = ?", (path,)
+                ).fetchone()
+                if row is not None:
+                    previous = (row[0], row[1], row[2], json.loads(row[3]))
+            merged = {}
+            if previous is not None and state != DISCOVERED:
+                merged.update(previous[3])
+                # A moved file no longer exists at its old path; keep the
+                # signature it had when it was still there.
+                if size is None:
+                    size, mtime_ns = previous[1], previous[2]
+            merged.update(data)
+            self.buffer[path] = (state, size, mtime_ns, merged)
+            if (len(self.buffer) >= self.flush_every
+                    or time.monotonic() - self.last_flush >= self.flush_interval):
+                self.write_buffer()
+
+    def flush(self):
+        """
+        Write all buffered records to the database.
+        """
+        with self.lock:
+            self.write_buffer()
+
+    def write_buffer(self):
+        """
+        Write buffered records in one transaction. The caller holds self.lock.
+        """
+        if self.buffer:
+            now = time.time()
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO jobs (path, state, size, mtime_ns, data, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [(path, state, size, mtime_ns, json.dumps(data), now)
+                 for path, (state, size, mtime_ns, data) in self.buffer.items()]
+            )
+            self.connection.commit()
+            self.buffer.clear()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        """
+        Flush buffered records and close the database connection.
+        """
+        with self.lock:
+            self.write_buffer()
+            self.connection.close()
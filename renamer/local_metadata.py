@@ -0,0 +1,281 @@
+import re
+import datetime
+
+# ---------------------------------------------------------------------------
+# Local metadata pre-extraction for the renamer engine.
+#
+# Many documents already carry their Author, Title and Year: PDFs in the
+# document info dictionary or XMP packet, Markdown files in YAML front matter
+# or a leading "# Title" heading. guess_metadata() combines these fields with
+# a regex scan of the text (DOI, arXiv id, copyright/publication years) and
+# returns a confidence score, so the scripts only call the model when the
+# local result is not good enough.
+# ---------------------------------------------------------------------------
+
+# Weights used to build the confidence score (the sum is capped at 1.0).
+TITLE_WEIGHT = 0.4
+AUTHOR_WEIGHT = 0.4
+# A year taken from a publication date, an arXiv id or a copyright line.
+STRONG_YEAR_WEIGHT = 0.2
+# A year that may only be the date the file was created.
+WEAK_YEAR_WEIGHT = 0.05
+# A DOI marks a published paper, whose embedded fields are usually reliable.
+DOI_WEIGHT = 0.1
+
+DOI_PATTERN = re.compile(r'\b10\.\d{4,9}/[^\s"<>]+', re.IGNORECASE)
+ARXIV_PATTERN = re.compile(r'\barXiv:\s*(\d{2})(\d{2})\.\d{4,5}', re.IGNORECASE)
+YEAR_PATTERN = re.compile(r'\b(1[89]\d{2}|20\d{2})\b')
+PUBLICATION_YEAR_PATTERN = re.compile(
+    r'(?:©|\(c\)|copyright|published|accepted|received|publication date)'
+    r'[^\n]{0,60}?\b(1[89]\d{2}|20\d{2})\b',
+    re.IGNORECASE
+)
+
+# Titles that document tools fill in by themselves.
+JUNK_TITLE_PATTERN = re.compile(
+    r'^(untitled|title|document\d*|slide \d+|microsoft (word|powerpoint) - .*|.*\.(docx?|pdf|tex|dvi|indd|qxd))$',
+    re.IGNORECASE
+)
+# Authors that document tools fill in by themselves.
+JUNK_AUTHORS = {"unknown", "admin", "administrator", "user", "owner", "author", "anonymous"}
+
+def find_identifiers(text):
+    """
+    Find a DOI and an arXiv id in the text.
+
+    Parameters:
+        text (str): The extracted document text.
+
+    Returns:
+        dict: Keys "DOI" and "arXiv", each a string or None.
+    """
+    doi = DOI_PATTERN.search(text)
+    arxiv = ARXIV_PATTERN.search(text)
+    return {
+        "DOI": doi.group(0).rstrip('.,;)') if doi else None,
+        "arXiv": arxiv.group(0).split(':', 1)[1].strip() if arxiv else None
+    }
+
+def valid_year(year):
+    """
+    Check that a year is plausible for a publication.
+
+    Parameters:
+        year (int): The year.
+
+    Returns:
+        bool: True if the year lies between 1800 and next year.
+    """
+    return 1800 <= year <= datetime.date.today().year + 1
+
+def year_from_date(value):
+    """
+    Extract the year from a date string such as "D:20190312120000" or "2019-03-12".
+
+    Parameters:
+        value: A date string, a datetime, or None.
+
+    Returns:
+        str or None: The four-digit year.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return str(value.year) if valid_year(value.year) else None
+    match = re.search(r'(1[89]\d{2}|20\d{2})', str(value))
+    if match and valid_year(int(match.group(1))):
+        return match.group(1)
+    return None
+
+def find_year(text):
+    """
+    Find the publication year in the text.
+
+    Parameters:
+        text (str): The extracted document text.
+
+    Returns:
+        tuple: (year, strong) where year is a string or None, and strong is
+            True if it came from an arXiv id or a copyright/publication line.
+    """
+    arxiv = ARXIV_PATTERN.search(text)
+    if arxiv and 1 <= int(arxiv.group(2)) <= 12:
+        return str(2000 + int(arxiv.group(1))), True
+
+    for match in PUBLICATION_YEAR_PATTERN.finditer(text):
+        if valid_year(int(match.group(1))):
+            return match.group(1), True
+
+    # Otherwise use the year mentioned most often.
+    counts = {}
+    for match in YEAR_PATTERN.finditer(text):
+        if valid_year(int(match.group(1))):
+            counts[match.group(1)] = counts.get(match.group(1), 0) + 1
+    if counts:
+        return max(counts, key=counts.get), False
+    return None, False
+
+def clean_field(value):
+    """
+    Normalize an embedded field to a single-line string.
+
+    Parameters:
+        value: The raw value (a string, a list of strings, or None).
+
+    Returns:
+        str: The cleaned value, or "" if there is none.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        value = "; ".join(str(v) for v in value if v)
+    return re.sub(r'\s+', ' ', str(value)).strip().strip('"\'')
+
+def plausible_title(title):
+    """
+    Check that an embedded title looks like a real title.
+
+    Parameters:
+        title (str): The cleaned title.
+
+    Returns:
+        bool: True if the title can be trusted.
+    """
+    return (4 <= len(title) <= 300
+            and re.search(r'[A-Za-z]{2}', title) is not None
+            and not JUNK_TITLE_PATTERN.match(title))
+
+def plausible_author(author):
+    """
+    Check that an embedded author looks like a real name.
+
+    Parameters:
+        author (str): The cleaned author string.
+
+    Returns:
+        bool: True if the author can be trusted.
+    """
+    return (2 <= len(author) <= 300
+            and re.search(r'[A-Za-z]{2}', author) is not None
+            and '@' not in author
+            and author.lower() not in JUNK_AUTHORS)
+
+def guess_metadata(text, title=None, author=None, date=None, date_is_publication=False):
+    """
+    Build metadata from embedded fields and the text, with a confidence score.
+
+    Parameters:
+        text (str): The extracted document text.
+        title (str): Embedded title, if any.
+        author (str or list): Embedded author(s), if any.
+        date: Embedded date, if any.
+        date_is_publication (bool): True if date is a publication date rather
+            than the date the file was created.
+
+    Returns:
+        tuple: (metadata, confidence) where metadata has the keys "Author",
+            "Title" and "Year" ("NULL" for missing values) and confidence is
+            a float between 0 and 1.
+    """
+    text = text or ""
+    confidence = 0.0
+    metadata = {"Author": "NULL", "Title": "NULL", "Year": "NULL"}
+
+    title = clean_field(title)
+    if plausible_title(title):
+        metadata["Title"] = title
+        confidence += TITLE_WEIGHT
+
+    author = clean_field(author)
+    if plausible_author(author):
+        metadata["Author"] = author
+        confidence += AUTHOR_WEIGHT
+
+    # Prefer a year found in the text over a file creation date.
+    year, strong = find_year(text)
+    embedded_year = year_from_date(date)
+    if embedded_year and (date_is_publication or not strong):
+        year, strong = embedded_year, date_is_publication
+    if year:
+        metadata["Year"] = year
+        confidence += STRONG_YEAR_WEIGHT if strong else WEAK_YEAR_WEIGHT
+
+    if find_identifiers(text)["DOI"]:
+        confidence += DOI_WEIGHT
+
+    return metadata, min(confidence, 1.0)
+
+def parse_front_matter(text):
+    """
+    Parse simple YAML front matter at the start of a Markdown document.
+
+    Only top-level "key: value" pairs and "- item" lists are understood,
+    which covers the title/author/date fields used by static site generators
+    and note-taking tools.
+
+    Parameters:
+        text (str): The beginning of the Markdown document.
+
+    Returns:
+        dict: Lower-cased keys mapped to strings or lists of strings. Empty if
+            the text has no front matter.
+    """
+    lines = text.lstrip('\ufeff').splitlines()
+    if not lines or lines[0].strip() != '---':
+        return {}
+
+    fields = {}
+    key = None
+    for line in lines[1:]:
+        if line.strip() in ('---', '...'):
+            return fields
+        item = re.match(r'^\s+-\s+(.*)$', line)
+        if item and key is not None:
+            if not isinstance(fields.get(key), list):
+                fields[key] = []
+            fields[key].append(item.group(1).strip().strip('"\''))
+            continue
+        pair = re.match(r'^([A-Za-z_][\w-]*)\s*:\s*(.*)$', line)
+        if pair:
+            key = pair.group(1).lower()
+            value = pair.group(2).strip()
+            if value.startswith('[') and value.endswith(']'):
+                fields[key] = [v.strip().strip('"\'') for v in value[1:-1].split(',') if v.strip()]
+            else:
+                fields[key] = value.strip('"\'')
+    # No closing delimiter within the excerpt: do not trust what was read.
+    return {}
+
+def markdown_fields(text):
+    """
+    Read the title, author and date of a Markdown document.
+
+    Front matter is used first. Without a front matter title, a "# Title"
+    heading at the top of the document is used.
+
+    Parameters:
+        text (str): The beginning of the Markdown document.
+
+    Returns:
+        dict: Keyword arguments for guess_metadata() ("title", "author",
+            "date" and "date_is_publication").
+    """
+    fields = parse_front_matter(text)
+    title = fields.get("title")
+    author = fields.get("author") or fields.get("authors") or fields.get("creator")
+    date = fields.get("date") or fields.get("year") or fields.get("published")
+
+    if not title:
+        for line in text.splitlines():
+            if not line.strip() or line.strip() == '---':
+                continue
+            heading = re.match(r'^#\s+(.+?)\s*#*\s*$', line)
+            if heading:
+                title = heading.group(1)
+                break
+            # Skip front matter lines; stop at the first line of body text.
+            if fields and re.match(r'^([A-Za-z_][\w-]*)\s*:|^\s+-\s', line):
+                continue
+            break
+
+    return {"title": title, "author": author, "date": date, "date_is_publication": bool(date)}
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# ---------------------------------------------------------------------------
+# Persistent metadata cache for the renamer engine.
+#
+# Inferred metadata is stored in a small SQLite database keyed by a hash of the
+# extracted text, the model name and the prompt version. A file that has been
+# seen before (a re-download, or a copy in another inbox) is then renamed
+# without calling the OpenAI API again.
+#
+# A dry run opens the cache read-only: lookups do not even refresh the
+# last-used time of an entry.
+# ---------------------------------------------------------------------------
+
+def make_cache_key(text, model, prompt_version):
+    """
+    Build the cache key for a piece of extracted text.
+
+    Parameters:
+        text (str): The text that would be sent to the model.
+        model (str): The model name used for inference.
+        prompt_version (str): Version of the prompt template.
+
+    Returns:
+        str: A hex SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    for part in (model, prompt_version, text):
+        digest.update(part.encode('utf-8'))
+        # Separator so that ("ab", "c") and ("a", "bc") hash differently.
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+class MetadataCache:
+    """
+    Size-bounded SQLite cache mapping a cache key to a metadata dictionary.
+
+    When the cache holds more than max_entries rows, the least recently used
+    entries are evicted. The cache can be shared between worker threads.
+    """
+
+    def __init__(self, path, max_entries=100000, journal_mode="WAL", read_only=False):
+        """
+        Open (and create if needed) the cache database.
+
+        Parameters:
+            path (str): Path of the SQLite database file.
+            max_entries (int): Maximum number of entries to keep.
+            journal_mode (str): SQLite journal mode; "DELETE" on storage
+                shared by several workers, where WAL does not work.
+            read_only (bool): Open an existing cache for lookups only;
+                put() then stores nothing.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.read_only = read_only
+        self.lock = threading.Lock()
+
+        if read_only:
+            # Imported here: only dry runs open the cache read-only.
+            from urllib.request import pathname2url
+            self.connection = sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro",
+                                              uri=True, timeout=60, check_same_thread=False)
+            self.entry_count = self.connection.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+            return
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # Wait for the locks of other workers instead of failing at once.
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.connection.execute(f"PRAGMA journal_mode={journal_mode}")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS metadata ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS metadata_last_used ON metadata (last_used)"
+        )
+        self.connection.commit()
+        self.entry_count = self.connection.execute(
+            "SELECT COUNT(*) FROM metadata"
+        ).fetchone()[0]
+
+    def get(self, key):
+        """
+        Look up cached metadata.
+
+        Parameters:
+            key (str): A key from make_cache_key().
+
+        Returns:
+            dict or None: The cached metadata, or None if the key is unknown.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value FROM metadata WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if not self.read_only:
+                self.connection.execute(
+                    "UPDATE metadata SET last_used = ? WHERE key = ?", (time.time(), key)
+                )
+                self.connection.commit()
+        return json.loads(row[0])
+
+    def put(self, key, metadata):
+        """
+        Store metadata and evict the oldest entries if the cache is full.
+
+        Parameters:
+            key (str): A key from make_cache_key().
+            metadata (dict): The metadata to store.
+        """
+        if self.read_only:
+            return
+        with self.lock:
+            exists = self.connection.execute(
+                "SELECT 1 FROM metadata WHERE key = ?", (key,)
+            ).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO metadata (key, value, last_used) VALUES (?, ?, ?)",
+                (key, json.dumps(metadata), time.time())
+            )
+            if not exists:
+                self.entry_count += 1
+            # Evict the least recently used entries once the cache is over its limit.
+            if self.entry_count > self.max_entries:
+                self.connection.execute(
+                    "DELETE FROM metadata WHERE key IN ("
+                    " SELECT key FROM metadata ORDER BY last_used LIMIT ?)",
+                    (self.entry_count - self.max_entries,)
+                )
+                self.entry_count = self.max_entries
+            self.connection.commit()
+
+    def close(self):
+        """
+        Close the database connection.
+        """
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,367 @@
+import os
+import json
+import time
+import bisect
+import threading
+
+# ---------------------------------------------------------------------------
+# Per-stage instrumentation of the renamer engine.
+#
+# The engine wraps the extract, infer and move stages of every file in
+#
+#   with metrics.stage("extract", path) as stage:
+#       ...
+#       stage.add(cpu_s=worker_cpu)
+#
+# which measures wall-clock time, CPU time of the calling thread and the size
+# of the file. Code running inside a stage can add counts to it with
+# metrics.add() without having the stage at hand; rate_limiter adds the prompt
+# and completion tokens from completion.usage and the number of retries, and
+# inference the replies that failed validation and the repair prompts sent.
+#
+# Metrics are off unless start_run() was called (see METRICS_FORMAT). When off,
+# stage() returns a shared do-nothing object, so the only cost is a function
+# call per stage. When on, finish_run() prints a summary with a histogram per
+# stage and, depending on the format, the stages are written to a JSON-lines
+# file as they finish, or the totals and histograms to a Prometheus text file.
+# ---------------------------------------------------------------------------
+
+# Upper bounds in seconds of the histogram buckets (Prometheus "le" labels).
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Counts that a stage can collect, besides wall and CPU time.
+COUNTS = ("file_bytes", "prompt_tokens", "completion_tokens", "retries", "errors", "parse_failures", "repairs")
+
+FORMATS = ("summary", "jsonl", "prometheus")
+DEFAULT_PATHS = {"jsonl": "renamer_metrics.jsonl", "prometheus": "renamer_metrics.prom"}
+
+# The metrics of the current run, or None when metrics are off.
+recorder = None
+# The metrics of the last finished run, e.g. for benchmark.py.
+last_run = None
+local = threading.local()
+
+def percentile(values, fraction):
+    """
+    Return a percentile of a sorted list of numbers (nearest-rank method).
+
+    Parameters:
+        values (list): The numbers, sorted.
+        fraction (float): The percentile as a fraction, e.g. 0.99.
+
+    Returns:
+        float: The percentile, or 0.0 for an empty list.
+    """
+    if not values:
+        return 0.0
+    rank = max(1, min(len(values), round(fraction * len(values) + 0.5)))
+    return values[rank - 1]
+
+class StageStats:
+    """
+    Durations and counts collected for one stage over a run.
+    """
+
+    def __init__(self):
+        self.wall = []
+        self.cpu = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.counts = dict.fromkeys(COUNTS, 0)
+
+    def add(self, wall, cpu, counts):
+        self.wall.append(wall)
+        self.cpu += cpu
+        self.buckets[bisect.bisect_left(BUCKETS, wall)] += 1
+        for name, value in counts.items():
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def merge(self, other):
+        """
+        Add the durations and counts of the same stage from another run,
+        e.g. of another worker process.
+
+        Parameters:
+            other (StageStats): The stage to add.
+        """
+        self.wall.extend(other.wall)
+        self.cpu += other.cpu
+        self.buckets = [mine + theirs for mine, theirs in zip(self.buckets, other.buckets)]
+        for name, value in other.counts.items():
+            self.counts[name] = self.counts.get(name, 0) + value
+
+class RunMetrics:
+    """
+    Collects the stages of one run and writes them out.
+    """
+
+    def __init__(self, output_format="summary", path=None):
+        """
+        Parameters:
+            output_format (str): "summary", "jsonl" or "prometheus".
+            path (str): Output file of the jsonl and prometheus formats
+                (default: DEFAULT_PATHS).
+
+        Raises:
+            ValueError: If the format is unknown.
+        """
+        if output_format not in FORMATS:
+            raise ValueError(f"Unknown metrics format {output_format!r}. Available: {', '.join(FORMATS)}.")
+        self.format = output_format
+        self.path = path or DEFAULT_PATHS.get(output_format)
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.started = time.time()
+        self.file = None
+        if self.format == "jsonl":
+            self.file = open(self.path, 'a', encoding='utf-8')
+
+    def record(self, name, path, started, wall, cpu, counts, error):
+        """
+        Add a finished stage.
+
+        Parameters:
+            name (str): The stage name.
+            path (str): The file the stage worked on, or None.
+            started (float): Start time (seconds since the epoch).
+            wall (float): Wall-clock seconds.
+            cpu (float): CPU seconds.
+            counts (dict): Counts collected by the stage (see COUNTS).
+            error (str): Exception type that ended the stage, or None.
+        """
+        with self.lock:
+            self.stages.setdefault(name, StageStats()).add(wall, cpu, counts)
+            if self.file is not None:
+                event = {"event": "stage", "stage": name, "path": path, "start": round(started, 6),
+                         "wall_s": round(wall, 6), "cpu_s": round(cpu, 6)}
+                event.update(counts)
+                if error:
+                    event["error"] = error
+                self.file.write(json.dumps(event) + "\n")
+
+    def merge(self, stages):
+        """
+        Add the stages of another run, e.g. of another worker process.
+
+        Parameters:
+            stages (dict): Stage names and their StageStats.
+        """
+        with self.lock:
+            for name, stats in stages.items():
+                self.stages.setdefault(name, StageStats()).merge(stats)
+
+    def summary(self):
+        """
+        Summarize the run.
+
+        Returns:
+            dict: Per stage, the number of calls, p50/p90/p99/max and total
+                wall time, CPU time and the summed counts.
+        """
+        with self.lock:
+            summary = {}
+            for name, stats in self.stages.items():
+                wall = sorted(stats.wall)
+                summary[name] = dict(
+                    calls=len(wall),
+                    p50_s=percentile(wall, 0.50),
+                    p90_s=percentile(wall, 0.90),
+                    p99_s=percentile(wall, 0.99),
+                    max_s=wall[-1] if wall else 0.0,
+                    wall_s=sum(wall),
+                    cpu_s=stats.cpu,
+                    **stats.counts
+                )
+            return summary
+
+    def print_summary(self):
+        """
+        Print a table of the stages and a histogram of their wall-clock times.
+        """
+        summary = self.summary()
+        if not summary:
+            return
+        print(f"\nStage timings (run of {time.time() - self.started:.1f} s):")
+        print(f"{'stage':<10}{'calls':>7}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'wall s':>9}{'cpu s':>8}")
+        for name, stage in summary.items():
+            print(f"{name:<10}{stage['calls']:>7}{stage['p50_s'] * 1000:>10.1f}{stage['p99_s'] * 1000:>10.1f}"
+                  f"{stage['max_s'] * 1000:>10.1f}{stage['wall_s']:>9.2f}{stage['cpu_s']:>8.2f}")
+        totals = {name: sum(stage.get(name, 0) for stage in summary.values()) for name in COUNTS}
+        print(f"Prompt tokens: {totals['prompt_tokens']}, completion tokens: {totals['completion_tokens']}, "
+              f"retries: {totals['retries']}, errors: {totals['errors']}, "
+              f"parse failures: {totals['parse_failures']}, repairs: {totals['repairs']}")
+
+        with self.lock:
+            histograms = {name: list(stats.buckets) for name, stats in self.stages.items()}
+        labels = [f"<= {bound * 1000:g} ms" if bound < 1 else f"<= {bound:g} s" for bound in BUCKETS]
+        labels.append(f"> {BUCKETS[-1]:g} s")
+        for name, buckets in histograms.items():
+            print(f"\n{name} (wall clock):")
+            # Only print the range of buckets that were used.
+            used = [i for i, count in enumerate(buckets) if count]
+            widest = max(buckets)
+            for i in range(used[0], used[-1] + 1):
+                bar = "#" * round(40 * buckets[i] / widest)
+                print(f"  {labels[i]:>11} {buckets[i]:>7} {bar}")
+
+    def write_prometheus(self):
+        """
+        Write the histograms and totals in Prometheus text format.
+
+        The file is replaced atomically, so a collector never reads half of it.
+        """
+        summary = self.summary()
+        with self.lock:
+            histograms = {name: list(stats.buckets) for name, stats in self.stages.items()}
+        lines = [
+            "# HELP renamer_stage_duration_seconds Wall-clock time of the pipeline stages.",
+            "# TYPE renamer_stage_duration_seconds histogram",
+        ]
+        for name, buckets in histograms.items():
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), buckets):
+                cumulative += count
+                lines.append(f'renamer_stage_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'renamer_stage_duration_seconds_sum{{stage="{name}"}} {summary[name]["wall_s"]}')
+            lines.append(f'renamer_stage_duration_seconds_count{{stage="{name}"}} {summary[name]["calls"]}')
+        lines += [
+            "# HELP renamer_stage_cpu_seconds_total CPU time of the pipeline stages.",
+            "# TYPE renamer_stage_cpu_seconds_total counter",
+        ]
+        lines += [f'renamer_stage_cpu_seconds_total{{stage="{name}"}} {stage["cpu_s"]}'
+                  for name, stage in summary.items()]
+        for count in COUNTS:
+            lines += [f"# TYPE renamer_{count}_total counter"]
+            lines += [f'renamer_{count}_total{{stage="{name}"}} {stage.get(count, 0)}'
+                      for name, stage in summary.items()]
+
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(temporary_path, self.path)
+
+    def close(self):
+        """
+        Write the outputs of the run and print the summary.
+        """
+        if self.format == "prometheus":
+            self.write_prometheus()
+        if self.file is not None:
+            with self.lock:
+                self.file.close()
+                self.file = None
+        self.print_summary()
+        if self.path and self.format != "summary":
+            print(f"Wrote the run metrics to {self.path}")
+
+class Stage:
+    """
+    Measures one stage of one file. Use through stage().
+    """
+
+    def __init__(self, run, name, path):
+        self.run = run
+        self.name = name
+        self.path = path
+        self.counts = {}
+
+    def __enter__(self):
+        if self.path is not None:
+            try:
+                self.counts["file_bytes"] = os.path.getsize(self.path)
+            except OSError:
+                pass
+        self.outer = getattr(local, "stage", None)
+        local.stage = self
+        self.started = time.time()
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.thread_time()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        wall = time.perf_counter() - self.wall_start
+        cpu = time.thread_time() - self.cpu_start + self.counts.pop("cpu_s", 0.0)
+        local.stage = self.outer
+        if exc_type is not None:
+            self.add(errors=1)
+        error = exc_type.__name__ if exc_type is not None else None
+        self.run.record(self.name, self.path, self.started, wall, cpu, self.counts, error)
+        return False
+
+    def add(self, **counts):
+        """
+        Add to the counts of the stage, e.g. add(retries=1).
+
+        cpu_s adds CPU time spent outside the calling thread (in a worker process).
+        """
+        for name, value in counts.items():
+            self.counts[name] = self.counts.get(name, 0) + value
+
+class NullStage:
+    """
+    Stands in for Stage when metrics are off.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+    def add(self, **counts):
+        pass
+
+NULL_STAGE = NullStage()
+
+def stage(name, path=None):
+    """
+    Measure a stage of the pipeline.
+
+    Parameters:
+        name (str): The stage name, e.g. "extract".
+        path (str): The file the stage works on, or None.
+
+    Returns:
+        Stage or NullStage: A context manager; its add() method adds counts.
+    """
+    if recorder is None:
+        return NULL_STAGE
+    return Stage(recorder, name, path)
+
+def add(**counts):
+    """
+    Add counts to the innermost stage running in this thread, if any.
+
+    Parameters:
+        **counts: Counts such as prompt_tokens=120 or retries=1.
+    """
+    if recorder is None:
+        return
+    current = getattr(local, "stage", None)
+    if current is not None:
+        current.add(**counts)
+
+def start_run(output_format="summary", path=None):
+    """
+    Turn metrics on for a run.
+
+    Parameters:
+        output_format (str): "summary", "jsonl" or "prometheus".
+        path (str): Output file of the jsonl and prometheus formats.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    global recorder
+    recorder = RunMetrics(output_format, path)
+
+def finish_run():
+    """
+    Turn metrics off and write out the run, if metrics were on.
+
+    The run stays available as last_run.
+    """
+    global recorder, last_run
+    run, recorder = recorder, None
+    if run is not None:
+        run.close()
+        last_run = run
@@ -0,0 +1,267 @@
+import os
+import errno
+import re
+import shutil
+import tempfile
+import threading
+
+# ---------------------------------------------------------------------------
+# File naming and moving.
+#
+# Files are renamed to "<Author> <Year>--<Title>.<ext>". With several
+# authors, the last name of the first author is followed by "et al.".
+# ---------------------------------------------------------------------------
+
+# Destination paths claimed by workers that are still moving their file.
+# Guarded by move_lock so two workers never pick the same new file name.
+# Other processes (see renamer.work_queue) are kept from overwriting each
+# other's files by move_without_overwrite().
+move_lock = threading.Lock()
+reserved_paths = set()
+
+def sanitize_string(s):
+    """
+    Remove characters that are invalid in file names.
+
+    Parameters:
+        s (str): The string to sanitize.
+
+    Returns:
+        str: The sanitized string.
+    """
+    return re.sub(r'[\\/*?:"<>|]', "", s)
+
+def parse_authors(author_str):
+    """
+    Split a string of authors into a list of individual authors.
+
+    Parameters:
+        author_str (str): A string that lists authors.
+
+    Returns:
+        list: A list of individual author names.
+    """
+    if ';' in author_str:
+        # Split authors using semicolons.
+        authors = [a.strip() for a in author_str.split(';') if a.strip()]
+        return authors
+    elif ' and ' in author_str:
+        # Split authors using the word "and".
+        authors = [a.strip() for a in author_str.split(' and ') if a.strip()]
+        return authors
+    else:
+        comma_count = author_str.count(',')
+        words = author_str.split()
+        if comma_count == 1:
+            # If there is one comma and the string is long, assume multiple authors.
+            if len(words) > 3:
+                authors = [a.strip() for a in author_str.split(',') if a.strip()]
+                return authors
+            else:
+                return [author_str.strip()]
+        elif comma_count > 1:
+            # Split authors using commas.
+            authors = [a.strip() for a in author_str.split(',') if a.strip()]
+            return authors
+        else:
+            # Return the string as a single author.
+            return [author_str.strip()]
+
+def reformat_single_author(author_str):
+    """
+    Reformat an author's name from "Last, First" to "First Last".
+
+    Parameters:
+        author_str (str): The author name string.
+
+    Returns:
+        str: The reformatted author name.
+    """
+    if ',' in author_str:
+        parts = [p.strip() for p in author_str.split(',')]
+        if len(parts) >= 2:
+            return f"{parts[1]} {parts[0]}"
+    return author_str
+
+def get_last_name(author):
+    """
+    Extract the last name from a full author name.
+
+    Parameters:
+        author (str): The full author name.
+
+    Returns:
+        str: The last name.
+    """
+    author = author.strip()
+    if ',' in author:
+        return author.split(',')[0].strip()
+    name_parts = author.split()
+    if name_parts:
+        return name_parts[-1].strip()
+    return author
+
+def build_filename(metadata, extension):
+    """
+    Build the new file name from the metadata.
+
+    Parameters:
+        metadata (dict): A dictionary containing "Author", "Title", and "Year".
+        extension (str): The extension of the new file, e.g. ".pdf".
+
+    Returns:
+        str: The file name, <Author> <Year>--<Title><extension>.
+    """
+    # Remove invalid characters from metadata values.
+    author_raw = sanitize_string(metadata["Author"])
+    title = sanitize_string(metadata["Title"])
+    year = sanitize_string(metadata["Year"])
+
+    if not author_raw or author_raw.upper() == "NULL":
+        new_filename = f"NULL-{year}-{title}"
+    else:
+        authors_list = parse_authors(author_raw)
+        if len(authors_list) > 1:
+            # Use the last name of the first author followed by "et al." if multiple authors exist.
+            author_citation = f"{get_last_name(authors_list[0])} et al."
+        else:
+            # For a single author, reformat if the name is in "Last, First" format.
+            author_citation = reformat_single_author(authors_list[0])
+        new_filename = f"{author_citation} {year}--{title}"
+
+    # Append the extension if not already present.
+    if not new_filename.lower().endswith(extension):
+        new_filename += extension
+    return new_filename
+
+def link_without_overwrite(source, target):
+    """
+    Give a file a second name, failing if the target exists, even if another
+    process creates it at the same moment.
+
+    The file is hard-linked to the target. On file systems without hard
+    links, the target name is first created empty and exclusively, then the
+    file is renamed over that placeholder; the file then loses its old name.
+
+    Parameters:
+        source (str): The file.
+        target (str): The new path, on the same file system.
+
+    Raises:
+        FileExistsError: If the target exists.
+        OSError: If the target is on another device.
+    """
+    try:
+        os.link(source, target)
+        return
+    except (FileExistsError, AttributeError):
+        if os.path.lexists(target):
+            raise FileExistsError(target)
+    except OSError as e:
+        if e.errno == errno.EXDEV:
+            raise
+    # Hard links are not supported here.
+    descriptor = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+    os.close(descriptor)
+    os.replace(source, target)
+
+def copy_without_overwrite(source, target):
+    """
+    Copy a file to another device, failing if the target exists.
+
+    The file is copied to a temporary file next to the target, which is then
+    put in place with link_without_overwrite(), so the target never appears
+    half-written and never replaces a file created in the meantime.
+
+    Parameters:
+        source (str): The file.
+        target (str): The new path.
+
+    Raises:
+        FileExistsError: If the target exists.
+    """
+    # A unique temporary name, so that concurrent copies to the same target
+    # cannot overwrite each other's data.
+    descriptor, temporary_path = tempfile.mkstemp(
+        prefix=f".{os.path.basename(target)}.", suffix=".partial", dir=os.path.dirname(target) or "."
+    )
+    os.close(descriptor)
+    try:
+        shutil.copy2(source, temporary_path)
+        link_without_overwrite(temporary_path, target)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+def move_without_overwrite(source, target):
+    """
+    Move a file, failing if the target exists, even if another process
+    creates it at the same moment.
+
+    Within one file system the file is hard-linked to the target (which
+    fails if the target exists) and then unlinked from its old path. To
+    another device, it is copied with copy_without_overwrite() and then
+    removed.
+
+    Parameters:
+        source (str): The file.
+        target (str): The new path.
+
+    Raises:
+        FileExistsError: If the target exists.
+    """
+    try:
+        link_without_overwrite(source, target)
+    except FileExistsError:
+        raise
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        copy_without_overwrite(source, target)
+    if os.path.exists(source):
+        os.remove(source)
+
+def rename_and_move(original_path, metadata, destination_root, extension):
+    """
+    Rename a file based on its metadata and move it to a new directory.
+
+    If a file with the new name already exists, or another worker is moving
+    a file there, the file is skipped as a duplicate.
+
+    Parameters:
+        original_path (str): The current file path.
+        metadata (dict): A dictionary containing "Author", "Title", and "Year".
+        destination_root (str): The directory where the file should be moved.
+        extension (str): The extension of the new file, e.g. ".pdf".
+
+    Returns:
+        str or None: The new file path, or None if the file was not moved.
+    """
+    try:
+        new_filename = build_filename(metadata, extension)
+
+        # Create the destination directory if it does not exist.
+        os.makedirs(destination_root, exist_ok=True)
+        new_path = os.path.join(destination_root, new_filename)
+
+        # Check for duplicates and claim the new path for this worker.
+        with move_lock:
+            if os.path.exists(new_path) or new_path in reserved_paths:
+                print(f"Duplicate file '{new_filename}' already exists. Skipping '{original_path}'.")
+                return None
+            reserved_paths.add(new_path)
+
+        # Move the file to the destination with the new name.
+        try:
+            move_without_overwrite(original_path, new_path)
+        except FileExistsError:
+            print(f"Duplicate file '{new_filename}' already exists. Skipping '{original_path}'.")
+            return None
+        finally:
+            with move_lock:
+                reserved_paths.discard(new_path)
+        print(f"Moved: '{original_path}' -> '{new_path}'")
+        return new_path
+    except Exception as e:
+        print(f"Error renaming/moving '{original_path}': {e}")
+        return None
@@ -0,0 +1,337 @@
+import os
+import time
+import shutil
+import hashlib
+import threading
+import subprocess
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from renamer import extraction_pool
+from renamer.metadata_cache import MetadataCache
+
+# ---------------------------------------------------------------------------
+# OCR fallback for scanned PDFs.
+#
+# A PDF whose first page has no text layer (an image-only scan) is handed to
+# OcrPool instead of being skipped. Only the top of page 0, where the title
+# and authors are, is rasterized in grayscale at a modest resolution, and
+# tesseract reads the text from that image.
+#
+# OCR is slow and CPU-hungry, so it runs apart from the normal pipeline: a
+# small pool of low-priority worker processes (tesseract limited to one
+# thread each) does the work, and the rest of the file's processing
+# (inference, rename) continues on the pool's own threads. The engine's
+# worker threads hand a scan over and move on to the next file right away.
+#
+# Rasterizing needs pypdfium2 (pip install pypdfium2), which is only imported
+# by the worker processes, and recognizing the text needs the tesseract
+# program. Without them, OCR is turned off.
+#
+# The text is cached by the content of the file and the OCR settings, so a
+# scan is only read once, even across runs, after it is moved or renamed, and
+# for every copy of it. Only the size and the first and last few MB of the
+# file are hashed, so a lookup does not read a whole large scan. A dry run
+# reads the cache but does not add to it.
+# ---------------------------------------------------------------------------
+
+# Nice increment of the OCR worker processes.
+WORKER_NICENESS = 10
+
+# Bytes hashed from the start and from the end of a file for its cache key.
+CACHE_KEY_SAMPLE_BYTES = 4 * 1024 * 1024
+
+def missing_requirement():
+    """
+    Check that OCR can run on this machine.
+
+    Returns:
+        str or None: What is missing, or None if OCR is available.
+    """
+    # Checked without importing it, which is slow.
+    if importlib.util.find_spec("pypdfium2") is None:
+        return "pypdfium2 is not installed (pip install pypdfium2)"
+    if shutil.which("tesseract") is None:
+        return "the tesseract program was not found"
+    return None
+
+def init_worker(memory_limit_mb):
+    """
+    Initializer of the OCR worker processes: lower their priority and cap their memory.
+
+    Parameters:
+        memory_limit_mb (int): Address space limit in MB, or None for no limit.
+    """
+    if hasattr(os, "nice"):
+        try:
+            os.nice(WORKER_NICENESS)
+        except OSError:
+            pass
+    extraction_pool.limit_worker_memory(memory_limit_mb)
+
+def render_top_of_first_page(path, dpi, fraction):
+    """
+    Rasterize the top of the first page of a PDF in grayscale.
+
+    Parameters:
+        path (str): The file path to the PDF.
+        dpi (int): Resolution of the image.
+        fraction (float): Share of the page height to render, from the top.
+
+    Returns:
+        bytes: The image in binary PGM format.
+    """
+    import pypdfium2 as pdfium
+    document = pdfium.PdfDocument(path)
+    try:
+        page = document[0]
+        try:
+            _, height = page.get_size()
+            # crop is (left, bottom, right, top), in points.
+            bitmap = page.render(scale=dpi / 72, crop=(0, height * (1 - fraction), 0, 0), grayscale=True)
+            width, rows, stride = bitmap.width, bitmap.height, bitmap.stride
+            pixels = bytes(bitmap.buffer)
+        finally:
+            page.close()
+    finally:
+        document.close()
+    header = f"P5\n{width} {rows}\n255\n".encode('ascii')
+    return header + b"".join(pixels[row * stride:row * stride + width] for row in range(rows))
+
+def recognize(image, dpi, language, timeout=None):
+    """
+    Read the text of an image with tesseract.
+
+    Parameters:
+        image (bytes): The image, in a format tesseract reads (e.g. PGM).
+        dpi (int): Resolution of the image.
+        language (str): Tesseract language(s), e.g. "eng" or "eng+deu".
+        timeout (float): Seconds after which tesseract is stopped, or None.
+
+    Returns:
+        str: The recognized text.
+
+    Raises:
+        RuntimeError: If tesseract failed.
+        subprocess.TimeoutExpired: If tesseract took longer than timeout.
+    """
+    # One thread per tesseract: parallelism comes from the worker processes.
+    environment = dict(os.environ, OMP_THREAD_LIMIT="1")
+    result = subprocess.run(
+        ["tesseract", "stdin", "stdout", "-l", language, "--dpi", str(dpi), "--psm", "3"],
+        input=image, capture_output=True, timeout=timeout, env=environment
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"tesseract failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return result.stdout.decode('utf-8', 'replace')
+
+def ocr_first_page(path, dpi, fraction, language, timeout=None):
+    """
+    Read the top of the first page of a scanned PDF. Runs in a worker process.
+
+    Parameters:
+        path (str): The file path to the PDF.
+        dpi (int): Resolution of the image.
+        fraction (float): Share of the page height to read, from the top.
+        language (str): Tesseract language(s).
+        timeout (float): Seconds after which tesseract is stopped, or None.
+
+    Returns:
+        tuple: (text, cpu_seconds): the recognized text and the CPU time
+            spent, including tesseract's.
+    """
+    cpu_start, children_start = time.thread_time(), os.times()
+    image = render_top_of_first_page(path, dpi, fraction)
+    text = recognize(image, dpi, language, timeout)
+    children_end = os.times()
+    children_cpu = (children_end.children_user - children_start.children_user
+                    + children_end.children_system - children_start.children_system)
+    return text, time.thread_time() - cpu_start + children_cpu
+
+def ocr_cache_key(path, dpi, fraction, language):
+    """
+    Build the OCR cache key of a file from its content and the OCR settings.
+    Only the size and the first and last CACHE_KEY_SAMPLE_BYTES of the file
+    are hashed, so the key of a large scan is cheap to compute. Moving,
+    renaming or copying the file does not change the key.
+
+    Parameters:
+        path (str): The file path.
+        dpi (int): Resolution of the image.
+        fraction (float): Share of the page height read.
+        language (str): Tesseract language(s).
+
+    Returns:
+        str: A hex SHA-256 digest.
+
+    Raises:
+        OSError: If the file cannot be read.
+    """
+    digest = hashlib.sha256()
+    for part in ("ocr", dpi, fraction, language):
+        digest.update(str(part).encode('utf-8'))
+        # Separator so that ("ab", "c") and ("a", "bc") hash differently.
+        digest.update(b'\0')
+    with open(path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        digest.update(f"{size}\0".encode('ascii'))
+        digest.update(file.read(CACHE_KEY_SAMPLE_BYTES))
+        if size > 2 * CACHE_KEY_SAMPLE_BYTES:
+            file.seek(-CACHE_KEY_SAMPLE_BYTES, os.SEEK_END)
+        # The last sample, or the rest of a file that fits in two samples.
+        digest.update(file.read())
+    return digest.hexdigest()
+
+class OcrPool:
+    """
+    Reads scanned PDFs with OCR in worker processes, off the engine's worker threads.
+
+    read() blocks until the text is read. submit() returns at once and runs
+    a function (which calls read()) on one of the pool's threads. The pool
+    can be shared between worker threads.
+    """
+
+    def __init__(self, processes=1, dpi=150, fraction=0.4, language="eng", timeout=120,
+                 memory_limit_mb=None, cache_path=None, journal_mode="WAL", cache_read_only=False):
+        """
+        Create the pool. The worker processes are started on first use.
+
+        Parameters:
+            processes (int): Number of OCR worker processes, and files read at once.
+            dpi (int): Resolution at which the page is rasterized.
+            fraction (float): Share of the page height to read, from the top.
+            language (str): Tesseract language(s), e.g. "eng".
+            timeout (float): Per-file OCR timeout in seconds, or None.
+            memory_limit_mb (int): Memory cap per worker process in MB, or None.
+            cache_path (str): Path of the OCR text cache, or None for no cache.
+            journal_mode (str): SQLite journal mode of the cache.
+            cache_read_only (bool): Only look texts up in an existing cache,
+                e.g. in a dry run.
+        """
+        self.processes = max(1, processes or 1)
+        self.dpi = dpi
+        self.fraction = fraction
+        self.language = language
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.lock = threading.Lock()
+        self.executor = None
+        # One thread per worker process waits for its result and runs the callback.
+        self.threads = ThreadPoolExecutor(max_workers=self.processes, thread_name_prefix="ocr")
+        self.cache = None
+        if cache_path and not (cache_read_only and not os.path.exists(cache_path)):
+            self.cache = MetadataCache(cache_path, journal_mode=journal_mode, read_only=cache_read_only)
+        self.pending = 0
+
+    def get_executor(self):
+        """
+        Return the process pool, starting it if needed.
+
+        Returns:
+            ProcessPoolExecutor: The pool.
+        """
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=init_worker,
+                    initargs=(self.memory_limit_mb,)
+                )
+            return self.executor
+
+    def discard(self, executor):
+        """
+        Replace a broken or stuck process pool with a fresh one on next use.
+
+        Parameters:
+            executor (ProcessPoolExecutor): The pool to discard.
+        """
+        with self.lock:
+            if self.executor is executor:
+                self.executor = None
+        extraction_pool.stop_workers(executor)
+
+    def read(self, path):
+        """
+        Read the text of a scanned PDF, from the cache or with OCR. Blocks.
+
+        Parameters:
+            path (str): The file path to the PDF.
+
+        Returns:
+            tuple: (text, cpu_seconds). cpu_seconds is 0 for cached text.
+
+        Raises:
+            ExtractionTimeout: If the OCR took longer than the timeout.
+            Exception: Any error raised while rasterizing or recognizing.
+        """
+        if self.cache is not None:
+            key = ocr_cache_key(path, self.dpi, self.fraction, self.language)
+            cached = self.cache.get(key)
+            if cached is not None:
+                print(f"Using the cached OCR text of '{path}'.")
+                return cached["text"], 0.0
+
+        wait = self.timeout + extraction_pool.TIMEOUT_GRACE if self.timeout else None
+        for attempt in range(2):
+            executor = self.get_executor()
+            try:
+                future = executor.submit(ocr_first_page, path, self.dpi, self.fraction,
+                                         self.language, self.timeout)
+                text, cpu_seconds = future.result(timeout=wait)
+                break
+            except (FutureTimeoutError, subprocess.TimeoutExpired):
+                self.discard(executor)
+                raise extraction_pool.ExtractionTimeout(f"OCR timed out after {self.timeout} s")
+            except BrokenProcessPool:
+                self.discard(executor)
+                if attempt:
+                    raise
+        if self.cache is not None:
+            self.cache.put(key, {"text": text})
+        return text, cpu_seconds
+
+    def submit(self, path, function, *args):
+        """
+        Queue the processing of a scanned PDF and return immediately.
+
+        Parameters:
+            path (str): The file path to the PDF, used in error messages.
+            function (callable): Called as function(*args) on a pool thread;
+                it reads the file with read(). Exceptions are printed.
+            *args: Arguments of function.
+        """
+        with self.lock:
+            self.pending += 1
+
+        def run():
+            try:
+                function(*args)
+            except Exception as e:
+                print(f"Error processing '{path}': {e}")
+            finally:
+                with self.lock:
+                    self.pending -= 1
+
+        self.threads.submit(run)
+
+    def shutdown(self, cancel=False):
+        """
+        Wait for the queued files, then stop the worker processes.
+
+        Parameters:
+            cancel (bool): Drop the files that are still waiting for OCR,
+                e.g. after Ctrl-C; they are read again on the next run.
+        """
+        if self.pending and not cancel:
+            print(f"\nWaiting for {self.pending} file(s) in OCR...")
+        self.threads.shutdown(wait=True, cancel_futures=cancel)
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if self.cache is not None:
+            self.cache.close()
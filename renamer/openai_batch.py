@@ -0,0 +1,159 @@
+import json
+import os
+import time
+
+# ---------------------------------------------------------------------------
+# Helpers for the OpenAI Batch API, used by the renamer engine.
+#
+# A batch run has three phases:
+#   1. prepare: write one chat-completion request per file to a JSONL file,
+#      plus a manifest that maps each request id back to its file;
+#   2. submit: upload the JSONL file, create the batch and poll until it is
+#      done, then download the result file;
+#   3. apply: read the result file and rename/move the files.
+# The prepare and apply phases never touch the network, so they can be run
+# (and checked) on their own with a hand-written result file.
+# ---------------------------------------------------------------------------
+
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+
+def manifest_path_for(batch_path):
+    """
+    Return the path of the manifest written next to a batch file.
+
+    Parameters:
+        batch_path (str): Path of the batch JSONL file.
+
+    Returns:
+        str: Path of the manifest JSON file.
+    """
+    return os.path.splitext(batch_path)[0] + ".manifest.json"
+
+def results_path_for(batch_path):
+    """
+    Return the default path of the result file for a batch file.
+
+    Parameters:
+        batch_path (str): Path of the batch JSONL file.
+
+    Returns:
+        str: Path of the result JSONL file.
+    """
+    return os.path.splitext(batch_path)[0] + ".results.jsonl"
+
+def write_batch_file(batch_path, requests, manifest):
+    """
+    Write the batch requests and the manifest to disk.
+
+    Parameters:
+        batch_path (str): Path of the batch JSONL file to write.
+        requests (list): (custom_id, body) tuples, where body holds the
+            arguments of a chat.completions.create() call.
+        manifest (dict): Maps each custom_id to the details needed later to
+            apply its result (for example the original file path).
+    """
+    with open(batch_path, 'w', encoding='utf-8') as batch_file:
+        for custom_id, body in requests:
+            line = {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": CHAT_COMPLETIONS_URL,
+                "body": body
+            }
+            batch_file.write(json.dumps(line) + "\n")
+    with open(manifest_path_for(batch_path), 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+
+def read_manifest(batch_path):
+    """
+    Read the manifest written by write_batch_file().
+
+    Parameters:
+        batch_path (str): Path of the batch JSONL file.
+
+    Returns:
+        dict: The manifest.
+    """
+    with open(manifest_path_for(batch_path), 'r', encoding='utf-8') as manifest_file:
+        return json.load(manifest_file)
+
+def read_batch_results(results_path):
+    """
+    Read a Batch API result file.
+
+    Parameters:
+        results_path (str): Path of the downloaded result JSONL file.
+
+    Returns:
+        dict: Maps each custom_id to the assistant's message content, or to
+            None if that request failed.
+    """
+    results = {}
+    with open(results_path, 'r', encoding='utf-8') as results_file:
+        for line in results_file:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            response = entry.get("response") or {}
+            content = None
+            if response.get("status_code") == 200 and not entry.get("error"):
+                try:
+                    content = response["body"]["choices"][0]["message"]["content"]
+                except (KeyError, IndexError, TypeError):
+                    content = None
+            results[entry["custom_id"]] = content
+    return results
+
+def submit_batch(client, batch_path):
+    """
+    Upload a batch file and create a batch job.
+
+    Parameters:
+        client (OpenAI): The OpenAI client.
+        batch_path (str): Path of the batch JSONL file.
+
+    Returns:
+        str: The id of the created batch.
+    """
+    with open(batch_path, 'rb') as batch_file:
+        uploaded = client.files.create(file=batch_file, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=uploaded.id,
+        endpoint=CHAT_COMPLETIONS_URL,
+        completion_window="24h"
+    )
+    print(f"Submitted batch {batch.id} ({batch_path}).")
+    return batch.id
+
+def wait_for_batch(client, batch_id, results_path, poll_interval=60):
+    """
+    Poll a batch until it finishes and download its result file.
+
+    Parameters:
+        client (OpenAI): The OpenAI client.
+        batch_id (str): The id returned by submit_batch().
+        results_path (str): Where to store the result JSONL file.
+        poll_interval (float): Seconds between status checks.
+
+    Returns:
+        str: The path of the downloaded result file.
+
+    Raises:
+        RuntimeError: If the batch failed, expired or was cancelled.
+    """
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        print(f"Batch {batch_id} status: {batch.status}")
+        if batch.status == "completed":
+            break
+        if batch.status in ("failed", "expired", "cancelled"):
+            raise RuntimeError(f"Batch {batch_id} ended with status '{batch.status}'.")
+        time.sleep(poll_interval)
+
+    if not batch.output_file_id:
+        raise RuntimeError(f"Batch {batch_id} completed without an output file.")
+    content = client.files.content(batch.output_file_id)
+    with open(results_path, 'wb') as results_file:
+        results_file.write(content.read())
+    print(f"Downloaded batch results to {results_path}.")
+    return results_path
@@ -0,0 +1,367 @@
+import random
+import re
+import threading
+import time
+
+from renamer import metrics
+from renamer import text_excerpt
+
+# ---------------------------------------------------------------------------
+# Adaptive rate limiting and retries for the OpenAI API, used by the
+# renamer engine.
+#
+# RateLimiter keeps two token buckets, one for requests per minute and one for
+# tokens per minute. Every API call first waits until both buckets hold
+# enough budget, so the worker threads together stay just under the limits
+# instead of running into 429 errors. The x-ratelimit-* headers of every
+# response correct the buckets: the limits reported by the API replace the
+# configured ones, and the local budget is never larger than the remaining
+# budget the API reports.
+#
+# chat_completion() retries rate-limit errors, timeouts, connection errors
+# and server errors with jittered exponential backoff, honouring the
+# Retry-After header. A 429 pauses all workers, not just the one that got it.
+#
+# The OpenAI SDK takes most of a second to import, so it is only imported
+# once a request is made.
+# ---------------------------------------------------------------------------
+
+# Share of the limits reported by the API that is actually used. The margin
+# absorbs clock skew and other clients using the same key.
+HEADROOM = 0.95
+
+
+DURATION_PATTERN = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+def parse_duration(value):
+    """
+    Parse a duration such as "1s", "6m0s", "20ms" or "2.5" into seconds.
+
+    Parameters:
+        value (str): The header value, or None.
+
+    Returns:
+        float or None: The duration in seconds, or None if it cannot be parsed.
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+def parse_count(value):
+    """
+    Parse a request or token count from a header value.
+
+    Parameters:
+        value (str): The header value, or None.
+
+    Returns:
+        int or None: The count, or None if it cannot be parsed.
+    """
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=60.0):
+    """
+    Return the delay before a retry, with exponential growth and jitter.
+
+    Half of the delay is fixed and half is random, so workers that failed at
+    the same moment do not all retry at the same moment.
+
+    Parameters:
+        attempt (int): The number of retries made so far (0 for the first).
+        base_delay (float): The delay before the first retry, in seconds.
+        max_delay (float): The longest delay, in seconds.
+
+    Returns:
+        float: The delay in seconds.
+    """
+    delay = min(max_delay, base_delay * 2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def retry_after(error):
+    """
+    Read the Retry-After delay from a failed API call, if the API sent one.
+
+    Parameters:
+        error (Exception): The exception raised by the OpenAI client.
+
+    Returns:
+        float or None: The delay in seconds.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    milliseconds = parse_duration(response.headers.get("retry-after-ms"))
+    if milliseconds is not None:
+        return milliseconds / 1000
+    return parse_duration(response.headers.get("retry-after"))
+
+class TokenBucket:
+    """
+    A budget that refills continuously up to a per-minute limit.
+
+    A bucket without a limit never makes a caller wait.
+    """
+
+    def __init__(self, per_minute=None):
+        """
+        Create a full bucket.
+
+        Parameters:
+            per_minute (float): The limit per minute, or None for no limit.
+        """
+        self.capacity = None
+        self.level = 0.0
+        self.updated = time.monotonic()
+        self.set_limit(per_minute)
+
+    def set_limit(self, per_minute):
+        """
+        Change the limit. The current level is kept, but never above the new limit.
+
+        Parameters:
+            per_minute (float): The limit per minute, or None for no limit.
+        """
+        if not per_minute:
+            self.capacity = None
+            return
+        if self.capacity is None:
+            self.level = float(per_minute)
+        self.capacity = float(per_minute)
+        self.level = min(self.level, self.capacity)
+
+    def refill(self, now):
+        """
+        Add the budget earned since the last refill.
+
+        Parameters:
+            now (float): The current time.monotonic() value.
+        """
+        if self.capacity is not None:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """
+        Return how long to wait before amount can be taken.
+
+        A request larger than the whole bucket only waits for a full bucket.
+
+        Parameters:
+            amount (float): The budget needed.
+
+        Returns:
+            float: The wait in seconds (0 if the budget is available now).
+        """
+        if self.capacity is None:
+            return 0.0
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing * 60 / self.capacity)
+
+    def take(self, amount):
+        """
+        Use budget. A negative amount gives budget back.
+
+        Parameters:
+            amount (float): The budget used.
+        """
+        if self.capacity is not None:
+            self.level = min(self.capacity, self.level - amount)
+
+    def clamp(self, remaining):
+        """
+        Lower the level to the remaining budget reported by the API.
+
+        Parameters:
+            remaining (float): The remaining budget.
+        """
+        if self.capacity is not None:
+            self.level = min(self.level, float(remaining))
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute scheduler for API calls.
+
+    The limiter can be shared between worker threads.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        """
+        Create the limiter.
+
+        Parameters:
+            requests_per_minute (int): Starting request limit, or None to
+                wait for the limit reported by the API.
+            tokens_per_minute (int): Starting token limit, or None to wait
+                for the limit reported by the API.
+        """
+        self.lock = threading.Lock()
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        # Nobody may send a request before this time.monotonic() value.
+        self.paused_until = 0.0
+
+    def acquire(self, tokens):
+        """
+        Wait until one request using the given number of tokens may be sent,
+        and use up its budget.
+
+        Parameters:
+            tokens (int): The estimated number of tokens of the request.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.requests.refill(now)
+                self.tokens.refill(now)
+                wait = max(
+                    self.paused_until - now,
+                    self.requests.wait_time(1),
+                    self.tokens.wait_time(tokens)
+                )
+                if wait <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(tokens)
+                    return
+            time.sleep(wait)
+
+    def record_usage(self, estimated_tokens, used_tokens):
+        """
+        Correct the token bucket once the real token count of a request is known.
+
+        Parameters:
+            estimated_tokens (int): The estimate passed to acquire().
+            used_tokens (int): The tokens reported in the response.
+        """
+        with self.lock:
+            self.tokens.take(used_tokens - estimated_tokens)
+
+    def pause(self, seconds):
+        """
+        Hold back all requests for a while, for example after a 429.
+
+        Parameters:
+            seconds (float): How long to pause.
+        """
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers):
+        """
+        Adapt the buckets to the x-ratelimit-* headers of a response.
+
+        Parameters:
+            headers (Mapping): The response headers.
+        """
+        with self.lock:
+            now = time.monotonic()
+            for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+                limit = parse_count(headers.get(f"x-ratelimit-limit-{kind}"))
+                remaining = parse_count(headers.get(f"x-ratelimit-remaining-{kind}"))
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                if limit:
+                    bucket.refill(now)
+                    bucket.set_limit(limit * HEADROOM)
+                if remaining is not None:
+                    bucket.clamp(remaining)
+                    if remaining <= 0 and reset:
+                        self.paused_until = max(self.paused_until, now + reset)
+
+def estimate_tokens(messages, expected_output_tokens):
+    """
+    Estimate the tokens a chat completion request counts against the limit.
+
+    Parameters:
+        messages (list): The chat messages.
+        expected_output_tokens (int): The expected length of the reply.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    # Each message carries a few tokens of formatting.
+    prompt_tokens = sum(text_excerpt.count_tokens(str(m.get("content", ""))) + 4 for m in messages)
+    return prompt_tokens + expected_output_tokens
+
+def retryable_errors():
+    """
+    Return the errors worth retrying; anything else (bad request, bad key) fails at once.
+
+    Returns:
+        tuple: The OpenAI exception classes, or () without the openai package
+            (e.g. with the local backend).
+    """
+    try:
+        import openai
+    except ImportError:
+        return ()
+    return (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError
+    )
+
+def chat_completion(client, limiter, max_retries=6, expected_output_tokens=100, **request):
+    """
+    Create a chat completion within the rate limits, retrying transient errors.
+
+    Parameters:
+        client (OpenAI): The OpenAI client. Its own retries should be turned
+            off (max_retries=0) so that every attempt goes through the limiter.
+        limiter (RateLimiter): The shared limiter, or None for no limiting.
+        max_retries (int): How many times a failed call is retried.
+        expected_output_tokens (int): The expected length of the reply, used
+            in the token estimate.
+        **request: The arguments of chat.completions.create().
+
+    Returns:
+        ChatCompletion: The completion.
+
+    Raises:
+        openai.OpenAIError: If the call still fails after max_retries
+            retries, or fails with an error that is not worth retrying.
+    """
+    import openai
+    estimated = estimate_tokens(request.get("messages", []), expected_output_tokens)
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire(estimated)
+        try:
+            raw_response = client.chat.completions.with_raw_response.create(**request)
+        except retryable_errors() as e:
+            if attempt >= max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            server_delay = retry_after(e)
+            if server_delay is not None:
+                delay = max(delay, server_delay)
+            if limiter is not None and isinstance(e, openai.RateLimitError):
+                limiter.update_from_headers(e.response.headers)
+                limiter.pause(server_delay if server_delay is not None else delay / 2)
+            attempt += 1
+            metrics.add(retries=1)
+            print(f"{type(e).__name__} from the API; retry {attempt} of {max_retries} in {delay:.1f}s.")
+            time.sleep(delay)
+            continue
+
+        completion = raw_response.parse()
+        usage = getattr(completion, "usage", None)
+        if usage is not None:
+            metrics.add(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+        if limiter is not None:
+            limiter.update_from_headers(raw_response.headers)
+            if usage is not None:
+                limiter.record_usage(estimated, usage.total_tokens)
+        return completion
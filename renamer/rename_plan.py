@@ -0,0 +1,335 @@
+import os
+import json
+import time
+import errno
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from renamer import naming
+
+# ---------------------------------------------------------------------------
+# Two-phase renaming: plan, then apply.
+#
+# In plan mode the engine infers the metadata of every file but moves
+# nothing. The moves are written to a plan file instead (source, target,
+# metadata and how a name collision was resolved), which can be reviewed and
+# edited before anything happens on disk.
+#
+# apply_plan() then executes the whole plan at once. A move within one file
+# system is a hard link and an unlink. Moves to another device are copied in
+# parallel to a temporary file next to the target, linked into place and
+# only then removed from the source, so a target never appears half-written.
+# Neither replaces a file that appeared at the target after planning, e.g.
+# one moved there by another worker (see naming.move_without_overwrite()).
+# Every completed move is appended to an undo log, and undo_moves() moves the
+# files back.
+# ---------------------------------------------------------------------------
+
+# Collision handling: "suffix" numbers the later files ("Title (2).pdf"),
+# "skip" leaves them in place.
+COLLISION_MODES = ("suffix", "skip")
+
+def suffixed_path(path, number):
+    """
+    Return a path with a number added before the extension.
+
+    Parameters:
+        path (str): The path, e.g. "out/Doe 2020--Title.pdf".
+        number (int): The number, e.g. 2.
+
+    Returns:
+        str: E.g. "out/Doe 2020--Title (2).pdf".
+    """
+    stem, extension = os.path.splitext(path)
+    return f"{stem} ({number}){extension}"
+
+def plan_moves(entries, collisions="suffix"):
+    """
+    Choose the target of every planned move and resolve name collisions.
+
+    A target collides with an existing file or with the target of an
+    earlier entry. Entries are planned in the order of their source paths,
+    so the same files always give the same plan.
+
+    Parameters:
+        entries (list): Dictionaries with the keys "source", "metadata",
+            "directory" (destination directory) and "extension".
+        collisions (str): One of COLLISION_MODES.
+
+    Returns:
+        list: One dictionary per entry with the keys "source", "target"
+            (None when skipped), "metadata" and "resolution" ("new",
+            "suffixed" or "skipped").
+    """
+    moves = []
+    claimed = set()
+    for entry in sorted(entries, key=lambda entry: entry["source"]):
+        target = os.path.join(entry["directory"], naming.build_filename(entry["metadata"], entry["extension"]))
+        resolution = "new"
+        number = 1
+        candidate = target
+        while os.path.normcase(candidate) in claimed or os.path.exists(candidate):
+            if collisions == "skip":
+                candidate, resolution = None, "skipped"
+                print(f"'{target}' already exists or is planned. Skipping '{entry['source']}'.")
+                break
+            number += 1
+            candidate, resolution = suffixed_path(target, number), "suffixed"
+        if candidate is not None:
+            claimed.add(os.path.normcase(candidate))
+        moves.append({
+            "source": entry["source"],
+            "target": candidate,
+            "metadata": entry["metadata"],
+            "resolution": resolution
+        })
+    return moves
+
+def write_plan(plan_path, moves):
+    """
+    Write a plan file.
+
+    Parameters:
+        plan_path (str): Path of the plan JSON file.
+        moves (list): Moves from plan_moves().
+    """
+    directory = os.path.dirname(os.path.abspath(plan_path))
+    os.makedirs(directory, exist_ok=True)
+    plan = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "moves": moves}
+    temporary_path = plan_path + ".tmp"
+    with open(temporary_path, 'w', encoding='utf-8') as plan_file:
+        json.dump(plan, plan_file, indent=2, ensure_ascii=False)
+    os.replace(temporary_path, plan_path)
+
+def read_plan(plan_path):
+    """
+    Read a plan file written by write_plan(), possibly edited by hand.
+
+    Parameters:
+        plan_path (str): Path of the plan JSON file.
+
+    Returns:
+        list: The moves.
+    """
+    with open(plan_path, 'r', encoding='utf-8') as plan_file:
+        return json.load(plan_file)["moves"]
+
+def same_device(source, target_directory):
+    """
+    Check whether a file can be moved into a directory without copying it.
+
+    Parameters:
+        source (str): The file.
+        target_directory (str): The existing destination directory.
+
+    Returns:
+        bool: True if both are on the same file system.
+    """
+    return os.stat(source).st_dev == os.stat(target_directory).st_dev
+
+def copy_then_rename(source, target):
+    """
+    Move a file to another device: copy it next to the target, link the
+    copy into place, then remove the source.
+
+    Parameters:
+        source (str): The file.
+        target (str): The new path, on another device.
+
+    Raises:
+        FileExistsError: If the target exists; the source is kept.
+    """
+    naming.copy_without_overwrite(source, target)
+    os.remove(source)
+
+class UndoLog:
+    """
+    Append-only JSONL log of completed moves. Can be shared between threads.
+    """
+
+    def __init__(self, path):
+        """
+        Start a new undo log, replacing the previous one.
+
+        Parameters:
+            path (str): Path of the undo log.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def record(self, source, target):
+        """
+        Record a completed move. The line is flushed at once, so the log is
+        complete even if the run is interrupted.
+
+        Parameters:
+            source (str): The original path.
+            target (str): The new path.
+        """
+        line = json.dumps({"source": source, "target": target, "time": time.time()}, ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+class MoveRecord:
+    """
+    Collects the completed moves of execute_moves() in memory.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.moves = set()
+
+    def record(self, source, target):
+        """
+        Record a completed move.
+
+        Parameters:
+            source (str): The original path.
+            target (str): The new path.
+        """
+        with self.lock:
+            self.moves.add((source, target))
+
+def execute_moves(moves, copy_workers=4, undo_log=None):
+    """
+    Execute moves in bulk.
+
+    Moves within a file system are made one after the other (each is two
+    system calls); moves to other devices are copied by up to copy_workers
+    threads. A move whose source is gone, or whose target exists, is
+    skipped, even if the target appears while the moves are running.
+
+    Parameters:
+        moves (list): (source, target) tuples.
+        copy_workers (int): Number of parallel cross-device copies.
+        undo_log (UndoLog): Log of the completed moves (or a MoveRecord), or None.
+
+    Returns:
+        tuple: (moved, failed) counts.
+    """
+    renames, copies = [], []
+    created_directories = set()
+    failed = 0
+    for source, target in moves:
+        directory = os.path.dirname(target) or "."
+        try:
+            if directory not in created_directories:
+                os.makedirs(directory, exist_ok=True)
+                created_directories.add(directory)
+            if not os.path.exists(source):
+                print(f"'{source}' no longer exists. Skipping.")
+                failed += 1
+            elif os.path.exists(target):
+                print(f"'{target}' already exists. Skipping '{source}'.")
+                failed += 1
+            elif same_device(source, directory):
+                renames.append((source, target))
+            else:
+                copies.append((source, target))
+        except OSError as e:
+            print(f"Error preparing the move of '{source}': {e}")
+            failed += 1
+
+    moved = 0
+    for source, target in renames:
+        try:
+            naming.link_without_overwrite(source, target)
+        except FileExistsError:
+            print(f"'{target}' already exists. Skipping '{source}'.")
+            failed += 1
+            continue
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                print(f"Error moving '{source}': {e}")
+                failed += 1
+                continue
+            # Bind mounts of one file system still need a copy.
+            copies.append((source, target))
+            continue
+        if os.path.exists(source):
+            os.remove(source)
+        if undo_log is not None:
+            undo_log.record(source, target)
+        moved += 1
+
+    def copy(move):
+        source, target = move
+        copy_then_rename(source, target)
+        if undo_log is not None:
+            undo_log.record(source, target)
+
+    if copies:
+        print(f"Copying {len(copies)} file(s) to another device...")
+        with ThreadPoolExecutor(max_workers=max(1, copy_workers)) as executor:
+            for (source, target), future in zip(copies, [executor.submit(copy, move) for move in copies]):
+                try:
+                    future.result()
+                    moved += 1
+                except FileExistsError:
+                    print(f"'{target}' already exists. Skipping '{source}'.")
+                    failed += 1
+                except OSError as e:
+                    print(f"Error copying '{source}' to '{target}': {e}")
+                    failed += 1
+    return moved, failed
+
+def apply_plan(plan_path, undo_path, copy_workers=4):
+    """
+    Execute a plan file and log the moves for undo_moves().
+
+    Parameters:
+        plan_path (str): Path of the plan JSON file.
+        undo_path (str): Path of the undo log; a previous log is replaced.
+        copy_workers (int): Number of parallel cross-device copies.
+
+    Returns:
+        tuple: (moved, failed) counts.
+    """
+    moves = [(move["source"], move["target"]) for move in read_plan(plan_path) if move.get("target")]
+    undo_log = UndoLog(undo_path)
+    try:
+        return execute_moves(moves, copy_workers, undo_log)
+    finally:
+        undo_log.close()
+
+def undo_moves(undo_path, copy_workers=4):
+    """
+    Move the files recorded in an undo log back, most recent first.
+
+    When every file was moved back, the log is renamed to
+    "<undo_path>.undone", so it is not undone twice. Otherwise the log is
+    rewritten with only the moves that could not be undone, so a later undo
+    retries just those.
+
+    Parameters:
+        undo_path (str): Path of the undo log.
+        copy_workers (int): Number of parallel cross-device copies.
+
+    Returns:
+        tuple: (moved, failed) counts.
+    """
+    entries = []
+    with open(undo_path, 'r', encoding='utf-8') as undo_file:
+        for line in undo_file:
+            if line.strip():
+                entries.append(json.loads(line))
+    moves = [(entry["target"], entry["source"]) for entry in reversed(entries)]
+    undone = MoveRecord()
+    moved, failed = execute_moves(moves, copy_workers, undone)
+    if failed == 0:
+        os.replace(undo_path, undo_path + ".undone")
+        return moved, failed
+
+    remaining = [entry for entry in entries if (entry["target"], entry["source"]) not in undone.moves]
+    temporary_path = undo_path + ".tmp"
+    with open(temporary_path, 'w', encoding='utf-8') as undo_file:
+        for entry in remaining:
+            undo_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    os.replace(temporary_path, undo_path)
+    return moved, failed
@@ -0,0 +1,230 @@
+import os
+import json
+
+from renamer import config
+
+# ---------------------------------------------------------------------------
+# Settings from a config file, the environment and the command line.
+#
+# renamer/config.py holds the defaults. They can be overridden, in order of
+# increasing precedence, by:
+#   a config file      TOML (Python 3.11+) or JSON, given with --config or
+#                      RENAMER_CONFIG, e.g.  SOURCE_DIR = "/data/inbox"
+#   the environment    RENAMER_<SETTING>, e.g. RENAMER_MAX_IN_FLIGHT=16, and
+#                      OPENAI_API_KEY for the API key
+#   the command line   --set SETTING=VALUE and the dedicated options
+#
+# Setting names are those of renamer/config.py, in any case. An unknown name
+# in the config file or --set is an error; an unknown RENAMER_* variable is
+# reported and ignored, as it may belong to something else. Values from the
+# environment and --set are converted to the type of the default: "true" or
+# "false" for switches, numbers for numeric settings, comma-separated names
+# for FORMATS, and "none" for None (e.g. CACHE_PATH=none turns the cache off).
+# ---------------------------------------------------------------------------
+
+ENVIRONMENT_PREFIX = "RENAMER_"
+# Environment variable naming the config file; not a setting itself.
+CONFIG_FILE_VARIABLE = "RENAMER_CONFIG"
+
+TRUE_WORDS = ("1", "true", "yes", "on")
+FALSE_WORDS = ("0", "false", "no", "off")
+NONE_WORDS = ("none", "null")
+
+# Settings that are None by default, with the type of their other values.
+# Unlisted ones are strings.
+OPTIONAL_SETTING_TYPES = {
+    "FORMATS": list,
+    "EXTRACTION_PROCESSES": int,
+}
+
+def setting_names():
+    """
+    Return the settings of renamer/config.py, keyed by their upper-case name.
+
+    Returns:
+        dict: Upper-case name to attribute name, e.g. "API_KEY" to "api_key".
+    """
+    return {
+        name.upper(): name for name, value in vars(config).items()
+        if not name.startswith("_") and not callable(value) and not isinstance(value, type(os))
+    }
+
+def resolve_name(name):
+    """
+    Find the setting a name refers to.
+
+    Parameters:
+        name (str): A setting name, in any case.
+
+    Returns:
+        str: The attribute name in renamer/config.py.
+
+    Raises:
+        ValueError: If there is no such setting.
+    """
+    attribute = setting_names().get(name.strip().upper())
+    if attribute is None:
+        raise ValueError(f"Unknown setting {name!r}.")
+    return attribute
+
+def convert(name, value):
+    """
+    Convert a value given as text to the type of a setting.
+
+    Values that are not strings (from a TOML or JSON file) are kept as they are.
+
+    Parameters:
+        name (str): The attribute name in renamer/config.py.
+        value: The value.
+
+    Returns:
+        The converted value.
+
+    Raises:
+        ValueError: If the text is not a valid value for the setting.
+    """
+    if not isinstance(value, str):
+        return value
+    default = getattr(config, name)
+    text = value.strip()
+    if isinstance(default, bool):
+        if text.lower() in TRUE_WORDS:
+            return True
+        if text.lower() in FALSE_WORDS:
+            return False
+        raise ValueError(f"{name} must be true or false, not {value!r}.")
+    if text.lower() in NONE_WORDS:
+        return None
+    kind = OPTIONAL_SETTING_TYPES.get(name, str) if default is None else type(default)
+    try:
+        if kind is list:
+            return [part.strip() for part in text.split(",") if part.strip()]
+        if kind in (int, float):
+            return kind(text)
+    except ValueError:
+        raise ValueError(f"{name} must be a number, not {value!r}.")
+    return value
+
+def read_file(path):
+    """
+    Read settings from a TOML or JSON file.
+
+    Parameters:
+        path (str): The file; ".json" files are read as JSON, others as TOML.
+
+    Returns:
+        dict: Setting names and values.
+
+    Raises:
+        OSError: If the file cannot be read.
+        ValueError: If the file is not valid TOML or JSON, or TOML cannot be
+            read by this Python version.
+    """
+    if path.lower().endswith(".json"):
+        with open(path, 'r', encoding='utf-8') as file:
+            try:
+                values = json.load(file)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path} is not valid JSON: {e}")
+    else:
+        # Imported here: most runs have no config file.
+        try:
+            import tomllib
+        except ImportError:
+            raise ValueError("Reading TOML needs Python 3.11 or later; use a .json config file instead.")
+        with open(path, 'rb') as file:
+            try:
+                values = tomllib.load(file)
+            except tomllib.TOMLDecodeError as e:
+                raise ValueError(f"{path} is not valid TOML: {e}")
+    if not isinstance(values, dict):
+        raise ValueError(f"{path} must hold a table of settings.")
+    return values
+
+def from_environment(environ):
+    """
+    Collect the settings given as RENAMER_<SETTING> environment variables.
+
+    OPENAI_API_KEY is used as the API key unless RENAMER_API_KEY is set.
+    Variables that name no setting are reported and ignored, so that an
+    unrelated RENAMER_* variable does not stop the renamer.
+
+    Parameters:
+        environ (mapping): The environment, e.g. os.environ.
+
+    Returns:
+        dict: Setting names and values (as text).
+    """
+    names = setting_names()
+    values = {}
+    if environ.get("OPENAI_API_KEY"):
+        values["api_key"] = environ["OPENAI_API_KEY"]
+    for variable, value in environ.items():
+        if not variable.startswith(ENVIRONMENT_PREFIX) or variable == CONFIG_FILE_VARIABLE:
+            continue
+        name = variable[len(ENVIRONMENT_PREFIX):]
+        if name.upper() not in names:
+            print(f"Ignoring the environment variable {variable}: there is no setting {name}.")
+            continue
+        values[name] = value
+    return values
+
+def parse_assignment(text):
+    """
+    Split a SETTING=VALUE command-line assignment.
+
+    Parameters:
+        text (str): E.g. "MAX_IN_FLIGHT=16".
+
+    Returns:
+        tuple: (name, value) with the value as text.
+
+    Raises:
+        ValueError: If there is no "=".
+    """
+    name, separator, value = text.partition("=")
+    if not separator or not name.strip():
+        raise ValueError(f"Expected SETTING=VALUE, not {text!r}.")
+    return name, value
+
+def apply(values, source):
+    """
+    Check and convert settings, then store them in renamer/config.py.
+
+    Nothing is stored if any of them is invalid.
+
+    Parameters:
+        values (dict): Setting names and values.
+        source (str): Where they come from, used in error messages.
+
+    Raises:
+        ValueError: If a name is unknown or a value is invalid.
+    """
+    converted = {}
+    for name, value in values.items():
+        try:
+            attribute = resolve_name(name)
+            converted[attribute] = convert(attribute, value)
+        except ValueError as e:
+            raise ValueError(f"{source}: {e}")
+    for attribute, value in converted.items():
+        setattr(config, attribute, value)
+
+def load(config_path=None, environ=None, assignments=()):
+    """
+    Apply the settings of a config file, the environment and command-line
+    assignments, in that order.
+
+    Parameters:
+        config_path (str): TOML or JSON config file, or None.
+        environ (mapping): The environment (default: os.environ).
+        assignments (iterable): SETTING=VALUE strings.
+
+    Raises:
+        OSError: If the config file cannot be read.
+        ValueError: If a setting is unknown or invalid.
+    """
+    if config_path:
+        apply(read_file(config_path), config_path)
+    apply(from_environment(os.environ if environ is None else environ), "environment")
+    apply(dict(parse_assignment(text) for text in assignments), "--set")
@@ -0,0 +1,217 @@
+import re
+import threading
+
+# Install tiktoken for exact token counts: pip install tiktoken
+# Without it, token counts are estimated from the number of words and symbols.
+# It is imported on the first excerpt, so that runs that make none start quickly.
+
+# ---------------------------------------------------------------------------
+# Token-budgeted text excerpts for the renamer engine.
+#
+# Instead of sending the first N characters of a document, make_excerpt()
+# drops low-signal regions (code blocks, embedded data, reference lists,
+# licence boilerplate, link tables, repeated headers), ranks the remaining
+# lines by how likely they are to hold the title, author or year, and keeps
+# the best ones that fit in a token budget, in their original order.
+# A short YAML front matter block is kept verbatim at the top.
+# ---------------------------------------------------------------------------
+
+# Tokenizer encoding used by the gpt-4o model family.
+TOKENIZER_ENCODING = "o200k_base"
+
+FRONT_MATTER_PATTERN = re.compile(r'\A\ufeff?---[ \t]*\n.*?\n(---|\.\.\.)[ \t]*(\n|\Z)', re.DOTALL)
+FENCED_BLOCK_PATTERN = re.compile(r'^(```|~~~).*?^\1[^\n]*$', re.MULTILINE | re.DOTALL)
+HTML_COMMENT_PATTERN = re.compile(r'<!--.*?-->', re.DOTALL)
+DATA_URI_PATTERN = re.compile(r'data:[\w/+.-]+;base64,[A-Za-z0-9+/=\s]+')
+REFERENCES_HEADING_PATTERN = re.compile(
+    r'^\s*(#+\s*)?(\d+\.?\s*)?(references|bibliography|works cited|literature cited)\s*:?\s*$',
+    re.IGNORECASE | re.MULTILINE
+)
+BOILERPLATE_PATTERN = re.compile(
+    r'creative commons|licensed under|this (article|work) is (distributed|licensed)|'
+    r'permission to make digital or hard copies|downloaded from|all use subject to|'
+    r'terms and conditions|for personal use only|provided by the author',
+    re.IGNORECASE
+)
+TABLE_RULE_PATTERN = re.compile(r'^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$')
+MARKDOWN_LINK_PATTERN = re.compile(r'!?\[[^\]]*\]\([^)]*\)')
+YEAR_PATTERN = re.compile(r'\b(1[89]\d{2}|20\d{2})\b')
+BIBLIOGRAPHIC_PATTERN = re.compile(
+    r'doi|arxiv|copyright|©|published|journal|proceedings|conference|vol\.|volume|isbn|issn',
+    re.IGNORECASE
+)
+AFFILIATION_PATTERN = re.compile(r'@|universit|institut|department|college|laborator|school of', re.IGNORECASE)
+LABEL_PATTERN = re.compile(r'^(#{1,3}\s|title\b|authors?\b|by\s)', re.IGNORECASE)
+NAME_LIST_PATTERN = re.compile(r"^([A-Z][\w.'-]*\s+){1,3}[A-Z][\w'-]+(\s*(,|;|and|&)\s*([A-Z][\w.'-]*\s+){1,3}[A-Z][\w'-]+)*[\d*†‡,\s]*$")
+
+encoding_lock = threading.Lock()
+encoding = None
+encoding_failed = False
+
+def get_encoding():
+    """
+    Load the tiktoken encoding once, if tiktoken is available.
+
+    Returns:
+        The tiktoken Encoding, or None if tiktoken (or its data) is unavailable.
+    """
+    global encoding, encoding_failed
+    if encoding_failed:
+        return None
+    with encoding_lock:
+        if encoding is None and not encoding_failed:
+            try:
+                import tiktoken
+            except ImportError:
+                encoding_failed = True
+                return None
+            try:
+                encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+            except Exception as e:
+                print(f"Could not load the {TOKENIZER_ENCODING} tokenizer, estimating token counts: {e}")
+                encoding_failed = True
+    return encoding
+
+def count_tokens(text):
+    """
+    Count (or estimate) the number of tokens in a piece of text.
+
+    Parameters:
+        text (str): The text.
+
+    Returns:
+        int: The number of tokens.
+    """
+    tokenizer = get_encoding()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text))
+    # Words of up to four characters are usually one token; longer words and
+    # punctuation add roughly one token per four characters.
+    return sum(max(1, len(piece) // 4) for piece in re.findall(r'\w+|[^\w\s]', text))
+
+def strip_low_signal(text):
+    """
+    Remove regions of a document that never hold the title, author or year.
+
+    Parameters:
+        text (str): The raw document text.
+
+    Returns:
+        list: The remaining lines, with whitespace collapsed, in document order.
+    """
+    text = FENCED_BLOCK_PATTERN.sub('', text)
+    text = HTML_COMMENT_PATTERN.sub('', text)
+    text = DATA_URI_PATTERN.sub('', text)
+
+    # Everything after a references heading is citations of other works.
+    references = REFERENCES_HEADING_PATTERN.search(text)
+    if references and references.start() > 0:
+        text = text[:references.start()]
+
+    lines = []
+    seen = set()
+    for raw_line in text.splitlines():
+        line = re.sub(r'\s+', ' ', raw_line).strip()
+        if not re.search(r'\w', line) or TABLE_RULE_PATTERN.match(line):
+            continue
+        # Repeated lines are running headers and footers.
+        key = line.lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        # Licence boilerplate, unless it carries the copyright year.
+        if BOILERPLATE_PATTERN.search(line) and not YEAR_PATTERN.search(line):
+            continue
+        # Lines made up mostly of links (navigation, link tables, badges).
+        link_chars = sum(len(match) for match in MARKDOWN_LINK_PATTERN.findall(line))
+        if link_chars > 0.6 * len(line):
+            continue
+        lines.append(line)
+    return lines
+
+def score_line(line, index):
+    """
+    Score how likely a line is to hold the title, author or year.
+
+    Parameters:
+        line (str): The cleaned line.
+        index (int): The position of the line in the document.
+
+    Returns:
+        float: The score; higher is better.
+    """
+    # Title and byline are almost always at the top.
+    score = 3.0 / (1 + index / 5)
+    if YEAR_PATTERN.search(line):
+        score += 2.0
+    if LABEL_PATTERN.match(line):
+        score += 2.0
+    if len(line) < 150 and NAME_LIST_PATTERN.match(line):
+        score += 1.5
+    if BIBLIOGRAPHIC_PATTERN.search(line):
+        score += 1.5
+    if AFFILIATION_PATTERN.search(line):
+        score += 1.0
+    # Long lines are body text.
+    if len(line) > 200:
+        score -= 1.0
+    return score
+
+def make_excerpt(text, token_budget, source_chars=20000):
+    """
+    Build a token-budgeted excerpt of a document for metadata inference.
+
+    Parameters:
+        text (str): The raw document text.
+        token_budget (int): Maximum number of tokens in the excerpt.
+        source_chars (int): Only the first source_chars characters of the
+            document are considered.
+
+    Returns:
+        str: The selected lines, in document order, joined by newlines.
+    """
+    text = text[:source_chars]
+
+    # Front matter is structured metadata; keep it whole if it is short.
+    front_matter = ""
+    match = FRONT_MATTER_PATTERN.match(text)
+    if match:
+        front_matter_tokens = count_tokens(match.group(0))
+        if front_matter_tokens <= token_budget // 2:
+            front_matter = match.group(0).strip()
+            token_budget -= front_matter_tokens
+        text = text[match.end():]
+
+    lines = strip_low_signal(text)
+    ranked = sorted(range(len(lines)), key=lambda i: score_line(lines[i], i), reverse=True)
+
+    selected = []
+    used = 0
+    for i in ranked:
+        tokens = count_tokens(lines[i]) + 1
+        if used + tokens <= token_budget:
+            selected.append(i)
+            used += tokens
+    if not selected and lines:
+        # Not even one line fits: keep the beginning of the best one.
+        selected_text = truncate_to_tokens(lines[ranked[0]], token_budget)
+    else:
+        selected_text = "\n".join(lines[i] for i in sorted(selected))
+    return "\n".join(part for part in (front_matter, selected_text) if part)
+
+def truncate_to_tokens(text, token_budget):
+    """
+    Cut text so that it fits in token_budget tokens.
+
+    Parameters:
+        text (str): The text.
+        token_budget (int): Maximum number of tokens.
+
+    Returns:
+        str: The beginning of the text.
+    """
+    tokenizer = get_encoding()
+    if tokenizer is not None:
+        return tokenizer.decode(tokenizer.encode(text)[:token_budget])
+    # Roughly four characters per token.
+    return text[:token_budget * 4]
@@ -0,0 +1,279 @@
+import os
+import time
+import socket
+import sqlite3
+import threading
+
+from renamer import directory_scanner
+
+# ---------------------------------------------------------------------------
+# Shared work queue for running several renamer workers on one inbox.
+#
+# Workers on one or more machines scan the same SOURCE_DIR and claim files
+# through a SQLite database on the shared storage before processing them.
+# A claim is a lease: it lasts lease_seconds and is renewed by a heartbeat
+# thread while the worker is alive. The lease of a worker that died expires,
+# and the next worker that scans the inbox takes the file over. Finished
+# files are marked done, so no other worker picks them up again.
+#
+# Files are keyed by their path relative to SOURCE_DIR, so the inbox may be
+# mounted at a different place on each machine. The database uses a rollback
+# journal instead of WAL, which needs shared memory and does not work on
+# network file systems; claims are made in batches to keep the number of
+# write transactions low.
+# ---------------------------------------------------------------------------
+
+LEASED = "leased"
+DONE = "done"
+
+# SQLite journal mode of the queue, and of the cache, job journal and
+# duplicate index in worker mode.
+JOURNAL_MODE = "DELETE"
+
+# Seconds between checks whether the other workers are done, while waiting
+# to scan the inbox again.
+LEASE_CHECK_INTERVAL = 0.5
+
+def default_worker_id():
+    """
+    Return an identifier for this worker process, e.g. "host-1:4242".
+
+    Returns:
+        str: The host name and process id.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class WorkQueue:
+    """
+    Lease-based claims of the files of an inbox, backed by SQLite.
+
+    The queue can be shared between worker threads.
+    """
+
+    def __init__(self, path, root, worker_id=None, lease_seconds=300):
+        """
+        Open (and create if needed) the queue database.
+
+        Parameters:
+            path (str): Path of the SQLite database file, on storage that
+                every worker can reach.
+            root (str): The inbox directory; files are keyed relative to it.
+            worker_id (str): Name of this worker (default: host name and pid).
+            lease_seconds (float): How long a claim lasts without a heartbeat.
+        """
+        self.path = path
+        self.root = root
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.lock = threading.Lock()
+        self.heartbeat = None
+        self.stopped = threading.Event()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # Wait for the locks of other workers instead of failing at once.
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False,
+                                          isolation_level=None)
+        self.connection.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER,"
+            " mtime_ns INTEGER,"
+            " state TEXT NOT NULL,"
+            " worker TEXT NOT NULL,"
+            " lease_expires REAL NOT NULL,"
+            " claims INTEGER NOT NULL,"
+            " updated REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS files_worker ON files (worker, state)")
+
+    def key(self, path):
+        """
+        Return the queue key of a file: its path relative to the inbox, with "/" separators.
+
+        Parameters:
+            path (str): The file path.
+
+        Returns:
+            str: The key.
+        """
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def claim(self, paths):
+        """
+        Claim the files that no other worker holds or has finished, in one transaction.
+
+        A file is claimable if it is new to the queue, if the lease on it
+        expired, or if it changed (size or modification time) since it was
+        finished: a new file arrived at the same path.
+
+        Parameters:
+            paths (list): File paths found in the inbox.
+
+        Returns:
+            list: The paths claimed by this worker.
+        """
+        signatures = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Moved away by another worker since the scan.
+                continue
+            signatures.append((path, self.key(path), stat.st_size, stat.st_mtime_ns))
+
+        claimed = []
+        with self.lock:
+            now = time.time()
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                for path, key, size, mtime_ns in signatures:
+                    row = self.connection.execute(
+                        "SELECT size, mtime_ns, state, worker, lease_expires, claims FROM files WHERE path = ?",
+                        (key,)
+                    ).fetchone()
+                    claims = 0
+                    if row is not None:
+                        old_size, old_mtime_ns, state, worker, lease_expires, claims = row
+                        changed = (old_size, old_mtime_ns) != (size, mtime_ns)
+                        if state == DONE and not changed:
+                            continue
+                        if state == LEASED and lease_expires > now:
+                            # Held by a live worker, possibly this one.
+                            continue
+                        if state == LEASED and worker != self.worker_id:
+                            print(f"Taking over '{key}' from {worker}, whose lease expired.")
+                    self.connection.execute(
+                        "INSERT OR REPLACE INTO files"
+                        " (path, size, mtime_ns, state, worker, lease_expires, claims, updated)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (key, size, mtime_ns, LEASED, self.worker_id, now + self.lease_seconds, claims + 1, now)
+                    )
+                    claimed.append(path)
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+        return claimed
+
+    def complete(self, path):
+        """
+        Mark a claimed file as finished, whether it was moved or left in place.
+
+        Parameters:
+            path (str): The file path.
+        """
+        with self.lock:
+            cursor = self.connection.execute(
+                "UPDATE files SET state = ?, updated = ? WHERE path = ? AND worker = ?",
+                (DONE, time.time(), self.key(path), self.worker_id)
+            )
+        if cursor.rowcount == 0:
+            print(f"The claim on '{path}' was lost to another worker while it was processed.")
+
+    def renew(self):
+        """
+        Extend the leases of all files this worker holds.
+
+        Returns:
+            int: The number of leases renewed.
+        """
+        with self.lock:
+            now = time.time()
+            cursor = self.connection.execute(
+                "UPDATE files SET lease_expires = ? WHERE worker = ? AND state = ?",
+                (now + self.lease_seconds, self.worker_id, LEASED)
+            )
+        return cursor.rowcount
+
+    def release(self):
+        """
+        Give up the files this worker claimed but did not finish, e.g. after
+        Ctrl-C, so that other workers can take them over right away.
+
+        Returns:
+            int: The number of files released.
+        """
+        with self.lock:
+            cursor = self.connection.execute(
+                "UPDATE files SET lease_expires = 0 WHERE worker = ? AND state = ?",
+                (self.worker_id, LEASED)
+            )
+        return cursor.rowcount
+
+    def leased_elsewhere(self):
+        """
+        Count the files that other workers hold with a lease that has not expired.
+
+        Returns:
+            int: The number of files.
+        """
+        with self.lock:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM files WHERE state = ? AND worker != ? AND lease_expires > ?",
+                (LEASED, self.worker_id, time.time())
+            ).fetchone()[0]
+
+    def start_heartbeat(self):
+        """
+        Start the thread that renews this worker's leases every third of the lease time.
+        """
+        def run():
+            while not self.stopped.wait(self.lease_seconds / 3):
+                try:
+                    self.renew()
+                except sqlite3.Error as e:
+                    print(f"Error renewing the leases in {self.path}: {e}")
+
+        with self.lock:
+            if self.heartbeat is None:
+                self.heartbeat = threading.Thread(target=run, name="lease-heartbeat", daemon=True)
+                self.heartbeat.start()
+
+    def close(self):
+        """
+        Stop the heartbeat, release the unfinished files and close the database.
+        """
+        self.stopped.set()
+        if self.heartbeat is not None:
+            self.heartbeat.join()
+        released = self.release()
+        if released:
+            print(f"Released {released} unfinished file(s) to the other workers.")
+        with self.lock:
+            self.connection.close()
+
+def claimed_files(queue, scan, batch_size=32, poll_interval=10.0):
+    """
+    Yield the files this worker claims, scanning the inbox until nothing is left.
+
+    After a scan that claimed nothing, the inbox is scanned again every
+    poll_interval seconds for as long as other workers hold leases, so that
+    the files of a worker that dies are taken over when its leases expire.
+    As soon as the other workers finish or release their files, it is
+    scanned one last time without waiting.
+
+    Parameters:
+        queue (WorkQueue): The shared queue.
+        scan (callable): Returns an iterable of the files in the inbox.
+        batch_size (int): Files claimed per transaction.
+        poll_interval (float): Seconds between scans while waiting for other workers.
+
+    Yields:
+        str: The path of each claimed file.
+    """
+    while True:
+        claimed_any = False
+        for batch in directory_scanner.chunked(scan(), batch_size):
+            for path in queue.claim(batch):
+                claimed_any = True
+                yield path
+        if claimed_any:
+            continue
+        if not queue.leased_elsewhere():
+            return
+        deadline = time.monotonic() + poll_interval
+        while time.monotonic() < deadline and queue.leased_elsewhere():
+            time.sleep(min(LEASE_CHECK_INTERVAL, poll_interval))
@@ -0,0 +1,293 @@
+import os
+import zlib
+import random
+import argparse
+
+# ---------------------------------------------------------------------------
+# Synthetic document corpora for benchmarking the renamer engine.
+#
+# generate_corpus() writes PDF and Markdown files of a chosen shape into a
+# directory:
+#   small / large      one page, or many pages of text (a long Markdown body)
+#   text / scanned     PDFs with a text layer, or a single image and no text
+#   with / without     embedded metadata (PDF document info dictionary,
+#     metadata         Markdown front matter) good enough to skip the model
+#
+# The PDFs are written object by object, so large files do not have to fit
+# in memory and no PDF library is needed. The same seed gives the same corpus.
+#
+#   python synthetic_corpus.py /tmp/corpus --pdf 100 --markdown 100 --large 0.1
+# ---------------------------------------------------------------------------
+
+WORDS = (
+    "adaptive analysis approach bayesian boundary causal channel cluster "
+    "convex dynamic efficient estimation feedback gradient graph inference "
+    "kernel latent learning linear model network neural nonlinear optimal "
+    "parallel process random robust sampling scalable signal sparse "
+    "spectral stochastic structure system theory transfer uncertainty "
+    "variational vector"
+).split()
+
+FIRST_NAMES = ("Ada", "Alan", "Barbara", "Claude", "Donald", "Edsger", "Grace",
+               "John", "Katherine", "Leslie", "Margaret", "Niklaus", "Radia", "Tony")
+LAST_NAMES = ("Dijkstra", "Hamilton", "Hoare", "Hopper", "Johnson", "Knuth",
+              "Lamport", "Liskov", "Lovelace", "Perlman", "Shannon", "Turing", "Wirth")
+
+# Letter-size page, in PDF points.
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+
+def random_title(rng):
+    """
+    Build a random paper title.
+
+    Parameters:
+        rng (random.Random): The random generator.
+
+    Returns:
+        str: The title.
+    """
+    words = rng.sample(WORDS, rng.randint(3, 7))
+    return " ".join(word.capitalize() for word in words)
+
+def random_authors(rng):
+    """
+    Build a random author list.
+
+    Parameters:
+        rng (random.Random): The random generator.
+
+    Returns:
+        str: One to three names separated by " and ".
+    """
+    count = rng.randint(1, 3)
+    return " and ".join(f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" for _ in range(count))
+
+def random_paragraph(rng, words=80):
+    """
+    Build a paragraph of random words.
+
+    Parameters:
+        rng (random.Random): The random generator.
+        words (int): Number of words.
+
+    Returns:
+        str: The paragraph.
+    """
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+def text_page_content(lines):
+    """
+    Build the content stream of a page that shows lines of text.
+
+    Parameters:
+        lines (list): The lines, without parentheses or backslashes.
+
+    Returns:
+        bytes: The content stream.
+    """
+    shown = " ".join(f"({line}) '" for line in lines)
+    return f"BT /F1 11 Tf 72 {PAGE_HEIGHT - 72} Td 14 TL {shown} ET".encode('latin-1')
+
+def wrap_words(text, width=90):
+    """
+    Split a paragraph into lines of at most width characters.
+
+    Parameters:
+        text (str): The paragraph.
+        width (int): Maximum line length.
+
+    Returns:
+        list: The lines.
+    """
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+def write_pdf(path, pages, info=None, scanned_image=None):
+    """
+    Write a PDF file.
+
+    Parameters:
+        path (str): The output path.
+        pages (list): Content streams (bytes), one per page.
+        info (dict): Document info entries such as {"Title": ...}, or None.
+        scanned_image (tuple): (width, height, pixels) of an 8-bit grayscale
+            image drawn on every page, or None. Scanned pages have no text.
+    """
+    with open(path, 'wb') as file:
+        offsets = []
+
+        def add_object(body):
+            offsets.append(file.tell())
+            file.write(f"{len(offsets)} 0 obj\n".encode('latin-1'))
+            file.write(body)
+            file.write(b"\nendobj\n")
+            return len(offsets)
+
+        def stream(dictionary, data):
+            header = f"<< {dictionary} /Length {len(data)} >>" if dictionary else f"<< /Length {len(data)} >>"
+            return f"{header}\nstream\n".encode('latin-1') + data + b"\nendstream"
+
+        file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        # Objects 1 to 4 are the catalog, the page tree, the font and the
+        # image; each page then takes two objects (the page and its content),
+        # so the page tree can list the kids before they are written.
+        page_count = len(pages)
+        kids = " ".join(f"{5 + i * 2} 0 R" for i in range(page_count))
+        add_object(b"<< /Type /Catalog /Pages 2 0 R >>")
+        add_object(f"<< /Type /Pages /Kids [{kids}] /Count {page_count} "
+                   f"/MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] >>".encode('latin-1'))
+        add_object(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        if scanned_image is not None:
+            width, height, pixels = scanned_image
+            add_object(stream(f"/Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                              f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode",
+                              zlib.compress(pixels)))
+        else:
+            # Keep the object numbers the same as with an image.
+            add_object(b"<< >>")
+
+        for content in pages:
+            page_id = len(offsets) + 1
+            if scanned_image is None:
+                add_object(f"<< /Type /Page /Parent 2 0 R /Contents {page_id + 1} 0 R "
+                           f"/Resources << /Font << /F1 3 0 R >> >> >>".encode('latin-1'))
+                add_object(stream("/Filter /FlateDecode", zlib.compress(content)))
+            else:
+                draw = f"q {PAGE_WIDTH} 0 0 {PAGE_HEIGHT} 0 0 cm /Im1 Do Q".encode('latin-1')
+                add_object(f"<< /Type /Page /Parent 2 0 R /Contents {page_id + 1} 0 R "
+                           f"/Resources << /XObject << /Im1 4 0 R >> >> >>".encode('latin-1'))
+                add_object(stream("", draw))
+
+        info_id = None
+        if info:
+            entries = " ".join(f"/{key} ({value})" for key, value in info.items())
+            info_id = add_object(f"<< {entries} >>".encode('latin-1'))
+
+        xref_offset = file.tell()
+        file.write(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode('latin-1'))
+        for offset in offsets:
+            file.write(f"{offset:010d} 00000 n \n".encode('latin-1'))
+        trailer = f"/Size {len(offsets) + 1} /Root 1 0 R"
+        if info_id is not None:
+            trailer += f" /Info {info_id} 0 R"
+        file.write(f"trailer\n<< {trailer} >>\nstartxref\n{xref_offset}\n%%EOF\n".encode('latin-1'))
+
+def make_pdf(path, rng, large=False, scanned=False, embedded=False, large_pages=200):
+    """
+    Write one synthetic paper as a PDF.
+
+    Parameters:
+        path (str): The output path.
+        rng (random.Random): The random generator.
+        large (bool): Write large_pages pages instead of one.
+        scanned (bool): Draw an image instead of text.
+        embedded (bool): Store the title, author and year in the document
+            info dictionary (and a copyright line on the first page).
+        large_pages (int): Number of pages of a large PDF.
+    """
+    title, authors, year = random_title(rng), random_authors(rng), rng.randint(1990, 2024)
+    page_count = large_pages if large else 1
+    info = None
+    if embedded:
+        info = {"Title": title, "Author": authors, "CreationDate": f"D:{year}0101000000"}
+
+    if scanned:
+        # A compressible "scan": the same noisy row repeated down the page.
+        width, height = (1700, 2200) if large else (850, 1100)
+        row = bytes(rng.randrange(200, 256) for _ in range(width))
+        write_pdf(path, [b""] * page_count, info, (width, height, row * height))
+        return
+
+    first_lines = [title, authors, f"Copyright {year}" if embedded else f"Preprint, {year}", ""]
+    first_lines += wrap_words(random_paragraph(rng, 250))
+    pages = [text_page_content(first_lines)]
+    for _ in range(page_count - 1):
+        pages.append(text_page_content(wrap_words(random_paragraph(rng, 500))))
+    write_pdf(path, pages, info)
+
+def make_markdown(path, rng, large=False, embedded=False, large_sections=400):
+    """
+    Write one synthetic note as a Markdown file.
+
+    Parameters:
+        path (str): The output path.
+        rng (random.Random): The random generator.
+        large (bool): Write large_sections sections instead of three.
+        embedded (bool): Start with YAML front matter holding the title,
+            author and date.
+        large_sections (int): Number of sections of a large file.
+    """
+    title, authors, year = random_title(rng), random_authors(rng), rng.randint(1990, 2024)
+    parts = []
+    if embedded:
+        parts.append(f"---\ntitle: {title}\nauthor: {authors}\ndate: {year}-01-01\n---\n")
+    else:
+        parts.append(f"# {title}\n\n{authors}, {year}\n")
+    for i in range(large_sections if large else 3):
+        parts.append(f"\n## {random_title(rng)}\n\n{random_paragraph(rng)}\n")
+        if i % 5 == 2:
+            parts.append("\n```python\nfor i in range(10):\n    print(i)\n```\n")
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write("".join(parts))
+
+def generate_corpus(directory, pdf_count=100, markdown_count=100, large_fraction=0.1,
+                    scanned_fraction=0.1, embedded_fraction=0.3, seed=0, large_pages=200):
+    """
+    Write a synthetic corpus of PDF and Markdown files into a directory.
+
+    Each fraction is the share of files that get that property, chosen at
+    random per file. Scanned only applies to PDFs.
+
+    Parameters:
+        directory (str): The output directory (created if needed).
+        pdf_count (int): Number of PDF files.
+        markdown_count (int): Number of Markdown files.
+        large_fraction (float): Share of large files.
+        scanned_fraction (float): Share of PDFs without a text layer.
+        embedded_fraction (float): Share of files with embedded metadata.
+        seed (int): Seed of the random generator.
+        large_pages (int): Number of pages of a large PDF.
+
+    Returns:
+        dict: Number of files of each shape, e.g. {"pdf": 100, "large": 20, ...}.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    counts = {"pdf": pdf_count, "markdown": markdown_count, "large": 0, "scanned": 0, "embedded": 0}
+    for i in range(pdf_count + markdown_count):
+        large = rng.random() < large_fraction
+        embedded = rng.random() < embedded_fraction
+        if i < pdf_count:
+            scanned = rng.random() < scanned_fraction
+            make_pdf(os.path.join(directory, f"paper-{i:06d}.pdf"), rng, large, scanned, embedded, large_pages)
+            counts["scanned"] += scanned
+        else:
+            make_markdown(os.path.join(directory, f"note-{i:06d}.md"), rng, large, embedded)
+        counts["large"] += large
+        counts["embedded"] += embedded
+    return counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic PDF and Markdown corpus.")
+    parser.add_argument("directory")
+    parser.add_argument("--pdf", type=int, default=100, help="Number of PDF files.")
+    parser.add_argument("--markdown", type=int, default=100, help="Number of Markdown files.")
+    parser.add_argument("--large", type=float, default=0.1, help="Share of large files.")
+    parser.add_argument("--scanned", type=float, default=0.1, help="Share of scanned PDFs (no text layer).")
+    parser.add_argument("--embedded", type=float, default=0.3, help="Share of files with embedded metadata.")
+    parser.add_argument("--large-pages", type=int, default=200, help="Number of pages of a large PDF.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    counts = generate_corpus(args.directory, args.pdf, args.markdown, args.large,
+                             args.scanned, args.embedded, args.seed, args.large_pages)
+    print(f"Wrote {counts['pdf']} PDF and {counts['markdown']} Markdown files to {args.directory} "
+          f"({counts['large']} large, {counts['scanned']} scanned, {counts['embedded']} with embedded metadata).")
@@ -0,0 +1,110 @@
+import os
+import sys
+import threading
+
+import pytest
+
+# The tests import the renamer package and the scripts next to it
+# (mock_llm_server, synthetic_corpus, benchmark) from the repository root.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import mock_llm_server
+from renamer import config, engine, inference
+from renamer.backends import openai_chat
+
+# ---------------------------------------------------------------------------
+# Shared fixtures.
+#
+# Every test runs offline: the engine talks to mock_llm_server on a free
+# local port, and the source, destination, cache, journal and index live in
+# the test's temporary directory.
+# ---------------------------------------------------------------------------
+
+# Module globals holding the shared objects of a run, as they are before the first run.
+FRESH_STATE = {
+    engine: {"journal": None, "journal_opened": False, "duplicates": None, "duplicates_opened": False,
+             "pool": None, "ocr_pool": None, "ocr_checked": False, "planned_moves": None,
+             "claim_queue": None},
+    inference: {"backend": None, "metadata_cache": None, "cache_opened": False},
+    openai_chat: {"client": None, "api_limiter": None},
+}
+
+@pytest.fixture(scope="session")
+def mock_server():
+    """
+    Run mock_llm_server in a background thread for the whole session.
+
+    Yields:
+        ThreadingHTTPServer: The server; its base URL is
+            f"http://127.0.0.1:{server.server_port}/v1".
+    """
+    server = mock_llm_server.make_server("127.0.0.1", 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def sent_requests(monkeypatch):
+    """
+    Record the chat completion requests that reach the mock server.
+
+    Returns:
+        list: The decoded request bodies, in the order they were answered.
+    """
+    requests = []
+    build_completion = mock_llm_server.build_completion
+
+    def recorded(request_body, *args):
+        requests.append(request_body)
+        return build_completion(request_body, *args)
+
+    monkeypatch.setattr(mock_llm_server, "build_completion", recorded)
+    return requests
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch, mock_server):
+    """
+    Point the engine at a temporary inbox and at the mock server.
+
+    The shared state of the engine, the inference module and the OpenAI
+    backend is reset before the test and restored afterwards.
+
+    Yields:
+        dict: The config settings of the test, e.g. workspace["SOURCE_DIR"].
+    """
+    settings = {
+        "SOURCE_DIR": str(tmp_path / "inbox"),
+        "DESTINATION_DIR": str(tmp_path / "renamed"),
+        "CACHE_PATH": str(tmp_path / "metadata_cache.sqlite3"),
+        "JOURNAL_PATH": str(tmp_path / "renamer_journal.sqlite3"),
+        "BATCH_FILE": str(tmp_path / "renamer_batch.jsonl"),
+        "DUPLICATE_INDEX_PATH": str(tmp_path / "renamer_duplicates.sqlite3"),
+        "OCR_CACHE_PATH": str(tmp_path / "ocr_cache.sqlite3"),
+        "PLAN_FILE": str(tmp_path / "renamer_plan.json"),
+        "UNDO_LOG": str(tmp_path / "renamer_undo.jsonl"),
+        "WORK_QUEUE_PATH": str(tmp_path / "renamer_queue.sqlite3"),
+        "INFERENCE_BACKEND": "openai",
+        "BASE_URL": f"http://127.0.0.1:{mock_server.server_port}/v1",
+        "MODEL_NAME": "stub",
+        "api_key": "test",
+        "MAX_IN_FLIGHT": 4,
+        "PACK_SIZE": 1,
+        "EXTRACTION_PROCESSES": 0,
+        "OCR_ENABLED": False,
+        "METRICS_FORMAT": None,
+        "DRY_RUN": False,
+    }
+    os.makedirs(settings["SOURCE_DIR"])
+    for name, value in settings.items():
+        monkeypatch.setattr(config, name, value)
+    for module, state in FRESH_STATE.items():
+        for name, value in state.items():
+            monkeypatch.setattr(module, name, value)
+    yield settings
+    engine.shutdown_extraction_pool()
+    for store in (engine.journal, engine.duplicates, inference.metadata_cache):
+        if store is not None:
+            store.close()
@@ -0,0 +1,53 @@
+import os
+import threading
+
+import pytest
+
+from renamer import backends, config, engine
+from renamer.backends import local_model
+from test_engine import write_notes
+
+def test_unknown_backends_are_an_error():
+    with pytest.raises(ValueError, match="Unknown inference backend 'gpt'"):
+        backends.create_backend("gpt")
+
+def test_a_compatible_server_needs_no_api_key(workspace, sent_requests, monkeypatch):
+    monkeypatch.setattr(config, "api_key", None)
+    write_notes(workspace["SOURCE_DIR"], 3)
+
+    engine.process_directory(["markdown"])
+
+    assert len(sent_requests) == 3
+    assert all(request["model"] == "stub" for request in sent_requests)
+    assert len(os.listdir(workspace["DESTINATION_DIR"])) == 3
+
+def test_local_prompts_arriving_together_share_a_batch(monkeypatch):
+    monkeypatch.setattr(config, "LOCAL_BATCH_SIZE", 4)
+    monkeypatch.setattr(config, "LOCAL_BATCH_WAIT", 0.5)
+    # Stand-ins for torch and the loaded model; generate() echoes the prompts.
+    monkeypatch.setattr(local_model, "torch", object())
+    backend = local_model.LocalModelBackend()
+    backend.model = object()
+    batches = []
+
+    def generate(batch):
+        batches.append(len(batch))
+        return [(prompt.messages[-1]["content"].upper(), 10, 2) for prompt in batch]
+
+    backend.generate = generate
+    replies = {}
+
+    def ask(i):
+        replies[i] = backend.complete([{"role": "user", "content": f"prompt {i}"}])
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(6)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        backend.close()
+
+    assert replies == {i: f"PROMPT {i}" for i in range(6)}
+    assert sum(batches) == 6 and max(batches) == 4
@@ -0,0 +1,23 @@
+import argparse
+
+import benchmark
+from renamer import config
+
+def test_benchmark_reports_every_file(workspace, tmp_path, monkeypatch):
+    # The benchmark starts its own mock server and points the client at it.
+    monkeypatch.setattr(config, "BASE_URL", None)
+    monkeypatch.setenv("OPENAI_BASE_URL", "")
+    args = argparse.Namespace(
+        workdir=str(tmp_path / "benchmark"), pdf=4, markdown=4, large=0.25, scanned=0.0, embedded=0.25,
+        seed=0, large_pages=5, latency=0.0, error_rate=0.0, rpm=None, tpm=None, formats=None,
+        max_in_flight=4, pack_size=1, processes=0, workers=1, keep=False, verbose=False,
+    )
+
+    results = benchmark.run_benchmark(args)
+
+    assert results["files_processed"] == 8
+    assert results["files_moved"] == 8
+    assert results["stages"]["extract"]["calls"] == 8
+    # Files with embedded metadata need no request.
+    assert 0 < results["api"]["requests"] <= 8
+    benchmark.print_report(results)
@@ -0,0 +1,50 @@
+import os
+import threading
+import time
+
+from renamer import directory_scanner
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write("text")
+
+def test_scan_files_walks_subdirectories_but_not_excluded_ones(tmp_path):
+    for name in ("a.pdf", "b.PDF", "notes.md", "sub/c.pdf", "sub/deeper/d.pdf", "renamed/e.pdf"):
+        touch(str(tmp_path / name))
+    root = str(tmp_path)
+
+    found = directory_scanner.scan_files(root, ('.pdf',), exclude=[str(tmp_path / "renamed")])
+    assert sorted(os.path.relpath(path, root) for path in found) == [
+        "a.pdf", "b.PDF", os.path.join("sub", "c.pdf"), os.path.join("sub", "deeper", "d.pdf")]
+
+    found = directory_scanner.scan_files(root, ('.pdf',), recursive=False)
+    assert sorted(os.path.relpath(path, root) for path in found) == ["a.pdf", "b.PDF"]
+
+def test_chunked_groups_lazily():
+    assert list(directory_scanner.chunked(iter(range(7)), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+
+def test_run_bounded_limits_items_in_flight():
+    lock = threading.Lock()
+    running, peak, started = 0, 0, []
+
+    def items():
+        for i in range(40):
+            started.append(i)
+            yield i
+
+    def worker(item):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+
+    def on_done(count, item):
+        # The generator is never read more than 2 * max_workers items ahead.
+        assert len(started) - count <= 2 * 4
+
+    assert directory_scanner.run_bounded(items(), worker, 4, on_done) == 40
+    assert 1 < peak <= 4
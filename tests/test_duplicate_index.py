@@ -0,0 +1,97 @@
+import os
+
+from renamer import config, duplicate_index, engine
+
+TEXT = ("On the Electrodynamics of Moving Bodies. Albert Einstein, 1905. It is known that Maxwell's "
+        "electrodynamics, as usually understood at the present time, leads to asymmetries.")
+METADATA = {"Author": "Albert Einstein", "Title": "On the Electrodynamics of Moving Bodies", "Year": "1905"}
+
+def test_exact_and_near_duplicates_are_found(tmp_path):
+    index = duplicate_index.DuplicateIndex(str(tmp_path / "duplicates.sqlite3"))
+    try:
+        index.add(TEXT, METADATA, "/inbox/einstein.pdf", "/library/Albert Einstein 1905--On the.pdf")
+
+        exact = index.find(TEXT.upper())
+        assert exact["similarity"] == 1.0 and exact["metadata"] == METADATA
+        near = index.find(TEXT + " Downloaded from the archive.")
+        assert near["path"] == "/inbox/einstein.pdf" and 0.8 <= near["similarity"] < 1.0
+        assert index.find("A Study of Topics. Jane Doe, 2021. Notes on chapter one of the reading list.") is None
+    finally:
+        index.close()
+
+def test_only_identical_text_matches_above_a_similarity_of_one(tmp_path):
+    index = duplicate_index.DuplicateIndex(str(tmp_path / "duplicates.sqlite3"), min_similarity=1.1)
+    try:
+        index.add(TEXT, METADATA, "/inbox/einstein.pdf")
+
+        assert index.find(TEXT) is not None
+        assert index.find(TEXT + " Downloaded from the archive.") is None
+    finally:
+        index.close()
+
+def test_a_copy_reuses_the_metadata_without_a_request(workspace, sent_requests):
+    path = os.path.join(workspace["SOURCE_DIR"], "einstein.md")
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(TEXT)
+    engine.process_directory(["markdown"])
+    assert len(sent_requests) == 1
+
+    copy = os.path.join(workspace["SOURCE_DIR"], "einstein (1).md")
+    with open(copy, 'w', encoding='utf-8') as file:
+        file.write(TEXT + "\n\nDownloaded from the archive.\n")
+    engine.process_directory(["markdown"])
+
+    assert len(sent_requests) == 1
+    # The renamed copy would get the same name as the original, so it stays in place.
+    assert len(os.listdir(workspace["DESTINATION_DIR"])) == 1
+    assert os.path.exists(copy)
+
+def test_a_copy_is_moved_to_the_duplicates_directory(workspace, sent_requests, monkeypatch):
+    monkeypatch.setattr(config, "DUPLICATE_ACTION", "move")
+    for name in ("einstein.md", "einstein (1).md"):
+        with open(os.path.join(workspace["SOURCE_DIR"], name), 'w', encoding='utf-8') as file:
+            file.write(TEXT)
+        engine.process_directory(["markdown"])
+
+    assert len(sent_requests) == 1
+    assert os.listdir(workspace["SOURCE_DIR"]) == []
+    renamed = [name for name in os.listdir(workspace["DESTINATION_DIR"]) if name != "duplicates"]
+    assert renamed == os.listdir(os.path.join(workspace["DESTINATION_DIR"], "duplicates"))
+
+def test_a_file_is_not_its_own_duplicate(tmp_path):
+    index = duplicate_index.DuplicateIndex(str(tmp_path / "duplicates.sqlite3"))
+    try:
+        index.add(TEXT, METADATA, "/inbox/einstein.pdf", "/library/Albert Einstein 1905--On the.pdf")
+        # Indexed again, e.g. by a run after an undo.
+        index.add(TEXT, METADATA, "/inbox/einstein.pdf")
+
+        assert index.find(TEXT, "/inbox/einstein.pdf") is None
+        assert index.find(TEXT + " Downloaded from the archive.", "/inbox/einstein.pdf") is None
+        assert index.find(TEXT, "/inbox/einstein-copy.pdf")["similarity"] == 1.0
+    finally:
+        index.close()
+
+def test_a_duplicate_is_found_behind_the_files_own_entry(tmp_path):
+    index = duplicate_index.DuplicateIndex(str(tmp_path / "duplicates.sqlite3"))
+    try:
+        index.add(TEXT, METADATA, "/inbox/einstein.pdf")
+        index.add(TEXT, METADATA, "/inbox/einstein-copy.pdf")
+
+        assert index.find(TEXT, "/inbox/einstein.pdf")["path"] == "/inbox/einstein-copy.pdf"
+    finally:
+        index.close()
+
+def test_rerun_after_undo_renames_the_file_again(workspace, monkeypatch):
+    monkeypatch.setattr(config, "DUPLICATE_ACTION", "move")
+    path = os.path.join(workspace["SOURCE_DIR"], "einstein.md")
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(TEXT)
+    engine.plan_directory()
+    engine.apply_plan()
+    engine.undo_plan()
+    assert os.path.exists(path)
+
+    # The file's own index entry does not turn it into a duplicate.
+    engine.process_directory(["markdown"])
+    renamed = os.listdir(workspace["DESTINATION_DIR"])
+    assert len(renamed) == 1 and renamed[0].endswith(".md")
@@ -0,0 +1,195 @@
+import os
+import time
+
+from renamer import config, engine, inference, naming, rate_limiter
+from test_extractors import write_pdf
+
+def write_notes(directory, count):
+    """
+    Write Markdown notes with distinct text, so that each gets its own file name.
+
+    Returns:
+        list: The paths of the notes.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"note-{i:03d}.md")
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(f"# Note {i}\n\nNotes on chapter {i} of the reading list.\n")
+        paths.append(path)
+    return paths
+
+def test_process_directory_renames_every_file_offline(workspace, sent_requests):
+    paths = write_notes(workspace["SOURCE_DIR"], 12)
+
+    engine.process_directory(["markdown"])
+
+    assert not any(os.path.exists(path) for path in paths)
+    renamed = os.listdir(workspace["DESTINATION_DIR"])
+    assert len(renamed) == 12
+    assert all(name.startswith("Stub Author 2024--Stub Title ") and name.endswith(".md") for name in renamed)
+    assert len(sent_requests) == 12
+
+def test_a_mixed_inbox_is_processed_in_one_pass(workspace, sent_requests):
+    write_notes(workspace["SOURCE_DIR"], 2)
+    write_pdf(os.path.join(workspace["SOURCE_DIR"], "paper.pdf"), ["A Study of Topics", "Jane Doe, 2021"])
+
+    engine.process_directory()
+
+    renamed = sorted(os.path.splitext(name)[1] for name in os.listdir(workspace["DESTINATION_DIR"]))
+    assert renamed == [".md", ".md", ".pdf"]
+    assert len(sent_requests) == 3
+
+def test_requests_overlap_up_to_max_in_flight(workspace, mock_server, monkeypatch):
+    monkeypatch.setattr(mock_server.RequestHandlerClass, "latency", 0.5)
+    monkeypatch.setattr(config, "MAX_IN_FLIGHT", 8)
+    write_notes(workspace["SOURCE_DIR"], 8)
+
+    started = time.perf_counter()
+    engine.process_directory(["markdown"])
+
+    # One after another, the eight answers would take 4 seconds.
+    assert time.perf_counter() - started < 2.0
+    assert len(os.listdir(workspace["DESTINATION_DIR"])) == 8
+
+def test_concurrent_workers_never_share_a_file_name(workspace):
+    # Identical notes get identical metadata from the mock server.
+    paths = [os.path.join(workspace["SOURCE_DIR"], f"copy-{i}.md") for i in range(6)]
+    for path in paths:
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write("# Note\n\nThe same note, downloaded several times.\n")
+
+    engine.process_directory(["markdown"])
+
+    assert len(os.listdir(workspace["DESTINATION_DIR"])) == 1
+    assert sum(os.path.exists(path) for path in paths) == 5
+
+def test_cached_metadata_needs_no_request(workspace, sent_requests, tmp_path, monkeypatch):
+    # Only the cache may answer, not the journal.
+    monkeypatch.setattr(config, "JOURNAL_PATH", None)
+    write_notes(workspace["SOURCE_DIR"], 3)
+    engine.process_directory(["markdown"])
+    assert len(sent_requests) == 3
+
+    # The same documents again, e.g. downloaded twice: the cache answers.
+    write_notes(workspace["SOURCE_DIR"], 3)
+    monkeypatch.setattr(config, "DESTINATION_DIR", str(tmp_path / "renamed-again"))
+    engine.process_directory(["markdown"])
+
+    assert len(sent_requests) == 3
+    assert len(os.listdir(tmp_path / "renamed-again")) == 3
+
+def test_batch_mode_renames_the_files_from_the_results(workspace, tmp_path, monkeypatch):
+    # Batch mode needs the OpenAI API; the mock server stands in for it.
+    monkeypatch.setenv("OPENAI_BASE_URL", workspace["BASE_URL"])
+    monkeypatch.setattr(config, "BASE_URL", None)
+    monkeypatch.setattr(config, "BATCH_POLL_INTERVAL", 0.1)
+    paths = write_notes(workspace["SOURCE_DIR"], 4)
+
+    engine.run_batch(formats=["markdown"])
+
+    assert not any(os.path.exists(path) for path in paths)
+    assert len(os.listdir(workspace["DESTINATION_DIR"])) == 4
+    with open(tmp_path / "renamer_batch.results.jsonl", encoding='utf-8') as results:
+        assert len(results.read().splitlines()) == 4
+
+def test_batch_prepare_skips_cached_files(workspace, tmp_path, monkeypatch):
+    write_notes(workspace["SOURCE_DIR"], 2)
+    engine.process_directory(["markdown"])
+    write_notes(workspace["SOURCE_DIR"], 3)
+
+    # Only the third note is new; the first two are applied from the cache.
+    assert engine.prepare_batch(formats=["markdown"]) == 1
+    monkeypatch.setattr(config, "DESTINATION_DIR", str(tmp_path / "renamed-again"))
+    engine.apply_batch()
+
+    assert len(os.listdir(tmp_path / "renamed-again")) == 2
+    assert len(os.listdir(workspace["SOURCE_DIR"])) == 1
+
+def test_packed_prompts_cover_several_files(workspace, sent_requests, monkeypatch):
+    monkeypatch.setattr(config, "PACK_SIZE", 4)
+    write_notes(workspace["SOURCE_DIR"], 8)
+
+    engine.process_directory(["markdown"])
+
+    assert len(sent_requests) == 2
+    assert len(set(os.listdir(workspace["DESTINATION_DIR"]))) == 8
+
+def test_malformed_packed_entries_are_left_for_a_single_request():
+    reply = ('```json\n[{"id": 1, "Author": "Jane Doe", "Title": "Notes", "Year": "2021"},'
+             ' {"Author": "No Id"}, "not an object"]\n```')
+    parsed = inference.parse_packed_response(reply)
+    assert list(parsed) == ["1"]
+    metadata, errors, entry = parsed["1"]
+    assert metadata == {"Author": "Jane Doe", "Title": "Notes", "Year": "2021"} and errors == {}
+
+def test_front_matter_skips_the_model(workspace, sent_requests):
+    path = os.path.join(workspace["SOURCE_DIR"], "engine.md")
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write("---\ntitle: Notes on the Analytical Engine\nauthor: Ada Lovelace\ndate: 1843\n---\n\nSome notes.\n")
+
+    engine.process_directory(["markdown"])
+
+    assert sent_requests == []
+    assert os.listdir(workspace["DESTINATION_DIR"]) == ["Ada Lovelace 1843--Notes on the Analytical Engine.md"]
+
+def test_subdirectories_are_scanned_but_not_the_destination(workspace, monkeypatch):
+    paths = write_notes(os.path.join(workspace["SOURCE_DIR"], "2021", "spring"), 2)
+    # A destination inside the inbox holds files that were renamed before.
+    destination = os.path.join(workspace["SOURCE_DIR"], "renamed")
+    monkeypatch.setattr(config, "DESTINATION_DIR", destination)
+    write_notes(destination, 1)
+
+    engine.process_directory(["markdown"])
+
+    assert not any(os.path.exists(path) for path in paths)
+    assert len(os.listdir(destination)) == 3
+    assert os.path.exists(os.path.join(destination, "note-000.md"))
+
+def test_an_interrupted_run_resumes_without_inference(workspace, sent_requests, monkeypatch):
+    paths = write_notes(workspace["SOURCE_DIR"], 3)
+    # The first run stops after inference, before any file is moved.
+    rename_and_move = naming.rename_and_move
+    monkeypatch.setattr(naming, "rename_and_move", lambda *args: None)
+    engine.process_directory(["markdown"])
+    assert len(sent_requests) == 3
+
+    monkeypatch.setattr(naming, "rename_and_move", rename_and_move)
+    monkeypatch.setattr(config, "CACHE_PATH", None)
+    engine.process_directory(["markdown"])
+
+    assert len(sent_requests) == 3
+    assert not any(os.path.exists(path) for path in paths)
+    assert len(os.listdir(workspace["DESTINATION_DIR"])) == 3
+
+def test_rate_limit_errors_are_retried(workspace, mock_server, monkeypatch):
+    monkeypatch.setattr(mock_server.RequestHandlerClass, "error_rate", 0.3)
+    monkeypatch.setattr(rate_limiter, "backoff_delay", lambda attempt: 0.01)
+    write_notes(workspace["SOURCE_DIR"], 8)
+
+    engine.process_directory(["markdown"])
+
+    assert len(os.listdir(workspace["DESTINATION_DIR"])) == 8
+
+def test_a_file_whose_request_keeps_failing_stays_in_place(workspace, mock_server, monkeypatch):
+    monkeypatch.setattr(mock_server.RequestHandlerClass, "error_rate", 1.0)
+    monkeypatch.setattr(rate_limiter, "backoff_delay", lambda attempt: 0.01)
+    monkeypatch.setattr(config, "MAX_RETRIES", 2)
+    paths = write_notes(workspace["SOURCE_DIR"], 2)
+
+    engine.process_directory(["markdown"])
+
+    assert all(os.path.exists(path) for path in paths)
+    assert os.listdir(workspace["DESTINATION_DIR"]) == []
+
+def test_dry_run_calls_no_model_and_writes_nothing(workspace, sent_requests, tmp_path, capsys):
+    paths = write_notes(workspace["SOURCE_DIR"], 5)
+    before = sorted(os.listdir(tmp_path))
+
+    engine.dry_run(["markdown"])
+
+    assert sent_requests == []
+    assert all(os.path.exists(path) for path in paths)
+    assert sorted(os.listdir(tmp_path)) == before
+    assert "0 file(s) planned, 5 would be sent to the model." in capsys.readouterr().out
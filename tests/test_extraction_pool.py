@@ -0,0 +1,64 @@
+import os
+import time
+
+import pytest
+
+from renamer import config, engine, extraction_pool
+from renamer.extractors import EXTRACTORS
+from test_extractors import write_pdf
+
+def test_pdfs_are_extracted_in_worker_processes(workspace, sent_requests, monkeypatch):
+    monkeypatch.setattr(config, "EXTRACTION_PROCESSES", 2)
+    pooled = []
+    extract = extraction_pool.ExtractionPool.extract
+
+    def recorded(pool, path, *args):
+        pooled.append(path)
+        return extract(pool, path, *args)
+
+    monkeypatch.setattr(extraction_pool.ExtractionPool, "extract", recorded)
+    for i in range(3):
+        write_pdf(os.path.join(workspace["SOURCE_DIR"], f"paper-{i}.pdf"), [f"A Study of Topic {i}", "Jane Doe, 2021"])
+
+    engine.process_directory(["pdf"])
+
+    assert len(pooled) == 3
+    assert len(sent_requests) == 3
+    assert "A Study of Topic" in sent_requests[0]["messages"][-1]["content"]
+    assert len(os.listdir(workspace["DESTINATION_DIR"])) == 3
+
+def test_a_slow_extraction_is_aborted(tmp_path, monkeypatch):
+    monkeypatch.setattr(EXTRACTORS["markdown"], "extract", lambda path: time.sleep(5))
+    note = tmp_path / "note.md"
+    note.write_text("# A Title\n\nSome text.\n", encoding="utf-8")
+
+    started = time.monotonic()
+    with pytest.raises(extraction_pool.ExtractionTimeout):
+        extraction_pool.extract_excerpt(str(note), "markdown", None, 3000, timeout=0.2)
+    assert time.monotonic() - started < 2
+
+def test_discard_stops_a_hung_worker(tmp_path):
+    pool = extraction_pool.ExtractionPool(1, timeout=1)
+    try:
+        executor = pool.get_executor()
+        # A worker stuck past the timeout, as in native code that ignores the alarm.
+        hung = executor.submit(time.sleep, 600)
+        deadline = time.monotonic() + 30
+        while not executor._processes and time.monotonic() < deadline:
+            time.sleep(0.05)
+        workers = list(executor._processes.values())
+        assert workers and hung.running()
+
+        started = time.monotonic()
+        pool.discard(executor)
+        assert not any(worker.is_alive() for worker in workers)
+        assert time.monotonic() - started < extraction_pool.STOP_WAIT
+
+        # The next file gets a fresh pool.
+        note = tmp_path / "note.md"
+        note.write_text("# A Title\n\nSome text.\n", encoding="utf-8")
+        text, embedded, _ = pool.extract(str(note), "markdown", None, 3000)
+        assert "Some text." in text
+        assert pool.executor is not executor
+    finally:
+        pool.shutdown()
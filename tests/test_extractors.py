@@ -0,0 +1,163 @@
+import os
+import io
+import base64
+
+import PyPDF2
+from PyPDF2 import PdfReader
+
+from renamer import engine
+from renamer.extractors import extractor_for, get_extractors, markdown, pdf
+
+def write_pdf(path, lines, page_count=1, info=None):
+    """
+    Write a PDF whose pages show lines of text in Helvetica.
+
+    Parameters:
+        path (str): The output path.
+        lines (list): The lines, without parentheses or backslashes.
+        page_count (int): Number of pages, all with the same text.
+        info (dict): Document info entries such as {"Title": ...}, or None.
+    """
+    shown = " ".join(f"({line}) '" for line in lines)
+    content = f"BT /F1 11 Tf 72 720 Td 14 TL {shown} ET".encode('latin-1')
+    kids = " ".join(f"{4 + i * 2} 0 R" for i in range(page_count))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {page_count} /MediaBox [0 0 612 792] >>".encode('latin-1'),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i in range(page_count):
+        objects.append(f"<< /Type /Page /Parent 2 0 R /Contents {5 + i * 2} 0 R "
+                       f"/Resources << /Font << /F1 3 0 R >> >> >>".encode('latin-1'))
+        objects.append(f"<< /Length {len(content)} >>\nstream\n".encode('latin-1') + content + b"\nendstream")
+    trailer = f"/Size {len(objects) + 1} /Root 1 0 R"
+    if info:
+        objects.append(" ".join(["<<"] + [f"/{key} ({value})" for key, value in info.items()] + [">>"]).encode('latin-1'))
+        trailer = f"/Size {len(objects) + 1} /Root 1 0 R /Info {len(objects)} 0 R"
+    with open(path, 'wb') as file:
+        file.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(file.tell())
+            file.write(f"{number} 0 obj\n".encode('latin-1') + body + b"\nendobj\n")
+        xref_offset = file.tell()
+        file.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1'))
+        for offset in offsets:
+            file.write(f"{offset:010d} 00000 n \n".encode('latin-1'))
+        file.write(f"trailer\n<< {trailer} >>\n"
+                   f"startxref\n{xref_offset}\n%%EOF\n".encode('latin-1'))
+
+def test_extractors_are_chosen_by_extension():
+    assert extractor_for("paper.PDF").name == "pdf"
+    assert extractor_for("notes.markdown").name == "markdown"
+    assert extractor_for("notes.txt") is None
+    assert extractor_for("paper.pdf", get_extractors(["markdown"])) is None
+
+def test_unknown_formats_are_an_error():
+    try:
+        get_extractors(["pdf", "epub"])
+    except ValueError as e:
+        assert "Unknown format(s): epub" in str(e)
+    else:
+        raise AssertionError("no error for an unknown format")
+
+def test_each_pdf_is_parsed_once(workspace, sent_requests, monkeypatch):
+    for i in range(3):
+        write_pdf(os.path.join(workspace["SOURCE_DIR"], f"paper-{i}.pdf"), [f"A Study of Topic {i}", "Jane Doe, 2021"])
+    opened = []
+
+    def counting_reader(path, *args, **kwargs):
+        opened.append(path)
+        return PdfReader(path, *args, **kwargs)
+
+    # The PDF functions import PdfReader when they run.
+    monkeypatch.setattr(PyPDF2, "PdfReader", counting_reader)
+    engine.process_directory(["pdf"])
+
+    assert len(opened) == 3 and len(set(opened)) == 3
+    assert len(sent_requests) == 3
+    assert "A Study of Topic" in sent_requests[0]["messages"][-1]["content"]
+    assert len(os.listdir(workspace["DESTINATION_DIR"])) == 3
+
+def test_first_page_copy_is_a_one_page_pdf(tmp_path):
+    path = str(tmp_path / "paper.pdf")
+    write_pdf(path, ["A Study of Topics", "Jane Doe, 2021"], page_count=3)
+
+    copy = pdf.extract_first_page_pdf_to_base64(path)
+    assert len(PdfReader(io.BytesIO(base64.b64decode(copy))).pages) == 1
+
+def test_embedded_metadata_skips_the_model(workspace, sent_requests):
+    write_pdf(os.path.join(workspace["SOURCE_DIR"], "paper.pdf"),
+              ["Proceedings of the London Mathematical Society", "Published 1936, doi 10.1112/plms/s2-42.1.230"],
+              info={"Title": "On Computable Numbers", "Author": "Alan Turing", "CreationDate": "D:20200101"})
+
+    engine.process_directory(["pdf"])
+
+    assert sent_requests == []
+    assert os.listdir(workspace["DESTINATION_DIR"]) == ["Alan Turing 1936--On Computable Numbers.pdf"]
+
+def test_markdown_front_matter_is_read(tmp_path):
+    path = tmp_path / "note.md"
+    path.write_text("---\ntitle: Notes\nauthors: [Ada Lovelace, Charles Babbage]\n---\n\nText.\n", encoding="utf-8")
+
+    text, embedded = markdown.MarkdownExtractor().extract(str(path))
+
+    assert text.startswith("---\ntitle: Notes")
+    assert embedded["title"] == "Notes"
+    assert embedded["author"] == ["Ada Lovelace", "Charles Babbage"]
+
+def test_first_page_inherits_the_page_tree_attributes(tmp_path):
+    path = str(tmp_path / "paper.pdf")
+    write_pdf(path, ["A Study of Topics", "Jane Doe, 2021"], page_count=3)
+
+    with pdf.open_first_page(path) as (reader, page):
+        # The media box is only set on the page tree root.
+        assert [float(value) for value in page["/MediaBox"]] == [0, 0, 612, 792]
+        assert "A Study of Topics" in page.extract_text()
+
+def test_a_damaged_page_tree_falls_back_to_the_full_parser(tmp_path, monkeypatch):
+    path = str(tmp_path / "paper.pdf")
+    write_pdf(path, ["A Study of Topics", "Jane Doe, 2021"])
+
+    def damaged(reader):
+        raise ValueError("The page tree is too deep.")
+
+    monkeypatch.setattr(pdf, "first_page", damaged)
+    text, embedded = pdf.PdfExtractor().extract(path)
+
+    assert "A Study of Topics" in text
+
+def test_markdown_in_other_encodings_is_decoded(tmp_path):
+    legacy = tmp_path / "legacy.md"
+    legacy.write_bytes("# Café culture\n\nNotes by Renée, naïve but à propos.\n".encode("cp1252"))
+    wide = tmp_path / "wide.md"
+    wide.write_bytes("# Straßen\n\nNotes.\n".encode("utf-16"))
+
+    assert markdown.read_head(str(legacy), 1000, 65536, 100).startswith("# Café culture")
+    assert markdown.read_head(str(wide), 1000, 65536, 100).startswith("# Straßen")
+
+def test_data_uris_are_dropped_across_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(markdown, "CHUNK_SIZE", 7)
+    payload = "iVBORw0KGgo" * 50
+    path = tmp_path / "export.md"
+    path.write_text(f"# Export\n\n![figure](data:image/png;base64,{payload}) Figure 1.\n\nThe end.\n",
+                    encoding="utf-8")
+
+    assert markdown.read_head(str(path), 1000, 65536, 100) == "# Export\n\n![figure]() Figure 1.\n\nThe end.\n"
+
+def test_long_front_matter_is_skipped(tmp_path):
+    short = "---\ntitle: Notes\n---\n"
+    long = "---\ntitle: Notes\nabstract: " + "word " * 100 + "\n---\n"
+    path = tmp_path / "note.md"
+
+    path.write_text(short + "# Body\n", encoding="utf-8")
+    assert markdown.read_head(str(path), 1000, 65536, 100) == short + "# Body\n"
+    path.write_text(long + "# Body\n", encoding="utf-8")
+    assert markdown.read_head(str(path), 1000, 65536, 100).strip() == "# Body"
+
+def test_reading_stops_at_the_byte_limit(tmp_path):
+    path = tmp_path / "huge.md"
+    path.write_text("x" * 1_000_000, encoding="utf-8")
+
+    assert len(markdown.read_head(str(path), 10_000_000, 100_000, 100)) == 100_000
+    assert len(markdown.read_head(str(path), 5000, 10_000_000, 100)) == 5000
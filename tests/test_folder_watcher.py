@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from renamer import config, engine, folder_watcher
+from test_engine import write_notes
+
+@pytest.mark.parametrize("backend", ["inotify", "poll"])
+def test_present_and_arriving_files_are_yielded_once(tmp_path, backend):
+    inbox = tmp_path / "inbox"
+    first, = write_notes(str(inbox), 1)
+    files = folder_watcher.watch_files(str(inbox), (".md",), settle_seconds=0.1,
+                                       poll_interval=0.1, backend=backend)
+    try:
+        assert next(files) == first
+        arriving = inbox / "2021" / "arriving.md"
+        arriving.parent.mkdir()
+        arriving.write_text("# Arriving\n\nWritten while the folder is watched.\n", encoding="utf-8")
+        (inbox / "ignored.txt").write_text("Not a Markdown file.\n", encoding="utf-8")
+        assert next(files) == str(arriving)
+    finally:
+        files.close()
+
+def test_watch_mode_renames_arriving_files(workspace, monkeypatch):
+    monkeypatch.setattr(config, "WATCH_SETTLE_SECONDS", 0.1)
+    monkeypatch.setattr(config, "WATCH_POLL_INTERVAL", 0.1)
+    write_notes(workspace["SOURCE_DIR"], 2)
+    watch_files = folder_watcher.watch_files
+
+    def two_files_then_ctrl_c(*args, **kwargs):
+        files = watch_files(*args, **kwargs)
+        yield next(files)
+        with open(os.path.join(workspace["SOURCE_DIR"], "later.md"), 'w', encoding='utf-8') as file:
+            file.write("# Later\n\nA note that arrives while the folder is watched.\n")
+        yield next(files)
+        yield next(files)
+        files.close()
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(folder_watcher, "watch_files", two_files_then_ctrl_c)
+    engine.watch_directory(["markdown"])
+
+    assert len(os.listdir(workspace["DESTINATION_DIR"])) == 3
@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from renamer import config, engine, inference
+from test_engine import write_notes
+
+@pytest.mark.parametrize("field, value, expected", [
+    ("Author", ["Ada Lovelace", " Charles Babbage "], "Ada Lovelace; Charles Babbage"),
+    ("Author", "Ada Lovelace", "Ada Lovelace"),
+    ("Author", [], "NULL"),
+    ("Title", " Notes ", "Notes"),
+    ("Year", 1843, "1843"),
+    ("Year", "1843", "1843"),
+    ("Year", None, "NULL"),
+])
+def test_valid_fields_are_converted(field, value, expected):
+    assert inference.validate_field(field, value) == expected
+
+@pytest.mark.parametrize("field, value", [
+    ("Author", {"name": "Ada Lovelace"}),
+    ("Title", ""),
+    ("Title", "NULL"),
+    ("Year", "circa 1843"),
+    ("Year", 843),
+    ("Year", True),
+])
+def test_invalid_fields_are_rejected(field, value):
+    with pytest.raises(ValueError):
+        inference.validate_field(field, value)
+
+def test_requests_carry_the_metadata_schema(workspace, sent_requests):
+    write_notes(workspace["SOURCE_DIR"], 1)
+
+    engine.process_directory(["markdown"])
+
+    schema = sent_requests[0]["response_format"]["json_schema"]
+    assert schema["strict"] is True
+    assert schema["schema"]["required"] == ["Author", "Title", "Year"]
+
+def test_structured_output_can_be_turned_off(workspace, sent_requests, monkeypatch):
+    monkeypatch.setattr(config, "STRUCTURED_OUTPUT", False)
+    write_notes(workspace["SOURCE_DIR"], 1)
+
+    engine.process_directory(["markdown"])
+
+    assert "response_format" not in sent_requests[0]
+    assert len(os.listdir(workspace["DESTINATION_DIR"])) == 1
+
+def test_invalid_fields_are_repaired_with_a_short_prompt(workspace, sent_requests, mock_server, monkeypatch):
+    monkeypatch.setattr(mock_server.RequestHandlerClass, "invalid_rate", 1.0)
+    write_notes(workspace["SOURCE_DIR"], 2)
+
+    engine.process_directory(["markdown"])
+
+    repairs = [request for request in sent_requests
+               if request["messages"][-1]["content"].startswith("Your previous answer")]
+    assert len(sent_requests) == 4 and len(repairs) == 2
+    assert repairs[0]["response_format"]["json_schema"]["schema"]["required"] == ["Year"]
+    renamed = os.listdir(workspace["DESTINATION_DIR"])
+    assert len(renamed) == 2 and all(name.startswith("Stub Author 2024--") for name in renamed)
+
+class StubBackend:
+    """
+    Answers every prompt with the same reply.
+    """
+
+    def __init__(self, reply):
+        self.reply = reply
+
+    def describe(self):
+        return "stub backend"
+
+    def complete(self, messages, expected_output_tokens=100, response_format=None):
+        return self.reply
+
+def test_fields_still_invalid_after_the_repair_become_null(monkeypatch):
+    monkeypatch.setattr(inference, "get_backend", lambda: StubBackend('{"Year": "circa 1843"}'))
+
+    metadata = inference.repair_metadata("Notes.", '{"Year": "1843?"}', {"Author": "Ada Lovelace", "Title": "Notes"},
+                                         {"Year": "expected a 4-digit integer or null"})
+
+    assert metadata == {"Author": "Ada Lovelace", "Title": "Notes", "Year": "NULL"}
+
+def test_a_file_without_a_valid_title_is_left_in_place(workspace, monkeypatch, capsys):
+    monkeypatch.setattr(inference, "get_backend", lambda: StubBackend('{"Author": ["Ada Lovelace"], "Title": ""}'))
+    paths = write_notes(workspace["SOURCE_DIR"], 1)
+
+    engine.process_directory(["markdown"])
+
+    assert os.path.exists(paths[0])
+    assert os.listdir(workspace["DESTINATION_DIR"]) == []
+    assert "Still invalid after the correction: Title" in capsys.readouterr().out
@@ -0,0 +1,32 @@
+from renamer import job_journal
+
+METADATA = {"Author": "Ada Lovelace", "Title": "Notes on the Analytical Engine", "Year": "1843"}
+
+def test_stages_are_kept_across_reopening(tmp_path):
+    path = tmp_path / "note.md"
+    path.write_text("# Notes\n", encoding="utf-8")
+    journal_path = str(tmp_path / "journal.sqlite3")
+
+    journal = job_journal.JobJournal(journal_path)
+    journal.record(str(path), job_journal.EXTRACTED, text="# Notes")
+    journal.record(str(path), job_journal.INFERRED, metadata=METADATA)
+    journal.close()
+
+    journal = job_journal.JobJournal(journal_path)
+    entry = journal.get(str(path))
+    journal.close()
+    assert entry == {"state": job_journal.INFERRED, "data": {"text": "# Notes", "metadata": METADATA}}
+
+def test_a_changed_or_moved_file_starts_over(tmp_path):
+    path = tmp_path / "note.md"
+    path.write_text("# Notes\n", encoding="utf-8")
+    journal = job_journal.JobJournal(str(tmp_path / "journal.sqlite3"))
+    try:
+        journal.record(str(path), job_journal.INFERRED, metadata=METADATA)
+        path.write_text("# Other notes, saved under the same name\n", encoding="utf-8")
+        assert journal.get(str(path)) is None
+
+        journal.record(str(path), job_journal.MOVED, target=str(tmp_path / "renamed.md"))
+        assert journal.get(str(path)) is None
+    finally:
+        journal.close()
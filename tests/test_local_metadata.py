@@ -0,0 +1,45 @@
+from renamer import inference, local_metadata
+
+FRONT_MATTER = """---
+title: Notes on the Analytical Engine
+author: Ada Lovelace
+date: 1843-09-01
+---
+
+# Sketch of the Analytical Engine
+"""
+
+def test_front_matter_is_enough_to_skip_the_model():
+    metadata, confidence = local_metadata.guess_metadata(FRONT_MATTER, **local_metadata.markdown_fields(FRONT_MATTER))
+    assert metadata == {"Author": "Ada Lovelace", "Title": "Notes on the Analytical Engine", "Year": "1843"}
+    assert confidence >= 0.9
+
+def test_a_heading_alone_is_not_enough():
+    text = "# Sketch of the Analytical Engine\n\nSome notes.\n"
+    metadata, confidence = local_metadata.guess_metadata(text, **local_metadata.markdown_fields(text))
+    assert metadata["Title"] == "Sketch of the Analytical Engine"
+    assert metadata["Author"] == "NULL"
+    assert confidence < 0.9
+
+def test_placeholder_fields_are_ignored():
+    metadata, confidence = local_metadata.guess_metadata("", title="Microsoft Word - draft.docx", author="admin")
+    assert metadata == {"Author": "NULL", "Title": "NULL", "Year": "NULL"}
+    assert confidence == 0.0
+
+def test_a_copyright_year_beats_a_file_creation_date():
+    text = "A Study of Topics\nJane Doe\n\nCopyright © 2019 by the author."
+    metadata, confidence = local_metadata.guess_metadata(text, "A Study of Topics", "Jane Doe", "D:20230101120000")
+    assert metadata["Year"] == "2019"
+    assert confidence == 1.0
+
+def test_the_model_is_asked_when_no_year_is_found():
+    text = "A Study of Topics\nJane Doe\n\ndoi:10.1234/topics.5678"
+    embedded = {"title": "A Study of Topics", "author": "Jane Doe"}
+
+    metadata, confidence = local_metadata.guess_metadata(text, **embedded)
+    assert confidence >= 0.9 and metadata["Year"] == "NULL"
+    assert inference.guess_local_metadata(text, embedded) is None
+
+    # A file creation date is enough.
+    embedded["date"] = "D:20210301120000"
+    assert inference.guess_local_metadata(text, embedded)["Year"] == "2021"
@@ -0,0 +1,33 @@
+from renamer.metadata_cache import MetadataCache, make_cache_key
+
+METADATA = {"Author": "Ada Lovelace", "Title": "Notes on the Analytical Engine", "Year": "1843"}
+
+def test_key_depends_on_text_model_and_prompt_version():
+    key = make_cache_key("Some text", "gpt-4o-mini", "1")
+    assert make_cache_key("Some text", "gpt-4o-mini", "1") == key
+    assert make_cache_key("Other text", "gpt-4o-mini", "1") != key
+    assert make_cache_key("Some text", "gpt-4o", "1") != key
+    assert make_cache_key("Some text", "gpt-4o-mini", "2") != key
+
+def test_entries_survive_reopening(tmp_path):
+    path = str(tmp_path / "metadata_cache.sqlite3")
+    cache = MetadataCache(path)
+    cache.put("key", METADATA)
+    cache.close()
+
+    cache = MetadataCache(path)
+    assert cache.get("key") == METADATA
+    assert cache.get("unknown") is None
+    cache.close()
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = MetadataCache(str(tmp_path / "metadata_cache.sqlite3"), max_entries=2)
+    cache.put("first", METADATA)
+    cache.put("second", METADATA)
+    cache.get("first")
+    cache.put("third", METADATA)
+
+    assert cache.get("second") is None
+    assert cache.get("first") == METADATA
+    assert cache.get("third") == METADATA
+    cache.close()
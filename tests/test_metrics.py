@@ -0,0 +1,37 @@
+import json
+
+from renamer import config, engine, metrics
+from test_engine import write_notes
+
+def test_stages_are_free_when_metrics_are_off():
+    assert metrics.recorder is None
+    with metrics.stage("extract", __file__) as stage:
+        stage.add(retries=1)
+    assert stage is metrics.NULL_STAGE
+
+def test_jsonl_metrics_hold_one_line_per_stage(workspace, tmp_path, monkeypatch, capsys):
+    path = tmp_path / "metrics.jsonl"
+    monkeypatch.setattr(config, "METRICS_FORMAT", "jsonl")
+    monkeypatch.setattr(config, "METRICS_PATH", str(path))
+    write_notes(workspace["SOURCE_DIR"], 3)
+
+    engine.process_directory(["markdown"])
+
+    events = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert sorted(event["stage"] for event in events) == ["extract"] * 3 + ["infer"] * 3 + ["move"] * 3
+    assert all(event["file_bytes"] > 0 for event in events)
+    assert sum(event.get("prompt_tokens", 0) for event in events if event["stage"] == "infer") > 0
+    assert "Stage timings" in capsys.readouterr().out
+    assert metrics.recorder is None
+
+def test_prometheus_metrics_hold_cumulative_histograms(workspace, tmp_path, monkeypatch):
+    path = tmp_path / "renamer.prom"
+    monkeypatch.setattr(config, "METRICS_FORMAT", "prometheus")
+    monkeypatch.setattr(config, "METRICS_PATH", str(path))
+    write_notes(workspace["SOURCE_DIR"], 2)
+
+    engine.process_directory(["markdown"])
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert 'renamer_stage_duration_seconds_bucket{stage="move",le="+Inf"} 2' in lines
+    assert 'renamer_stage_duration_seconds_count{stage="extract"} 2' in lines
@@ -0,0 +1,113 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from renamer import config, engine, ocr
+from renamer.metadata_cache import MetadataCache
+from test_extractors import write_pdf
+
+def test_cache_key_follows_the_content_and_the_settings(tmp_path):
+    path = tmp_path / "scan.pdf"
+    path.write_bytes(b"%PDF-1.4 scanned")
+    key = ocr.ocr_cache_key(str(path), 150, 0.4, "eng")
+
+    copy = tmp_path / "copy" / "scan (1).pdf"
+    copy.parent.mkdir()
+    copy.write_bytes(path.read_bytes())
+    assert ocr.ocr_cache_key(str(copy), 150, 0.4, "eng") == key
+    assert ocr.ocr_cache_key(str(path), 300, 0.4, "eng") != key
+    assert ocr.ocr_cache_key(str(path), 150, 0.4, "deu") != key
+
+    # Another scan saved under the same name.
+    path.write_bytes(b"%PDF-1.4 another scan")
+    assert ocr.ocr_cache_key(str(path), 150, 0.4, "eng") != key
+
+def test_cache_key_of_a_large_file_hashes_its_start_and_end(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr, "CACHE_KEY_SAMPLE_BYTES", 4)
+    path = tmp_path / "scan.pdf"
+    path.write_bytes(b"head" + b"middle" + b"tail")
+    key = ocr.ocr_cache_key(str(path), 150, 0.4, "eng")
+
+    path.write_bytes(b"head" + b"MIDDLE" + b"tail")
+    assert ocr.ocr_cache_key(str(path), 150, 0.4, "eng") == key
+    path.write_bytes(b"head" + b"middle" + b"TAIL")
+    assert ocr.ocr_cache_key(str(path), 150, 0.4, "eng") != key
+    path.write_bytes(b"head" + b"middle!" + b"tail")
+    assert ocr.ocr_cache_key(str(path), 150, 0.4, "eng") != key
+
+def test_a_scan_is_renamed_from_the_cached_ocr_text(workspace, sent_requests, monkeypatch):
+    monkeypatch.setattr(config, "OCR_ENABLED", True)
+    # The cached text is used without rasterizing the page.
+    monkeypatch.setattr(ocr, "missing_requirement", lambda: None)
+    path = os.path.join(workspace["SOURCE_DIR"], "scan.pdf")
+    write_pdf(path, [])
+    cache = MetadataCache(workspace["OCR_CACHE_PATH"])
+    key = ocr.ocr_cache_key(path, config.OCR_DPI, config.OCR_TOP_FRACTION, config.OCR_LANGUAGE)
+    cache.put(key, {"text": "A Study of Scanned Topics\nJane Doe, 2021"})
+    cache.close()
+
+    engine.process_directory(["pdf"])
+
+    assert len(sent_requests) == 1
+    assert "A Study of Scanned Topics" in sent_requests[0]["messages"][-1]["content"]
+    assert not os.path.exists(path)
+    assert len(os.listdir(workspace["DESTINATION_DIR"])) == 1
+
+def test_a_scan_stays_in_place_without_ocr(workspace, sent_requests):
+    path = os.path.join(workspace["SOURCE_DIR"], "scan.pdf")
+    write_pdf(path, [])
+
+    engine.process_directory(["pdf"])
+
+    assert sent_requests == []
+    assert os.path.exists(path)
+
+def test_dry_run_does_not_create_the_cache(tmp_path):
+    cache_path = str(tmp_path / "ocr_cache.sqlite3")
+    pool = ocr.OcrPool(cache_path=cache_path, cache_read_only=True)
+    pool.shutdown()
+    assert pool.cache is None
+    assert not os.path.exists(cache_path)
+
+def test_dry_run_reads_the_cache_without_writing(tmp_path):
+    path = tmp_path / "scan.pdf"
+    path.write_bytes(b"%PDF-1.4 scanned")
+    cache_path = str(tmp_path / "ocr_cache.sqlite3")
+    cache = MetadataCache(cache_path)
+    cache.put(ocr.ocr_cache_key(str(path), 150, 0.4, "eng"), {"text": "Cached Title"})
+    cache.close()
+    modified = os.path.getmtime(cache_path)
+
+    pool = ocr.OcrPool(dpi=150, fraction=0.4, language="eng", cache_path=cache_path, cache_read_only=True)
+    try:
+        assert pool.read(str(path)) == ("Cached Title", 0.0)
+        pool.cache.put("other", {"text": "Not stored"})
+        assert pool.cache.get("other") is None
+    finally:
+        pool.shutdown()
+    assert os.path.getmtime(cache_path) == modified
+    cache = MetadataCache(cache_path)
+    assert cache.entry_count == 1
+    cache.close()
+
+def test_a_moved_scan_is_read_from_the_cache(tmp_path, monkeypatch):
+    path = tmp_path / "inbox" / "scan.pdf"
+    path.parent.mkdir()
+    path.write_bytes(b"%PDF-1.4 scanned")
+    recognized = []
+
+    def fake_ocr(path, dpi, fraction, language, timeout=None):
+        recognized.append(path)
+        return "A Study of Scanned Topics", 1.0
+
+    pool = ocr.OcrPool(cache_path=str(tmp_path / "ocr_cache.sqlite3"))
+    monkeypatch.setattr(pool, "get_executor", lambda: ThreadPoolExecutor(max_workers=1))
+    monkeypatch.setattr(ocr, "ocr_first_page", fake_ocr)
+    try:
+        assert pool.read(str(path)) == ("A Study of Scanned Topics", 1.0)
+        moved = tmp_path / "library" / "Jane Doe 2021--A Study.pdf"
+        moved.parent.mkdir()
+        os.replace(path, moved)
+        assert pool.read(str(moved)) == ("A Study of Scanned Topics", 0.0)
+    finally:
+        pool.shutdown()
+    assert recognized == [str(path)]
@@ -0,0 +1,29 @@
+import time
+
+from renamer import rate_limiter
+
+def test_header_durations_and_counts_are_parsed():
+    assert rate_limiter.parse_duration("6m0s") == 360.0
+    assert rate_limiter.parse_duration("20ms") == 0.02
+    assert rate_limiter.parse_duration("1.5") == 1.5
+    assert rate_limiter.parse_duration("soon") is None
+    assert rate_limiter.parse_count("4999") == 4999
+    assert rate_limiter.parse_count(None) is None
+
+def test_backoff_grows_with_jitter_up_to_the_maximum():
+    for attempt in range(10):
+        delay = rate_limiter.backoff_delay(attempt, base_delay=1.0, max_delay=8.0)
+        expected = min(8.0, 2 ** attempt)
+        assert expected / 2 <= delay <= expected
+
+def test_exhausted_budget_reported_by_the_api_pauses_requests():
+    limiter = rate_limiter.RateLimiter(requests_per_minute=6000)
+    limiter.update_from_headers({
+        "x-ratelimit-limit-requests": "6000",
+        "x-ratelimit-remaining-requests": "0",
+        "x-ratelimit-reset-requests": "300ms",
+    })
+
+    started = time.monotonic()
+    limiter.acquire(10)
+    assert time.monotonic() - started >= 0.25
@@ -0,0 +1,143 @@
+import os
+import json
+
+import pytest
+
+from renamer import engine, naming, rename_plan
+from test_engine import write_notes
+
+METADATA = {"Author": "Ada Lovelace", "Title": "Notes", "Year": "1843"}
+
+def write(path, content):
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(content)
+
+def read(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        return file.read()
+
+def make_plan(tmp_path):
+    """
+    Plan the move of one file into tmp_path / "renamed".
+
+    Returns:
+        tuple: (plan_path, source, target).
+    """
+    source = str(tmp_path / "scan.pdf")
+    write(source, "new document")
+    directory = str(tmp_path / "renamed")
+    moves = rename_plan.plan_moves([{"source": source, "metadata": METADATA, "directory": directory,
+                                     "extension": ".pdf"}])
+    plan_path = str(tmp_path / "renamer_plan.json")
+    rename_plan.write_plan(plan_path, moves)
+    return plan_path, source, moves[0]["target"]
+
+@pytest.mark.parametrize("same_device", [True, False], ids=["rename", "copy"])
+def test_apply_and_undo(tmp_path, monkeypatch, same_device):
+    monkeypatch.setattr(rename_plan, "same_device", lambda source, target_directory: same_device)
+    plan_path, source, target = make_plan(tmp_path)
+    undo_path = str(tmp_path / "renamer_undo.jsonl")
+
+    assert rename_plan.apply_plan(plan_path, undo_path) == (1, 0)
+    assert read(target) == "new document" and not os.path.exists(source)
+    assert os.listdir(os.path.dirname(target)) == [os.path.basename(target)]
+
+    assert rename_plan.undo_moves(undo_path) == (1, 0)
+    assert read(source) == "new document" and not os.path.exists(target)
+    assert not os.path.exists(undo_path)
+
+def test_failed_undo_keeps_only_the_failed_moves(tmp_path):
+    sources = [str(tmp_path / name) for name in ("a.pdf", "b.pdf")]
+    for source in sources:
+        write(source, source)
+    moves = rename_plan.plan_moves([{"source": source, "metadata": dict(METADATA, Title=os.path.basename(source)),
+                                     "directory": str(tmp_path / "renamed"), "extension": ".pdf"}
+                                    for source in sources])
+    plan_path, undo_path = str(tmp_path / "renamer_plan.json"), str(tmp_path / "renamer_undo.jsonl")
+    rename_plan.write_plan(plan_path, moves)
+    assert rename_plan.apply_plan(plan_path, undo_path) == (2, 0)
+    # A new file took the original name of a.pdf.
+    write(sources[0], "downloaded again")
+
+    assert rename_plan.undo_moves(undo_path) == (1, 1)
+    assert read(sources[1]) == sources[1]
+    assert not os.path.exists(undo_path + ".undone")
+    with open(undo_path, encoding='utf-8') as undo_file:
+        assert [json.loads(line)["source"] for line in undo_file] == [sources[0]]
+
+    os.remove(sources[0])
+    assert rename_plan.undo_moves(undo_path) == (1, 0)
+    assert read(sources[0]) == sources[0]
+    assert not os.path.exists(undo_path) and os.path.exists(undo_path + ".undone")
+
+def test_apply_skips_target_created_after_planning(tmp_path):
+    plan_path, source, target = make_plan(tmp_path)
+    os.makedirs(os.path.dirname(target))
+    write(target, "moved there by another worker")
+
+    assert rename_plan.apply_plan(plan_path, str(tmp_path / "renamer_undo.jsonl")) == (0, 1)
+    assert read(target) == "moved there by another worker"
+    assert read(source) == "new document"
+
+@pytest.mark.parametrize("same_device", [True, False], ids=["rename", "copy"])
+def test_target_appearing_during_apply_is_kept(tmp_path, monkeypatch, same_device):
+    plan_path, source, target = make_plan(tmp_path)
+
+    def target_appears(source, target_directory):
+        # Another worker moves a file to the target after the existence check.
+        write(target, "moved there by another worker")
+        return same_device
+
+    monkeypatch.setattr(rename_plan, "same_device", target_appears)
+    assert rename_plan.apply_plan(plan_path, str(tmp_path / "renamer_undo.jsonl")) == (0, 1)
+    assert read(target) == "moved there by another worker"
+    assert read(source) == "new document"
+    assert sorted(os.listdir(os.path.dirname(target))) == [os.path.basename(target)]
+
+def test_move_without_overwrite_keeps_existing_target(tmp_path):
+    source, target = str(tmp_path / "a.pdf"), str(tmp_path / "b.pdf")
+    write(source, "a")
+    write(target, "b")
+
+    with pytest.raises(FileExistsError):
+        naming.move_without_overwrite(source, target)
+    assert read(source) == "a" and read(target) == "b"
+
+@pytest.mark.parametrize("collisions, targets", [
+    ("suffix", ["Ada Lovelace 1843--Notes (2).pdf", "Ada Lovelace 1843--Notes (3).pdf",
+                "Ada Lovelace 1843--Notes (4).pdf"]),
+    ("skip", [None, None, None]),
+])
+def test_collisions_are_resolved_in_source_order(tmp_path, collisions, targets):
+    directory = tmp_path / "renamed"
+    directory.mkdir()
+    # The name is taken by a file renamed earlier.
+    (directory / "Ada Lovelace 1843--Notes.pdf").write_text("earlier", encoding="utf-8")
+    entries = [{"source": str(tmp_path / name), "metadata": METADATA, "directory": str(directory),
+                "extension": ".pdf"} for name in ("c.pdf", "a.pdf", "b.pdf")]
+
+    moves = rename_plan.plan_moves(entries, collisions)
+
+    assert [os.path.basename(move["source"]) for move in moves] == ["a.pdf", "b.pdf", "c.pdf"]
+    assert [move["target"] and os.path.basename(move["target"]) for move in moves] == targets
+
+def test_plan_moves_nothing_until_applied(workspace, sent_requests):
+    paths = write_notes(workspace["SOURCE_DIR"], 3)
+
+    engine.plan_directory(formats=["markdown"])
+
+    assert all(os.path.exists(path) for path in paths)
+    with open(workspace["PLAN_FILE"], encoding='utf-8') as plan_file:
+        moves = json.load(plan_file)["moves"]
+    assert sorted(move["source"] for move in moves) == paths
+    assert len(sent_requests) == 3
+
+    engine.apply_plan()
+    assert not any(os.path.exists(path) for path in paths)
+    assert sorted(os.listdir(workspace["DESTINATION_DIR"])) == sorted(
+        os.path.basename(move["target"]) for move in moves)
+
+    engine.undo_plan()
+    assert all(os.path.exists(path) for path in paths)
+    assert os.listdir(workspace["DESTINATION_DIR"]) == []
+    assert len(sent_requests) == 3
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from renamer import config, settings
+
+@pytest.fixture
+def restored_config(monkeypatch):
+    """
+    Restore the settings that the tests change.
+    """
+    for name in ("MAX_IN_FLIGHT", "SCAN_RECURSIVE", "FORMATS", "api_key", "CACHE_PATH"):
+        monkeypatch.setattr(config, name, getattr(config, name))
+
+def test_precedence_and_conversion(tmp_path, restored_config):
+    config_path = tmp_path / "settings.json"
+    config_path.write_text(json.dumps({"MAX_IN_FLIGHT": 2, "scan_recursive": False}), encoding="utf-8")
+    environ = {"RENAMER_MAX_IN_FLIGHT": "16", "RENAMER_FORMATS": "pdf, markdown", "OPENAI_API_KEY": "sk-test"}
+
+    settings.load(str(config_path), environ, ["cache_path=none"])
+
+    assert config.MAX_IN_FLIGHT == 16
+    assert config.SCAN_RECURSIVE is False
+    assert config.FORMATS == ["pdf", "markdown"]
+    assert config.api_key == "sk-test"
+    assert config.CACHE_PATH is None
+
+def test_unknown_environment_variable_is_ignored(restored_config, capsys):
+    settings.load(None, {"RENAMER_THEME": "dark", "RENAMER_MAX_IN_FLIGHT": "3"}, [])
+
+    assert config.MAX_IN_FLIGHT == 3
+    assert "Ignoring the environment variable RENAMER_THEME" in capsys.readouterr().out
+
+@pytest.mark.parametrize("source", ["file", "--set"])
+def test_unknown_setting_is_an_error(tmp_path, restored_config, source):
+    config_path = tmp_path / "settings.json"
+    config_path.write_text(json.dumps({"MAX_IN_FLIGHT": 3, "THEME": "dark"} if source == "file" else {}),
+                           encoding="utf-8")
+    assignments = ["THEME=dark"] if source == "--set" else []
+
+    with pytest.raises(ValueError, match="Unknown setting 'THEME'"):
+        settings.load(str(config_path), {}, assignments)
+    # Nothing from the invalid source is applied.
+    assert config.MAX_IN_FLIGHT != 3
+
+def test_invalid_value_is_an_error(restored_config):
+    with pytest.raises(ValueError, match="MAX_IN_FLIGHT must be a number"):
+        settings.load(None, {"RENAMER_MAX_IN_FLIGHT": "many"}, [])
@@ -0,0 +1,14 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that only the stages using them may import.
+HEAVY_MODULES = ("openai", "PyPDF2", "tiktoken", "charset_normalizer", "pypdfium2", "torch", "transformers")
+
+def test_engine_import_loads_no_heavy_library():
+    script = ("import sys, renamer.engine; "
+              f"print(' '.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.split() == []
@@ -0,0 +1,45 @@
+from renamer import text_excerpt
+
+DOCUMENT = """---
+title: Notes on the Analytical Engine
+author: Ada Lovelace
+---
+
+# Sketch of the Analytical Engine
+
+By Ada Lovelace, 1843
+
+```python
+def bernoulli(n):
+    return n
+```
+
+<!-- draft: do not publish -->
+![diagram](data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg==)
+
+""" + "\n\n".join(f"Paragraph {i} of the body text, which goes on about the engine." for i in range(200)) + """
+
+## References
+
+1. Menabrea, L. F. Sketch of the Analytical Engine. 1842.
+"""
+
+def test_excerpt_fits_the_budget_and_keeps_the_metadata():
+    excerpt = text_excerpt.make_excerpt(DOCUMENT, 120)
+
+    assert text_excerpt.count_tokens(excerpt) <= 120
+    assert excerpt.startswith("---\ntitle: Notes on the Analytical Engine\nauthor: Ada Lovelace\n---")
+    assert "# Sketch of the Analytical Engine" in excerpt
+    assert "By Ada Lovelace, 1843" in excerpt
+
+def test_low_signal_regions_are_dropped():
+    excerpt = text_excerpt.make_excerpt(DOCUMENT, 2000)
+
+    for dropped in ("def bernoulli", "draft: do not publish", "base64", "Menabrea"):
+        assert dropped not in excerpt
+    # Lines are kept in document order.
+    assert excerpt.index("Paragraph 1 ") < excerpt.index("Paragraph 2 ")
+
+def test_a_single_long_line_is_truncated():
+    excerpt = text_excerpt.make_excerpt("word " * 5000, 50)
+    assert 0 < text_excerpt.count_tokens(excerpt) <= 50
@@ -0,0 +1,54 @@
+import os
+import sqlite3
+import collections
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import benchmark
+from renamer import metrics, work_queue
+from test_engine import write_notes
+
+def test_claims_are_exclusive_until_the_lease_expires(tmp_path):
+    paths = write_notes(str(tmp_path / "inbox"), 4)
+    queue_path = str(tmp_path / "queue.sqlite3")
+    first = work_queue.WorkQueue(queue_path, str(tmp_path / "inbox"), "first", lease_seconds=60)
+    second = work_queue.WorkQueue(queue_path, str(tmp_path / "inbox"), "second", lease_seconds=60)
+    try:
+        assert first.claim(paths[:3]) == paths[:3]
+        assert second.claim(paths) == paths[3:]
+        first.complete(paths[0])
+
+        # The first worker dies: its unfinished files can be taken over, the finished one not.
+        first.connection.execute("UPDATE files SET lease_expires = 0 WHERE worker = 'first'")
+        first.connection.commit()
+        assert second.claim(paths) == paths[1:3]
+    finally:
+        first.close()
+        second.close()
+
+def test_workers_never_process_the_same_file(workspace):
+    paths = write_notes(workspace["SOURCE_DIR"], 60)
+    settings = dict(workspace, MAX_IN_FLIGHT=2, WORK_POLL_INTERVAL=0.2, WORKERS_PER_MACHINE=3,
+                    METRICS_FORMAT="summary")
+
+    run = metrics.RunMetrics()
+    extractions = collections.Counter()
+    with ProcessPoolExecutor(max_workers=3, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [executor.submit(benchmark.run_worker, settings, ["markdown"], False) for _ in range(3)]
+        for future in futures:
+            stages, extracted = future.result()
+            run.merge(stages)
+            extractions.update(extracted)
+
+    assert sorted(extractions) == sorted(paths)
+    assert set(extractions.values()) == {1}
+    assert run.summary()["extract"]["calls"] == 60
+    assert len(os.listdir(workspace["DESTINATION_DIR"])) == 60
+    with sqlite3.connect(workspace["WORK_QUEUE_PATH"]) as connection:
+        rows = connection.execute("SELECT state, claims FROM files").fetchall()
+    assert rows == [(work_queue.DONE, 1)] * 60
+
+    # The shared stores use a rollback journal, not WAL.
+    for name in ("CACHE_PATH", "JOURNAL_PATH", "DUPLICATE_INDEX_PATH"):
+        with sqlite3.connect(workspace[name]) as connection:
+            assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "delete"